@@ -2,9 +2,21 @@ CREATE TABLE IF NOT EXISTS decks
             (
                 deck_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 deck_name TEXT NOT NULL,
-                author TEXT NOT NULL
+                author TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                shard_id INTEGER,
+                card_count INTEGER NOT NULL DEFAULT 0,
+                -- archive with media files referenced by cards of the deck
+                media_source TEXT
             );
 
+-- cards, progress and schedule of sharded decks live in shard files
+CREATE TABLE IF NOT EXISTS shards(
+    shard_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shard_name TEXT NOT NULL UNIQUE,
+    shard_path TEXT NOT NULL
+);
+
 CREATE TABLE IF not EXISTS cards(
             card_id INTEGER PRIMARY KEY AUTOINCREMENT,
             deck_id INTEGER NOT NULL,
@@ -12,20 +24,56 @@ CREATE TABLE IF not EXISTS cards(
             answer TEXT NOT NULL,
             card_level INTEGER NOT NULL,
             card_category TEXT NOT NULL,
+            card_hash TEXT,
+            rendered_question TEXT,
+            rendered_answer TEXT,
 
             FOREIGN KEY (deck_id) 
                 REFERENCES decks (deck_id)
 );
 
+CREATE INDEX IF NOT EXISTS cards_hash_idx ON cards (card_hash);
+
 CREATE TABLE IF NOT EXISTS progress(
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     card_id INTEGER NOT NULL,
     guess_list TEXT NOT NULL,
     status INTEGER NOT NULL,
     guess_ts TEXT NOT NULL,
+    learner TEXT NOT NULL DEFAULT '',
 
     FOREIGN KEY (card_id) 
         REFERENCES cards (card_id)
 );
-            
 
+-- media files are named per source archive, equal names may differ in content
+CREATE TABLE IF NOT EXISTS media(
+    source_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    member TEXT NOT NULL,
+    member_crc INTEGER NOT NULL,
+    member_size INTEGER NOT NULL,
+    blob_hash TEXT,
+    PRIMARY KEY (source_path, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS media_blobs(
+    blob_hash TEXT PRIMARY KEY,
+    blob_size INTEGER NOT NULL,
+    last_used TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS media_blob_hash_idx ON media (blob_hash);
+
+CREATE TABLE IF NOT EXISTS schedule(
+    card_id INTEGER PRIMARY KEY,
+    box INTEGER NOT NULL,
+    due TEXT NOT NULL,
+    reviews INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+
+    FOREIGN KEY (card_id)
+        REFERENCES cards (card_id)
+);
+
+CREATE INDEX IF NOT EXISTS schedule_due_idx ON schedule (due);
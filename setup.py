@@ -6,4 +6,5 @@ setup(
     description="Simple flashcard app",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
+    extras_require={"forecast": ["numpy"]},
 )
@@ -0,0 +1,291 @@
+"""
+Answer index for autocomplete and typo hints
+
+Answers of a deck are normalized (``utils.normalize_text``) and indexed twice:
+compressed prefix trie completes typed prefix and BK-tree finds the nearest
+answer by Levenshtein distance. Both structures are built on first use, so
+session which never asks pays nothing, or at once by ``AnswerIndex.build``,
+which GUI runs in worker thread right after deck is loaded.
+
+Answer ``n`` edits away differs in length by at most ``n``, BK-trees are
+therefore kept per answer length and only few of them are searched.
+"""
+
+import itertools
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flashcards.cards import Card
+from flashcards.render import card_answer
+from flashcards.utils import levenshtein, normalize_text
+
+AUTOCOMPLETE_LIMIT = 5
+# typo hints are offered only for answers at most this many edits away
+HINT_DISTANCE = 2
+# completions of typed prefix tried before BK-tree search
+HINT_SEED_CANDIDATES = 32
+
+
+class _TrieNode:
+    """Node of compressed trie, ``label`` is text of edge leading to the node"""
+
+    __slots__ = ("label", "key", "children")
+
+    def __init__(self, label: str):
+        self.label = label
+        # full key when some key ends in this node
+        self.key: Optional[str] = None
+        # first char of child label -> child, in sorted order
+        self.children: Dict[str, "_TrieNode"] = {}
+
+
+class PrefixTrie:
+    """Compressed trie over fixed set of keys, built from sorted keys at once"""
+
+    def __init__(self, keys: Iterable[str]):
+        ordered = sorted(set(keys))
+        self._root = _TrieNode("")
+        if ordered:
+            self._build(self._root, ordered, 0)
+        self._size = len(ordered)
+
+    def __len__(self):
+        return self._size
+
+    def _build(self, node: "_TrieNode", keys: List[str], depth: int):
+        """Fill node with sorted keys sharing first ``depth`` chars"""
+        # keys are sorted, so common prefix of first and last is common to all
+        first, last = keys[0], keys[-1]
+        end = depth
+        while end < len(first) and end < len(last) and first[end] == last[end]:
+            end += 1
+        node.label = first[depth - len(node.label) : end]
+        if len(first) == end:
+            node.key = first
+            keys = keys[1:]
+        for char, group in itertools.groupby(keys, key=lambda key: key[end]):
+            child = _TrieNode(char)
+            node.children[char] = child
+            self._build(child, list(group), end + 1)
+
+    def _iter_keys(self, node: "_TrieNode") -> Iterator[str]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.key is not None:
+                yield node.key
+            stack.extend(reversed(node.children.values()))
+
+    def complete(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[str]:
+        """At most ``limit`` keys starting with prefix, in sorted order"""
+        node = self._root
+        position = len(node.label)
+        if node.label[: len(prefix)] != prefix[:position]:
+            return []
+        while position < len(prefix):
+            node = node.children.get(prefix[position])
+            if node is None:
+                return []
+            label = node.label
+            remaining = prefix[position : position + len(label)]
+            if label[: len(remaining)] != remaining:
+                return []
+            position += len(label)
+        return list(itertools.islice(self._iter_keys(node), limit))
+
+
+class BKTree:
+    """Burkhard-Keller tree, metric tree for nearest key lookups
+
+    Every node keeps children by their distance from node key, triangle
+    inequality then limits search to children with distance close to distance
+    of query from node key.
+    """
+
+    def __init__(self, distance: Callable[[str, str], int] = levenshtein):
+        self.distance = distance
+        # node is [key, {distance: child node}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key: str):
+        """Add key, duplicates are ignored"""
+        if self._root is None:
+            self._root = [key, {}]
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = self.distance(key, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [key, {}]
+                self._size += 1
+                return
+            node = child
+
+    def search(self, query: str, max_distance: int) -> List[Tuple[int, str]]:
+        """All keys at most ``max_distance`` away, as (distance, key) pairs"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            key, children = stack.pop()
+            distance = self.distance(query, key)
+            if distance <= max_distance:
+                found.append((distance, key))
+            for child_distance, child in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+    def nearest(self, query: str, max_distance: int) -> Optional[Tuple[int, str]]:
+        """Closest key at most ``max_distance`` away as (distance, key) pair
+
+        Bound shrinks with every better key found, so search narrows quickly.
+        """
+        best = None
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            key, children = stack.pop()
+            distance = self.distance(query, key)
+            if distance <= max_distance:
+                best = (distance, key)
+                if distance == 0:
+                    break
+                max_distance = distance - 1
+            for child_distance, child in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    stack.append(child)
+        return best
+
+
+class AnswerIndex:
+    """Autocomplete and typo hints over answers of one deck or session
+
+    Lookups take and return answers as shown to learner, matching is done on
+    normalized text.
+    """
+
+    def __init__(self, answers: Iterable[str]):
+        self._answers = answers
+        # normalized answer -> first answer with that normalized form
+        self._display: Optional[Dict[str, str]] = None
+        self._trie: Optional["PrefixTrie"] = None
+        self._suffix_trie: Optional["PrefixTrie"] = None
+        # answer length -> BK-tree of normalized answers of that length
+        self._trees: Optional[Dict[int, "BKTree"]] = None
+        # set by ``build``, lookups then only read finished structures
+        self.ready = False
+
+    @classmethod
+    def from_cards(cls, cards: Iterable["Card"]) -> "AnswerIndex":
+        """Index of rendered answers of cards, they are read on first lookup"""
+        return cls(card_answer(card) for card in cards)
+
+    @property
+    def display(self) -> Dict[str, str]:
+        """Normalized answer -> answer as shown"""
+        if self._display is None:
+            display: Dict[str, str] = {}
+            for answer in self._answers:
+                display.setdefault(normalize_text(answer), answer)
+            self._display = display
+            self._answers = ()
+        return self._display
+
+    @property
+    def trie(self) -> "PrefixTrie":
+        """Prefix trie of normalized answers, built on first use"""
+        if self._trie is None:
+            self._trie = PrefixTrie(self.display)
+        return self._trie
+
+    @property
+    def suffix_trie(self) -> "PrefixTrie":
+        """Prefix trie of reversed normalized answers, built on first use"""
+        if self._suffix_trie is None:
+            self._suffix_trie = PrefixTrie(key[::-1] for key in self.display)
+        return self._suffix_trie
+
+    @property
+    def trees(self) -> Dict[int, "BKTree"]:
+        """BK-trees of normalized answers per length, built on first use"""
+        if self._trees is None:
+            trees: Dict[int, "BKTree"] = {}
+            for key in self.display:
+                trees.setdefault(len(key), BKTree()).add(key)
+            self._trees = trees
+        return self._trees
+
+    def build(self) -> "AnswerIndex":
+        """Build every structure now, so no later lookup has to wait for it"""
+        _ = self.trie, self.suffix_trie, self.trees
+        self.ready = True
+        return self
+
+    def __len__(self):
+        return len(self.display)
+
+    def complete(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[str]:
+        """Answers starting with typed prefix"""
+        display = self.display
+        keys = self.trie.complete(normalize_text(prefix), limit)
+        return [display[key] for key in keys]
+
+    def nearest(
+        self, answer: str, max_distance: int = HINT_DISTANCE
+    ) -> Optional[Tuple[int, str]]:
+        """Closest answer as (distance, answer) pair, None when all are too far"""
+        query = normalize_text(answer)
+        display = self.display
+        if query in display:
+            return 0, display[query]
+        # single edit leaves either first or second half of the query intact,
+        # answers sharing it usually give close bound before trees are searched
+        best = None
+        half = len(query) // 2
+        seeds = self.trie.complete(query[:half], HINT_SEED_CANDIDATES)
+        seeds += [
+            key[::-1]
+            for key in self.suffix_trie.complete(
+                query[half:][::-1], HINT_SEED_CANDIDATES
+            )
+        ]
+        for key in seeds:
+            if abs(len(key) - len(query)) <= max_distance:
+                distance = levenshtein(query, key)
+                if distance <= max_distance and (best is None or distance < best[0]):
+                    best = (distance, key)
+        if best is not None:
+            if best[0] == 1:
+                # nothing is closer, exact match was ruled out above
+                return 1, display[best[1]]
+            max_distance = best[0] - 1
+        trees = self.trees
+        lengths = sorted(
+            range(len(query) - max_distance, len(query) + max_distance + 1),
+            key=lambda length: abs(length - len(query)),
+        )
+        for length in lengths:
+            if abs(length - len(query)) > max_distance or length not in trees:
+                continue
+            found = trees[length].nearest(query, max_distance)
+            if found is not None:
+                best = found
+                max_distance = found[0] - 1
+        if best is None:
+            return None
+        return best[0], display[best[1]]
+
+    def did_you_mean(
+        self, answer: str, max_distance: int = HINT_DISTANCE
+    ) -> Optional[str]:
+        """Closest different answer worth suggesting after wrong answer"""
+        found = self.nearest(answer, max_distance)
+        if found is None or found[1] == answer.strip():
+            return None
+        return found[1]
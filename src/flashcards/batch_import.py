@@ -0,0 +1,143 @@
+"""
+Batch import of deck files from directory tree
+
+Files are parsed in a process pool, parsed decks come back to the calling
+process, which is the only one writing into database. Every file is stored in
+its own transaction, so broken file is reported and skipped without touching
+decks of other files.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import functools
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flashcards.cards import Deck
+from flashcards.database import Db, DuplicatePolicy, StoredDeck
+from flashcards.fileloaders import DeckLoadingError, read_deck_file, register_apkg_media
+
+DECK_EXTENSIONS = (".json", ".jsonl", ".anki2", ".apkg")
+# parsed files waiting for writer per worker, bounds memory of parsed decks
+PENDING_PER_WORKER = 2
+
+# (file path, parsed decks, error message)
+ParsedFile = Tuple[str, List["Deck"], Optional[str]]
+
+
+@dataclass
+class ImportReport:
+    """Summary of batch import"""
+
+    files: int = 0
+    # decks and cards inserted, already stored decks and skipped cards are left out
+    decks: int = 0
+    cards: int = 0
+    elapsed: float = 0.0
+    # file path -> error message
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    def __str__(self):
+        files_rate = self.files / self.elapsed if self.elapsed else 0.0
+        cards_rate = self.cards / self.elapsed if self.elapsed else 0.0
+        return (
+            f"Imported {self.decks} decks with {self.cards} cards from {self.files} "
+            f"files in {self.elapsed:.3f}s ({files_rate:.1f} files/s, "
+            f"{cards_rate:.1f} cards/s), {len(self.failures)} files failed"
+        )
+
+
+def find_deck_files(directory: str) -> Iterator[str]:
+    """Iterate over supported deck files in directory tree, in sorted order"""
+    for root, dir_names, file_names in os.walk(directory):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if os.path.splitext(file_name)[1].lower() in DECK_EXTENSIONS:
+                yield os.path.join(root, file_name)
+
+
+def _parse(file_path: str) -> "ParsedFile":
+    """Read decks of single file, runs in worker process"""
+    try:
+        return file_path, read_deck_file(file_path), None
+    except DeckLoadingError as err:
+        return file_path, [], str(err)
+
+
+def _parse_in_pool(file_paths: Iterator[str], workers: int) -> Iterator["ParsedFile"]:
+    """Parsed files in completion order, only few files are parsed ahead of writer"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for file_path in file_paths:
+            pending.add(executor.submit(_parse, file_path))
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+
+
+def _store_file(
+    data_store: "Db",
+    file_path: str,
+    decks: List["Deck"],
+    on_duplicate: "DuplicatePolicy",
+    shard: Optional[str],
+) -> Tuple[List["StoredDeck"], Optional[str]]:
+    """Store decks of single file in one transaction
+
+    Returns stored decks and error message.
+    """
+    media_source = register_media = None
+    if file_path.lower().endswith(".apkg"):
+        media_source = os.path.abspath(file_path)
+        register_media = functools.partial(register_apkg_media, file_path, data_store)
+    try:
+        stored = data_store.put_decks_into_database(
+            decks, on_duplicate, shard, media_source, register_media
+        )
+    except (DeckLoadingError, sqlite3.Error) as err:
+        return [], str(err)
+    return stored, None
+
+
+def import_directory(
+    data_store: "Db",
+    directory: str,
+    workers: Optional[int] = None,
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+) -> "ImportReport":
+    """Import every deck file found in directory tree
+
+    ``workers`` is size of process pool (default: number of CPUs), with 1
+    files are parsed in current process.
+    """
+    started = time.perf_counter()
+    report = ImportReport()
+    file_paths = find_deck_files(directory)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results: Iterator["ParsedFile"] = map(_parse, file_paths)
+    else:
+        results = _parse_in_pool(file_paths, workers)
+    for file_path, decks, error in results:
+        report.files += 1
+        stored: List["StoredDeck"] = []
+        if error is None:
+            stored, error = _store_file(
+                data_store, file_path, decks, on_duplicate, shard
+            )
+        if error is not None:
+            logging.warning("Import of %s failed: %s", file_path, error)
+            report.failures[file_path] = error
+            continue
+        report.decks += sum(deck.inserted for deck in stored)
+        report.cards += sum(deck.card_count for deck in stored)
+    report.elapsed = time.perf_counter() - started
+    return report
+
@@ -0,0 +1,129 @@
+"""
+Read cache on top of database handler
+
+Every cached value is keyed by version of the deck it was built from. Db bumps
+deck version on every write touching the deck, so stale values are never
+served, they just stop being looked up and age out of the LRU.
+"""
+
+from collections import OrderedDict
+import dataclasses
+import logging
+import sys
+from typing import Any, Hashable, List
+
+from flashcards.cards import Deck, DeckStatistics, DeckSummary
+from flashcards.database import Db
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def estimate_size(value: Any) -> int:
+    """Rough memory size of value in bytes, follows containers and dataclasses"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item) for item in value)
+    if dataclasses.is_dataclass(value):
+        return size + sum(
+            estimate_size(getattr(value, field.name))
+            for field in dataclasses.fields(value)
+        )
+    return size
+
+
+class DeckCache:
+    """Caches deck summaries, decks and deck statistics served by ``Db``
+
+    Returned objects are shared between callers and must not be modified.
+    """
+
+    def __init__(self, data_store: "Db", max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.data_store = data_store
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes = {}
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Hashable, loader):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        value = loader()
+        self._put(key, value)
+        return value
+
+    def _put(self, key: Hashable, value: Any):
+        # older versions of the same entry can not be requested anymore
+        stale = [k for k in self._entries if k[:2] == key[:2]]
+        for stale_key in stale:
+            self._evict(stale_key)
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logging.info("Value for %r too big for cache (%d bytes)", key, size)
+            return
+        self._entries[key] = value
+        self._sizes[key] = size
+        self._current_bytes += size
+        while self._current_bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable):
+        del self._entries[key]
+        self._current_bytes -= self._sizes.pop(key)
+
+    def invalidate(self):
+        """Drop all cached values"""
+        self._entries.clear()
+        self._sizes.clear()
+        self._current_bytes = 0
+
+    @property
+    def size(self) -> int:
+        """Estimated size of cached values in bytes"""
+        return self._current_bytes
+
+    def get_deck_summaries(self) -> List["DeckSummary"]:
+        """Cached ``Db.get_deck_summaries``"""
+        versions = tuple(sorted(self.data_store.get_deck_versions().items()))
+        return self._get(
+            ("summaries", None, versions), self.data_store.get_deck_summaries
+        )
+
+    def get_deck_from_database(self, deck_id) -> "Deck":
+        """Cached ``Db.get_deck_from_database``"""
+        version = self.data_store.get_deck_versions().get(deck_id)
+        return self._get(
+            ("deck", deck_id, version),
+            lambda: self.data_store.get_deck_from_database(deck_id),
+        )
+
+    def get_all_decks(self) -> List["Deck"]:
+        """Cached ``Db.get_all_decks``"""
+        versions = self.data_store.get_deck_versions()
+        return [
+            self._get(
+                ("deck", deck_id, version),
+                lambda deck_id=deck_id: self.data_store.get_deck_from_database(
+                    deck_id
+                ),
+            )
+            for deck_id, version in sorted(versions.items())
+        ]
+
+    def get_deck_statistics(self, deck_id) -> "DeckStatistics":
+        """Cached ``Db.get_deck_statistics``"""
+        version = self.data_store.get_deck_versions().get(deck_id)
+        return self._get(
+            ("statistics", deck_id, version),
+            lambda: self.data_store.get_deck_statistics(deck_id),
+        )
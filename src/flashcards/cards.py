@@ -5,7 +5,7 @@ Basic dataclasses for the project
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
 
 @dataclass
@@ -17,6 +17,11 @@ class Card:
     answer: str
     level: int
     category: List[str]
+    # plain text of fields with markup, see flashcards.render
+    rendered_question: Optional[str] = None
+    rendered_answer: Optional[str] = None
+    # deck the card is stored in, None for cards not read from database
+    deck_id: Optional[int] = None
 
     @classmethod
     def from_dict(cls, dct):
@@ -38,6 +43,9 @@ class Card:
             answer=row["answer"],
             level=row["card_level"],
             category=row["card_category"].split(";"),
+            rendered_question=row["rendered_question"],
+            rendered_answer=row["rendered_answer"],
+            deck_id=row["deck_id"],
         )
 
 
@@ -77,6 +85,76 @@ class Deck:
         )
 
 
+@dataclass
+class DeckSummary:
+    """Deck info without cards"""
+
+    deck_id: int
+    deck_name: str
+    author: str
+    card_count: int
+    version: int
+    shard_name: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Constructor from table row"""
+        return cls(
+            deck_id=row["deck_id"],
+            deck_name=row["deck_name"],
+            author=row["author"],
+            card_count=row["card_count"],
+            version=row["version"],
+            shard_name=row["shard_name"],
+        )
+
+
+@dataclass
+class ShardSummary:
+    """Shard file with number of its decks and cards"""
+
+    shard_id: int
+    shard_name: str
+    shard_path: str
+    deck_count: int
+    card_count: int
+
+    @classmethod
+    def from_row(cls, row):
+        """Constructor from table row"""
+        return cls(
+            shard_id=row["shard_id"],
+            shard_name=row["shard_name"],
+            shard_path=row["shard_path"],
+            deck_count=row["deck_count"],
+            card_count=row["card_count"],
+        )
+
+
+@dataclass
+class DeckStatistics:
+    """Progress statistics of single deck"""
+
+    deck_id: int
+    card_count: int
+    reviewed_cards: int
+    attempts: int
+    correct: int
+    failed: int
+
+    @classmethod
+    def from_row(cls, deck_id, row):
+        """Constructor from table row"""
+        return cls(
+            deck_id=deck_id,
+            card_count=row["card_count"],
+            reviewed_cards=row["reviewed_cards"],
+            attempts=row["attempts"],
+            correct=row["correct"],
+            failed=row["failed"],
+        )
+
+
 class GuessStatus(Enum):
     """Enum for guess status"""
 
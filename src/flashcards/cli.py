@@ -5,50 +5,328 @@ CLI entry point for flashcard app
 USAGE:
   flashcard.py deck.json --cards 5 --tries 3
   flashcard.py deck.json -c 5 -t 3
+  flashcard.py play "Sample deck" -c 5 -t 3
+  flashcard.py import shared_deck.apkg --on-duplicate skip
+  flashcard.py import huge_shared_deck.apkg --shard shared
+  flashcard.py import decks_directory/ --workers 4
+  flashcard.py decks
+  flashcard.py shards
+  flashcard.py drop-shard shared
+  flashcard.py export "Sample deck" deck.jsonl --progress
+  flashcard.py duplicates
+  flashcard.py near-duplicates --field question --threshold 0.7 --max-distance 3
+  flashcard.py backup snapshot.db
+  flashcard.py backup shared_snapshot.db --shard shared
+  flashcard.py simulate "Sample deck" --sessions 1000 --accuracy 0.8
+  flashcard.py grade answers.csv --workers 4 --accept close
+  flashcard.py play "Sample deck" --hot
+  flashcard.py forecast --deck "Sample deck" --days 30
+  flashcard.py mixed --author "me" --tag food --policy round-robin -c 10
+  flashcard.py startup --runs 20
   flashcard.py help
 """
 
 from argparse import ArgumentParser
+from datetime import datetime
 import logging
 import os
 import sys
 
-from flashcards.fileloaders import load_from_json_file, DeckLoadingError
-from flashcards.flashcard import display_deck_info, play
-from flashcards.database import Db
+from flashcards.database import Db, DuplicatePolicy
+from flashcards.defaults import (
+    DEFAULT_HORIZON,
+    DEFAULT_RUNS,
+    INTERLEAVE_POLICIES,
+    STARTUP_TARGET,
+)
+from flashcards.utils import Closeness
 
+# modules used by single command only (loaders, exporters, process pools,
+# NumPy) are imported in their command, so start of other commands stays fast
+
+DEFAULT_DB_PATH = "result.db"
 
-def main(arguments):
-    """Main flashcard function"""
-    database_handle = Db("result.db")
-    database_handle.setup_database()
 
-    if args.deck.endswith(".json"):
-        if os.path.exists(args.deck):
-            try:
-                load_from_json_file(args.deck, database_handle)
-            except DeckLoadingError as err:
-                print(f"[ERR] {err!s}")
-                sys.exit(1)
+def find_deck_or_exit(database_handle: "Db", deck_name: str) -> int:
+    """Find deck_id by deck name, exits when deck is not found"""
+    deck_id = database_handle.find_deck_id(deck_name)
+    if deck_id is None:
+        print(f"[ERR] No deck named {deck_name!r}")
+        sys.exit(1)
+    return deck_id
 
-        deck = database_handle.get_deck_from_database(args.deck)
+
+def play_cmd(arguments, database_handle: "Db"):
+    """Play deck loaded from json file or deck stored in database"""
+    from flashcards.fileloaders import DeckLoadingError, load_from_json_file
+    from flashcards.flashcard import display_deck_info, play
+
+    if arguments.deck.endswith(".json") and os.path.exists(arguments.deck):
+        try:
+            deck_id = load_from_json_file(arguments.deck, database_handle)
+        except DeckLoadingError as err:
+            print(f"[ERR] {err!s}")
+            sys.exit(1)
+    else:
+        deck_id = find_deck_or_exit(database_handle, arguments.deck)
+    deck = database_handle.get_deck_from_database(deck_id)
     display_deck_info(deck)
 
-    play(database_handle, deck, arguments.cards)
+    play(database_handle, deck, arguments.cards, arguments.tries)
 
 
-if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.INFO,
-        filename="flashcard.log",
-        filemode="w",
-        format="[%(levelname)s] %(name)s -- %(message)s",
+def mixed_cmd(arguments, database_handle: "Db"):
+    """Play session mixing cards of many decks"""
+    from flashcards.flashcard import play_cards
+    from flashcards.session import InterleavePolicy, mixed_queue
+
+    deck_ids = database_handle.find_deck_ids(arguments.name, arguments.author)
+    if not deck_ids:
+        print("[ERR] No deck matches given filters")
+        sys.exit(1)
+    cards = mixed_queue(
+        database_handle,
+        deck_ids,
+        arguments.cards,
+        InterleavePolicy(arguments.policy),
+        tag=arguments.tag,
+    )
+    print(f"Mixed session of {len(cards)} cards from {len(deck_ids)} decks")
+    print("=" * 80)
+    play_cards(database_handle, cards, arguments.tries)
+
+
+def import_cmd(arguments, database_handle: "Db"):
+    """Import deck file or every deck file in directory tree into database"""
+    from flashcards.batch_import import import_directory
+    from flashcards.fileloaders import DeckLoadingError, load_deck_file
+
+    if os.path.isdir(arguments.path):
+        report = import_directory(
+            database_handle,
+            arguments.path,
+            workers=arguments.workers,
+            on_duplicate=DuplicatePolicy(arguments.on_duplicate),
+            shard=arguments.shard,
+        )
+        for file_path, error in report.failures.items():
+            print(f"[ERR] {file_path}: {error}")
+        print(report)
+        return
+    try:
+        load_deck_file(
+            arguments.path,
+            database_handle,
+            DuplicatePolicy(arguments.on_duplicate),
+            arguments.shard,
+        )
+    except DeckLoadingError as err:
+        print(f"[ERR] {err!s}")
+        sys.exit(1)
+
+
+def duplicates_cmd(_arguments, database_handle: "Db"):
+    """Print groups of cards with the same content"""
+    clusters = 0
+    for cluster in database_handle.iter_duplicate_clusters():
+        clusters += 1
+        print(f"{cluster[0]['question']!r} -> {cluster[0]['answer']!r}")
+        for row in cluster:
+            print(f"    card_id={row['card_id']} deck={row['deck_name']!r}")
+    print(f"Found {clusters} groups of duplicated cards")
+
+
+def near_duplicates_cmd(arguments, database_handle: "Db"):
+    """Print pairs of cards with similar content"""
+    from flashcards.similarity import find_near_duplicates
+
+    pairs = find_near_duplicates(
+        database_handle.iter_all_cards(),
+        field=arguments.field,
+        threshold=arguments.threshold,
+        max_distance=arguments.max_distance,
+    )
+    for pair in pairs[: arguments.limit]:
+        distance = "" if pair.distance is None else f" distance={pair.distance}"
+        print(f"similarity={pair.similarity:.2f}{distance}")
+        for card in (pair.left, pair.right):
+            print(f"    card_id={card.card_id} {card.question!r} -> {card.answer!r}")
+    print(f"Found {len(pairs)} pairs of similar cards")
+
+
+def simulate_cmd(arguments, database_handle: "Db"):
+    """Run many non-interactive sessions and report throughput"""
+    from flashcards.session import (
+        AnswerSource,
+        FileAnswerSource,
+        SimulatedLearner,
+        run_batch,
+    )
+
+    deck = database_handle.get_deck_from_database(
+        find_deck_or_exit(database_handle, arguments.deck)
+    )
+    answers = FileAnswerSource(arguments.answers) if arguments.answers else None
+
+    def answer_source(number: int) -> "AnswerSource":
+        if answers is not None:
+            return answers
+        return SimulatedLearner(arguments.accuracy, seed=arguments.seed + number)
+
+    report = run_batch(
+        database_handle,
+        deck,
+        arguments.sessions,
+        answer_source,
+        max_cards=arguments.cards,
+        max_tries=arguments.tries,
     )
+    print(report)
+
+
+ACCEPTED_CLOSENESS = {
+    "exact": Closeness.EXACT,
+    "accents": Closeness.COMBINING_DISMATCH,
+    "close": Closeness.CLOSE,
+}
+
+
+def grade_cmd(arguments, database_handle: "Db"):
+    """Grade answer sheet of many learners"""
+    from flashcards.fileloaders import DeckLoadingError
+    from flashcards.grading import grade_answer_sheet
+
+    try:
+        report = grade_answer_sheet(
+            database_handle,
+            arguments.sheet,
+            workers=arguments.workers,
+            accept=ACCEPTED_CLOSENESS[arguments.accept],
+        )
+    except DeckLoadingError as err:
+        print(f"[ERR] {err!s}")
+        sys.exit(1)
+    print(report)
+
+
+def forecast_cmd(arguments, database_handle: "Db"):
+    """Print expected number of reviews for coming days"""
+    from flashcards.forecast import forecast_reviews
+
+    deck_ids = None
+    if arguments.deck is not None:
+        deck_ids = [find_deck_or_exit(database_handle, arguments.deck)]
+    columns = database_handle.get_schedule_columns(datetime.now(), deck_ids)
+    print(forecast_reviews(columns, arguments.days))
+
+
+def backup_cmd(arguments, database_handle: "Db"):
+    """Copy live database (or one of its shards) into another file"""
+    try:
+        database_handle.snapshot(arguments.target, shard=arguments.shard)
+    except ValueError as err:
+        print(f"[ERR] {err!s}")
+        sys.exit(1)
+    print(f"{arguments.shard or 'Database'} copied into {arguments.target}")
+
+
+def shards_cmd(_arguments, database_handle: "Db"):
+    """List shard files of database"""
+    shards = database_handle.get_shard_summaries()
+    for shard in shards:
+        print(
+            f"{shard.shard_name!r}: {shard.deck_count} decks, "
+            f"{shard.card_count} cards in {shard.shard_path}"
+        )
+    print(f"Found {len(shards)} shards")
+
+
+def drop_shard_cmd(arguments, database_handle: "Db"):
+    """Remove shard with all its decks"""
+    try:
+        database_handle.drop_shard(arguments.shard, delete_file=not arguments.keep_file)
+    except ValueError as err:
+        print(f"[ERR] {err!s}")
+        sys.exit(1)
+    print(f"Shard {arguments.shard!r} dropped")
+
+
+def decks_cmd(_arguments, database_handle: "Db"):
+    """List stored decks with their card counts"""
+    summaries = database_handle.get_deck_summaries()
+    for summary in summaries:
+        shard = f" in shard {summary.shard_name!r}" if summary.shard_name else ""
+        print(
+            f"{summary.deck_name!r} by {summary.author!r}: "
+            f"{summary.card_count} cards{shard}"
+        )
+    print(f"Found {len(summaries)} decks")
+
+
+def startup_cmd(arguments, _database_handle: "Db"):
+    """Measure cold start of command line and GUI against target"""
+    from flashcards.startup_benchmark import measure_startup
+
+    report = measure_startup(arguments.db, arguments.runs, arguments.target / 1000)
+    print(report)
+    if not report.passed:
+        sys.exit(1)
+
+
+def export_cmd(arguments, database_handle: "Db"):
+    """Export deck into .json, .jsonl or .apkg file"""
+    from flashcards.exporters import export_deck
+
+    deck_id = find_deck_or_exit(database_handle, arguments.deck)
+    count = export_deck(
+        database_handle, deck_id, arguments.output, arguments.progress
+    )
+    print(f"Exported {count} cards into {arguments.output}")
+
+
+COMMANDS = {
+    "play": play_cmd,
+    "mixed": mixed_cmd,
+    "import": import_cmd,
+    "export": export_cmd,
+    "duplicates": duplicates_cmd,
+    "near-duplicates": near_duplicates_cmd,
+    "backup": backup_cmd,
+    "shards": shards_cmd,
+    "drop-shard": drop_shard_cmd,
+    "simulate": simulate_cmd,
+    "grade": grade_cmd,
+    "forecast": forecast_cmd,
+    "decks": decks_cmd,
+    "startup": startup_cmd,
+}
+
+
+def build_parser() -> "ArgumentParser":
+    """Argument parser with subcommand per entry in ``COMMANDS``"""
+    common = ArgumentParser(add_help=False)
+    common.add_argument(
+        "--db", help="Path to database file", default=DEFAULT_DB_PATH, required=False
+    )
+    common.add_argument(
+        "--hot",
+        help=(
+            "Serve database from memory, changes are written back on exit; "
+            "no other process may write the database meanwhile"
+        ),
+        action="store_true",
+    )
+
     parser = ArgumentParser(description="Flashcard learning game")
-    parser.add_argument(
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    play_parser = subparsers.add_parser(
+        "play", parents=[common], help="Play flashcard run (default command)"
+    )
+    play_parser.add_argument(
         "deck", help="Path to deck of flashcards in json format or deck name"
     )
-    parser.add_argument(
+    play_parser.add_argument(
         "-c",
         "--cards",
         help="Max number of flashcards",
@@ -56,7 +334,7 @@ if __name__ == "__main__":
         default=3,
         required=False,
     )
-    parser.add_argument(
+    play_parser.add_argument(
         "-t",
         "--tries",
         help="Max number of retries",
@@ -64,5 +342,193 @@ if __name__ == "__main__":
         default=3,
         required=False,
     )
-    args = parser.parse_args()
+
+    mixed_parser = subparsers.add_parser(
+        "mixed", parents=[common], help="Play cards mixed from many decks"
+    )
+    mixed_parser.add_argument(
+        "--name", help="Deck name pattern (SQL LIKE, e.g. 'Spanish%%')"
+    )
+    mixed_parser.add_argument("--author", help="Deck author pattern (SQL LIKE)")
+    mixed_parser.add_argument("--tag", help="Only cards with this category")
+    mixed_parser.add_argument(
+        "--policy",
+        help="How cards of decks are interleaved",
+        choices=INTERLEAVE_POLICIES,
+        default=INTERLEAVE_POLICIES[0],
+    )
+    mixed_parser.add_argument(
+        "-c", "--cards", help="Max number of flashcards", type=int, default=10
+    )
+    mixed_parser.add_argument(
+        "-t", "--tries", help="Max number of retries", type=int, default=3
+    )
+
+    import_parser = subparsers.add_parser(
+        "import", parents=[common], help="Import .json/.jsonl/.anki2/.apkg deck"
+    )
+    import_parser.add_argument(
+        "path", help="Path to deck file or directory searched for deck files"
+    )
+    import_parser.add_argument(
+        "--on-duplicate",
+        help="What to do with cards already stored in any deck",
+        choices=[policy.value for policy in DuplicatePolicy],
+        default=DuplicatePolicy.KEEP.value,
+    )
+    import_parser.add_argument(
+        "--shard", help="Store imported decks in separate shard file of this name"
+    )
+    import_parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of processes parsing files of directory",
+        type=int,
+        default=None,
+    )
+
+    subparsers.add_parser(
+        "duplicates", parents=[common], help="List cards stored more than once"
+    )
+
+    near_parser = subparsers.add_parser(
+        "near-duplicates", parents=[common], help="List cards with similar content"
+    )
+    near_parser.add_argument(
+        "--field",
+        help="Compared part of the card",
+        choices=["question", "answer", "both"],
+        default="question",
+    )
+    near_parser.add_argument(
+        "--threshold",
+        help="Minimal similarity of character trigrams (0-1)",
+        type=float,
+        default=0.6,
+    )
+    near_parser.add_argument(
+        "--max-distance",
+        help="Keep only pairs within given edit distance",
+        type=int,
+        default=None,
+    )
+    near_parser.add_argument(
+        "--limit", help="Max number of printed pairs", type=int, default=50
+    )
+
+    simulate_parser = subparsers.add_parser(
+        "simulate", parents=[common], help="Run sessions without user input"
+    )
+    simulate_parser.add_argument("deck", help="Deck name")
+    simulate_parser.add_argument(
+        "-n", "--sessions", help="Number of sessions", type=int, default=100
+    )
+    simulate_parser.add_argument(
+        "-c", "--cards", help="Max number of flashcards", type=int, default=5
+    )
+    simulate_parser.add_argument(
+        "-t", "--tries", help="Max number of retries", type=int, default=3
+    )
+    simulate_parser.add_argument(
+        "--accuracy",
+        help="Probability of correct answer of simulated learner",
+        type=float,
+        default=0.7,
+    )
+    simulate_parser.add_argument(
+        "--seed", help="Seed of simulated learners", type=int, default=0
+    )
+    simulate_parser.add_argument(
+        "--answers", help="File with answers, one per line, instead of simulation"
+    )
+
+    grade_parser = subparsers.add_parser(
+        "grade", parents=[common], help="Grade answer sheet (CSV or JSON Lines)"
+    )
+    grade_parser.add_argument(
+        "sheet", help="File with learner, card_id and answer columns"
+    )
+    grade_parser.add_argument(
+        "-w", "--workers", help="Number of worker processes", type=int, default=None
+    )
+    grade_parser.add_argument(
+        "--accept",
+        help="Least close answer counted as correct",
+        choices=list(ACCEPTED_CLOSENESS),
+        default="accents",
+    )
+
+    forecast_parser = subparsers.add_parser(
+        "forecast", parents=[common], help="Forecast review load of coming days"
+    )
+    forecast_parser.add_argument("--deck", help="Deck name (default: all decks)")
+    forecast_parser.add_argument(
+        "--days", help="Forecast horizon in days", type=int, default=DEFAULT_HORIZON
+    )
+
+    backup_parser = subparsers.add_parser(
+        "backup", parents=[common], help="Copy live database without blocking it"
+    )
+    backup_parser.add_argument("target", help="Path of the copy")
+    backup_parser.add_argument("--shard", help="Copy only this shard")
+
+    subparsers.add_parser("shards", parents=[common], help="List shard files")
+    subparsers.add_parser("decks", parents=[common], help="List stored decks")
+    startup_parser = subparsers.add_parser(
+        "startup", parents=[common], help="Measure cold start of CLI and GUI"
+    )
+    startup_parser.add_argument(
+        "-n", "--runs", help="Number of starts measured", type=int, default=DEFAULT_RUNS
+    )
+    startup_parser.add_argument(
+        "--target",
+        help="Target median cold start in milliseconds",
+        type=float,
+        default=STARTUP_TARGET * 1000,
+    )
+    drop_shard_parser = subparsers.add_parser(
+        "drop-shard", parents=[common], help="Remove shard and all its decks"
+    )
+    drop_shard_parser.add_argument("shard", help="Shard name")
+    drop_shard_parser.add_argument(
+        "--keep-file", help="Do not delete shard file", action="store_true"
+    )
+
+    export_parser = subparsers.add_parser(
+        "export", parents=[common], help="Export deck into file"
+    )
+    export_parser.add_argument("deck", help="Deck name")
+    export_parser.add_argument(
+        "output", help="Output file, format is picked by extension .json/.jsonl/.apkg"
+    )
+    export_parser.add_argument(
+        "--progress",
+        help="Include progress of every card (json and jsonl only)",
+        action="store_true",
+    )
+    return parser
+
+
+def main(arguments):
+    """Main flashcard function"""
+    database_handle = Db(arguments.db, in_memory=arguments.hot)
+    database_handle.setup_database()
+    try:
+        COMMANDS[arguments.command](arguments, database_handle)
+    finally:
+        database_handle.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        filename="flashcard.log",
+        filemode="w",
+        format="[%(levelname)s] %(name)s -- %(message)s",
+    )
+    argv = sys.argv[1:]
+    # keep old `flashcard.py deck.json` invocation working
+    if argv and argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "play")
+    args = build_parser().parse_args(argv)
     main(args)
@@ -2,22 +2,556 @@
 Database handler
 """
 
+import atexit
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+import enum
+import itertools
 import logging
 import os
+import pathlib
 import sqlite3
-from typing import List
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
-from flashcards.cards import Deck, Guess
+from flashcards.cards import (
+    Card,
+    Deck,
+    DeckStatistics,
+    DeckSummary,
+    Guess,
+    GuessStatus,
+    ShardSummary,
+)
+from flashcards.render import stored_fields
+from flashcards.scheduling import CardSchedule, ScheduleColumns, review
+from flashcards.utils import card_fingerprint
+
+# number of rows fetched at once by iterators
+ITER_BATCH_SIZE = 1024
+# in-memory database is written back to disk at least this often (seconds)
+DEFAULT_FLUSH_INTERVAL = 60.0
+# pages copied in single step of online backup, locks are released between steps
+SNAPSHOT_PAGES = 256
+# rows read at once by study queues
+STUDY_QUEUE_PAGE = 64
+# card ids of shard N start at N << SHARD_ID_BITS, so shard is known from card id
+SHARD_ID_BITS = 40
+# SQLite allows only 10 attached databases by default
+MAX_ATTACHED_SHARDS = 8
+
+
+class DuplicatePolicy(enum.Enum):
+    """What to do with imported card, which is already stored in any deck"""
+
+    KEEP = "keep"  # insert it anyway
+    SKIP = "skip"  # do not insert it
+    MERGE = "merge"  # do not insert it, add its categories to stored card
+
+
+class OutsideChangeError(Exception):
+    """Database file was changed by other connection while served from memory"""
+
+
+@dataclass
+class StoredDeck:
+    """Outcome of storing single deck"""
+
+    deck_id: int
+    # False when deck of the same name and author was stored already
+    inserted: bool
+    # number of cards inserted, duplicates skipped or merged are left out
+    card_count: int
+
+
+class _FingerprintLookup:
+    """Finds stored card by fingerprint in database file and every shard
+
+    Schema receiving the import and database file are searched through
+    connection of the import, so cards it inserted are found as well. Other
+    shards are opened read-only in connections of their own, attach limit does
+    not apply to them and no ATTACH interrupts transaction of the import.
+    Categories merged into their cards wait in ``pending_merges``.
+    """
+
+    def __init__(self, conn: "sqlite3.Connection", schema: str, shard_files: List[str]):
+        self._conn = conn
+        self._schemas = list(dict.fromkeys([schema, "main"]))
+        self._shard_conns = []
+        for shard_file in shard_files:
+            shard_conn = sqlite3.connect(
+                pathlib.Path(shard_file).resolve().as_uri() + "?mode=ro", uri=True
+            )
+            shard_conn.row_factory = sqlite3.Row
+            self._shard_conns.append(shard_conn)
+        # card_id -> merged categories of card stored in other shard
+        self.pending_merges: Dict[int, str] = {}
+
+    def find(self, fingerprint: str) -> Optional[tuple]:
+        """(schema, row) of stored card, schema is None for other shards"""
+        query = (
+            "SELECT card_id, deck_id, card_category FROM {}.cards "
+            "WHERE card_hash=? LIMIT 1"
+        )
+        for schema in self._schemas:
+            row = self._conn.execute(query.format(schema), (fingerprint,)).fetchone()
+            if row is not None:
+                return schema, row
+        for shard_conn in self._shard_conns:
+            row = shard_conn.execute(query.format("main"), (fingerprint,)).fetchone()
+            if row is not None:
+                stored = dict(row)
+                if stored["card_id"] in self.pending_merges:
+                    stored["card_category"] = self.pending_merges[stored["card_id"]]
+                return None, stored
+        return None
+
+    def close(self):
+        """Close connections of other shards"""
+        for shard_conn in self._shard_conns:
+            shard_conn.close()
+        self._shard_conns = []
 
 
 class Db:
-    """Db handler class"""
+    """Db handler class
 
-    def __init__(self, db_path: str):
+    With ``in_memory`` whole database (or only decks listed in ``deck_ids``) is
+    loaded into ``:memory:`` connection and all reads and writes are served from
+    memory. Changes are written back to disk file by ``flush``, which is run every
+    ``flush_interval`` seconds after a commit and on ``close`` or interpreter exit.
+    When only some decks are loaded, other decks are not visible until reopened.
+
+    In-memory database assumes it is the only writer of the disk file. Commits of
+    other connections are detected and ``flush`` then refuses to overwrite them
+    with ``OutsideChangeError``, ``close`` saves in-memory copy next to the file
+    instead (``unsaved_path``).
+
+    Decks can be stored in shard files (``put_deck_into_database(..., shard=...)``).
+    Database file is then catalog of shards and decks, while cards, progress and
+    schedule of the deck live in its shard, which is attached only when needed.
+    Shards are never loaded into memory.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        in_memory: bool = False,
+        deck_ids: Optional[List[int]] = None,
+        flush_interval: Optional[float] = DEFAULT_FLUSH_INTERVAL,
+    ):
         self._db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self._disk_conn = None
+        self._deck_ids = deck_ids
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        # PRAGMA data_version of disk file when it was last read or written
+        self._disk_version = None
+        # shard_id -> schema name, least recently used first
+        self._attached: "OrderedDict[int, str]" = OrderedDict()
+        if in_memory:
+            self._disk_conn = sqlite3.connect(db_path)
+            self.conn = sqlite3.connect(":memory:")
+            self._load_into_memory()
+            self._disk_version = self._read_disk_version()
+            atexit.register(self.close)
+        else:
+            self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
 
+    @property
+    def in_memory(self) -> bool:
+        """True if database is served from memory"""
+        return self._disk_conn is not None
+
+    def _load_into_memory(self):
+        """Copy disk database (or selected decks) into memory connection"""
+        started = time.perf_counter()
+        if self._deck_ids is None:
+            self._disk_conn.backup(self.conn)
+        else:
+            # schema must match so rows can be copied back as they are
+            disk_db = Db(self._db_path)
+            disk_db.setup_database()
+            disk_db.close()
+            schema = self._disk_conn.execute(
+                """
+                SELECT sql FROM sqlite_master
+                WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+                ORDER BY rowid ASC
+                """
+            ).fetchall()
+            for (sql,) in schema:
+                self.conn.execute(sql)
+            self.conn.execute("ATTACH DATABASE ? AS disk", (self._db_path,))
+            deck_filter = f"({', '.join('?' * len(self._deck_ids))})"
+            for table in ("decks", "cards"):
+                self.conn.execute(
+                    f"""
+                    INSERT INTO {table} SELECT * FROM disk.{table}
+                    WHERE deck_id IN {deck_filter}
+                    """,
+                    self._deck_ids,
+                )
+            self.conn.execute(
+                f"""
+                INSERT INTO progress SELECT p.* FROM disk.progress AS p
+                JOIN disk.cards AS c ON p.card_id=c.card_id
+                WHERE c.deck_id IN {deck_filter}
+                """,
+                self._deck_ids,
+            )
+            for table in self._tables():
+                if table not in ("decks", "cards", "progress"):
+                    self.conn.execute(
+                        f"INSERT INTO {table} SELECT * FROM disk.{table}"
+                    )
+            # keep ids of new rows in sync with the disk file
+            self.conn.execute("DELETE FROM sqlite_sequence")
+            self.conn.execute(
+                "INSERT INTO sqlite_sequence SELECT * FROM disk.sqlite_sequence"
+            )
+            self.conn.commit()
+            self.conn.execute("DETACH DATABASE disk")
+        logging.info(
+            "Database %s loaded into memory in %.3fs",
+            self._db_path,
+            time.perf_counter() - started,
+        )
+
+    def _tables(self) -> List[str]:
+        """User tables of main database"""
+        rows = self.conn.execute(
+            """
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name NOT LIKE 'sqlite_%'
+            """
+        )
+        return [row[0] for row in rows]
+
+    def _commit(self):
+        """Commit and write in-memory database back to disk if it is time to"""
+        self.conn.commit()
+        if (
+            self.in_memory
+            and self._flush_interval is not None
+            and time.monotonic() - self._last_flush >= self._flush_interval
+        ):
+            try:
+                self.flush()
+            except OutsideChangeError as err:
+                # keep serving from memory, changes are saved aside on close
+                logging.error("%s, periodic flush disabled", err)
+                self._flush_interval = None
+
+    def _read_disk_version(self) -> int:
+        """Counter changed by every commit of other connection to disk file"""
+        return self._disk_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @property
+    def unsaved_path(self) -> str:
+        """File keeping in-memory database, which could not be flushed"""
+        return os.path.splitext(self._db_path)[0] + ".unsaved.db"
+
+    def flush(self):
+        """Write in-memory database back into disk file
+
+        Raises ``OutsideChangeError`` when other connection committed to the disk
+        file since it was loaded or last flushed, disk file is left untouched.
+        """
+        if not self.in_memory:
+            return
+        started = time.perf_counter()
+        self.conn.commit()
+        if self._read_disk_version() != self._disk_version:
+            raise OutsideChangeError(
+                f"Database {self._db_path} was changed by other connection"
+            )
+        if self._deck_ids is None:
+            self.conn.backup(self._disk_conn)
+        else:
+            self._flush_decks()
+        self._disk_version = self._read_disk_version()
+        self._last_flush = time.monotonic()
+        logging.info(
+            "Database flushed to %s in %.3fs",
+            self._db_path,
+            time.perf_counter() - started,
+        )
+
+    def _flush_decks(self):
+        """Write loaded decks back, decks which were not loaded are kept as they are
+
+        Rows of loaded decks missing in memory are deleted from disk, other
+        tables are loaded whole, so they are replaced whole.
+        """
+        self._deck_ids = sorted(
+            set(self._deck_ids)
+            | {row[0] for row in self.conn.execute("SELECT deck_id FROM decks")}
+        )
+        deck_filter = f"({', '.join('?' * len(self._deck_ids))})"
+        self.conn.execute("ATTACH DATABASE ? AS disk", (self._db_path,))
+        self.conn.execute(
+            f"""
+            DELETE FROM disk.progress
+            WHERE id NOT IN (SELECT id FROM main.progress)
+            AND card_id IN (
+                SELECT card_id FROM disk.cards WHERE deck_id IN {deck_filter}
+            )
+            """,
+            self._deck_ids,
+        )
+        self.conn.execute(
+            f"""
+            DELETE FROM disk.cards
+            WHERE deck_id IN {deck_filter}
+            AND card_id NOT IN (SELECT card_id FROM main.cards)
+            """,
+            self._deck_ids,
+        )
+        self.conn.execute(
+            f"""
+            DELETE FROM disk.decks
+            WHERE deck_id IN {deck_filter}
+            AND deck_id NOT IN (SELECT deck_id FROM main.decks)
+            """,
+            self._deck_ids,
+        )
+        for table in self._tables():
+            if table not in ("decks", "cards", "progress"):
+                self.conn.execute(f"DELETE FROM disk.{table}")
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO disk.{table} SELECT * FROM main.{table}"
+            )
+        self.conn.commit()
+        self.conn.execute("DETACH DATABASE disk")
+
+    def close(self):
+        """Close database, in-memory database is flushed first
+
+        When flush is refused, in-memory database is saved to ``unsaved_path``.
+        """
+        if self.in_memory:
+            try:
+                self.flush()
+            except OutsideChangeError as err:
+                target = sqlite3.connect(self.unsaved_path)
+                try:
+                    self.conn.backup(target)
+                finally:
+                    target.close()
+                logging.error("%s, changes saved to %s", err, self.unsaved_path)
+            self._disk_conn.close()
+            self._disk_conn = None
+            atexit.unregister(self.close)
+        self.conn.close()
+
+    def snapshot(
+        self, target_path: str, pages: int = SNAPSHOT_PAGES, shard: Optional[str] = None
+    ):
+        """Copy live database (or single shard) into ``target_path``
+
+        SQLite online backup copies database in steps of ``pages`` pages,
+        so other connections are not blocked for the whole copy.
+        """
+        started = time.perf_counter()
+        schema = "main" if shard is None else self._schema(self._shard_id(shard))
+        self.conn.commit()
+        target = sqlite3.connect(target_path)
+        try:
+            self.conn.backup(target, pages=pages, sleep=0.001, name=schema)
+        finally:
+            target.close()
+        logging.info(
+            "Snapshot of %s written to %s in %.3fs",
+            shard or self._db_path,
+            target_path,
+            time.perf_counter() - started,
+        )
+
+    @property
+    def media_dir(self) -> str:
+        """Directory with media files stored next to database file"""
+        return os.path.splitext(self._db_path)[0] + "_media"
+
+    def add_shard(self, shard_name: str, shard_path: Optional[str] = None) -> int:
+        """Register shard file, returns shard_id of new or already known shard
+
+        Default path is ``<database>_shards/<shard_name>.db``, relative paths are
+        relative to database file.
+        """
+        row = self.conn.execute(
+            "SELECT shard_id FROM shards WHERE shard_name=?", (shard_name,)
+        ).fetchone()
+        if row is not None:
+            return row["shard_id"]
+        if shard_path is None:
+            base_name = os.path.splitext(os.path.basename(self._db_path))[0]
+            shard_path = os.path.join(base_name + "_shards", shard_name + ".db")
+        os.makedirs(os.path.dirname(self._shard_file(shard_path)), exist_ok=True)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "INSERT INTO shards(shard_name, shard_path) VALUES(?, ?)",
+            (shard_name, shard_path),
+        )
+        self._commit()
+        logging.info("Shard %r registered at %s", shard_name, shard_path)
+        return cursor.lastrowid
+
+    def drop_shard(self, shard_name: str, delete_file: bool = True):
+        """Forget shard and all its decks, shard file is deleted by default"""
+        shard_id = self._shard_id(shard_name)
+        self._detach_shards(lambda attached_id: attached_id == shard_id)
+        if shard_id in self._attached:
+            raise sqlite3.OperationalError(f"Shard {shard_name!r} is still in use")
+        row = self.conn.execute(
+            "SELECT shard_path FROM shards WHERE shard_id=?", (shard_id,)
+        ).fetchone()
+        self.conn.execute("DELETE FROM decks WHERE shard_id=?", (shard_id,))
+        self.conn.execute("DELETE FROM shards WHERE shard_id=?", (shard_id,))
+        self._commit()
+        if delete_file and os.path.exists(self._shard_file(row["shard_path"])):
+            os.remove(self._shard_file(row["shard_path"]))
+        logging.info("Shard %r dropped", shard_name)
+
+    def get_shard_summaries(self) -> List["ShardSummary"]:
+        """Every shard with number of its decks and cards, shards are not attached"""
+        cursor = self.conn.cursor()
+        rows = cursor.execute(
+            """
+            SELECT shards.*,
+                COUNT(decks.deck_id) AS deck_count,
+                COALESCE(SUM(decks.card_count), 0) AS card_count
+            FROM shards LEFT JOIN decks ON decks.shard_id=shards.shard_id
+            GROUP BY shards.shard_id ORDER BY shards.shard_id ASC
+            """
+        )
+        return [ShardSummary.from_row(row) for row in rows]
+
+    def _shard_id(self, shard_name: str) -> int:
+        row = self.conn.execute(
+            "SELECT shard_id FROM shards WHERE shard_name=?", (shard_name,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown shard {shard_name!r}")
+        return row["shard_id"]
+
+    def _shard_file(self, shard_path: str) -> str:
+        """Shard path resolved against directory of database file"""
+        return os.path.join(os.path.dirname(os.path.abspath(self._db_path)), shard_path)
+
+    def _schema(self, shard_id: Optional[int]) -> str:
+        """Schema holding cards of the shard, shard file is attached on first use
+
+        ATTACH is not allowed inside transaction, attaching shard while writes
+        of the caller are pending raises ``sqlite3.OperationalError`` instead of
+        committing them. Writers attach their shards before the first write.
+        """
+        if not shard_id:
+            return "main"
+        if shard_id in self._attached:
+            self._attached.move_to_end(shard_id)
+            return self._attached[shard_id]
+        row = self.conn.execute(
+            "SELECT shard_path FROM shards WHERE shard_id=?", (shard_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown shard {shard_id}")
+        self._require_no_transaction(f"attach shard {shard_id}")
+        self._detach_shards(
+            lambda _shard_id: len(self._attached) >= MAX_ATTACHED_SHARDS
+        )
+        schema = f"shard_{shard_id}"
+        self.conn.execute(
+            f"ATTACH DATABASE ? AS {schema}", (self._shard_file(row["shard_path"]),)
+        )
+        self._attached[shard_id] = schema
+        self._setup_card_tables(schema, first_card_id=shard_id << SHARD_ID_BITS)
+        logging.info("Shard %s attached", row["shard_path"])
+        return schema
+
+    def _detach_shards(self, should_detach):
+        """Detach attached shards for which ``should_detach(shard_id)`` holds
+
+        Shards are visited from least recently used. Shard still read by
+        unfinished iterator can not be detached and is kept.
+        """
+        self._require_no_transaction("detach shards")
+        for shard_id, schema in list(self._attached.items()):
+            if not should_detach(shard_id):
+                continue
+            try:
+                self.conn.execute(f"DETACH DATABASE {schema}")
+            except sqlite3.OperationalError:
+                logging.info("Shard %s is busy, kept attached", schema)
+                continue
+            del self._attached[shard_id]
+
+    def _require_no_transaction(self, action: str):
+        """Refuse ``action`` which would have to commit pending writes of caller"""
+        if self.conn.in_transaction:
+            raise sqlite3.OperationalError(
+                f"Can not {action} inside transaction, commit or roll back first"
+            )
+
+    def _deck_schema(self, deck_id) -> str:
+        """Schema holding cards of the deck"""
+        row = self.conn.execute(
+            "SELECT shard_id FROM decks WHERE deck_id=?", (deck_id,)
+        ).fetchone()
+        return self._schema(None if row is None else row["shard_id"])
+
+    def _group_by_shard(self, card_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Split card ids by shard_id (0 for database file), drops unknown shards"""
+        known = {0}
+        known.update(row[0] for row in self.conn.execute("SELECT shard_id FROM shards"))
+        groups: Dict[int, List[int]] = {}
+        for card_id in card_ids:
+            shard_id = card_id >> SHARD_ID_BITS
+            if shard_id in known:
+                groups.setdefault(shard_id, []).append(card_id)
+        return groups
+
+    def _attach_shard_groups(
+        self, shard_ids: Iterable[int]
+    ) -> Iterator[Dict[int, str]]:
+        """Attach shards in groups fitting attach limit, yields shard_id -> schema
+
+        Whole group is attached before it is yielded, so writes into the group
+        need no further ATTACH and can be committed as single transaction.
+        Database file (shard_id 0) is part of every group.
+        """
+        shard_ids = sorted(set(shard_ids) - {0})
+        if len(shard_ids) > MAX_ATTACHED_SHARDS:
+            logging.warning(
+                "%d shards do not fit attach limit, they are written in %d groups",
+                len(shard_ids),
+                -(-len(shard_ids) // MAX_ATTACHED_SHARDS),
+            )
+        for start in range(0, max(len(shard_ids), 1), MAX_ATTACHED_SHARDS):
+            group = shard_ids[start : start + MAX_ATTACHED_SHARDS]
+            missing = len(set(group) - set(self._attached))
+            self._detach_shards(
+                lambda shard_id, group=group, missing=missing: shard_id not in group
+                and len(self._attached) + missing > MAX_ATTACHED_SHARDS
+            )
+            schemas = {0: "main"}
+            schemas.update((shard_id, self._schema(shard_id)) for shard_id in group)
+            yield schemas
+
+    def _iter_schemas(self) -> Iterator[str]:
+        """Database file and then every shard in order of shard_id"""
+        yield "main"
+        shard_ids = [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT shard_id FROM shards ORDER BY shard_id ASC"
+            )
+        ]
+        for shard_id in shard_ids:
+            yield self._schema(shard_id)
+
     def rebuild_database(self):
         """Reset database for access"""
         self.conn.close()
@@ -37,46 +571,273 @@ class Db:
         (
             deck_id INTEGER PRIMARY KEY AUTOINCREMENT,
             deck_name TEXT NOT NULL,
-            author TEXT NOT NULL
+            author TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            shard_id INTEGER,
+            card_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS shards(
+            shard_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shard_name TEXT NOT NULL UNIQUE,
+            shard_path TEXT NOT NULL
         );
         """
         )
+        self._ensure_column("decks", "version", "INTEGER NOT NULL DEFAULT 0")
+        self._ensure_column("decks", "shard_id", "INTEGER")
+        self._ensure_column("decks", "media_source", "TEXT")
         logging.info("Table decks created")
+        self._setup_card_tables("main")
+        if self._ensure_column("decks", "card_count", "INTEGER NOT NULL DEFAULT 0"):
+            cursor.execute(
+                """
+                UPDATE decks SET card_count=(
+                    SELECT COUNT(*) FROM cards WHERE cards.deck_id=decks.deck_id
+                )
+                """
+            )
+        self._migrate_media_key()
+        cursor.executescript(
+            """
+        CREATE TABLE IF NOT EXISTS media(
+            source_path TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            member TEXT NOT NULL,
+            member_crc INTEGER NOT NULL,
+            member_size INTEGER NOT NULL,
+            blob_hash TEXT,
+            PRIMARY KEY (source_path, file_name)
+        );
+        CREATE TABLE IF NOT EXISTS media_blobs(
+            blob_hash TEXT PRIMARY KEY,
+            blob_size INTEGER NOT NULL,
+            last_used TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS media_blob_hash_idx ON media (blob_hash);
+        """
+        )
+        logging.info("Table media created")
+        self._commit()
+
+    def _migrate_media_key(self):
+        """Re-key media table of older version, it was keyed by file name only"""
+        cursor = self.conn.cursor()
+        keys = [
+            row["name"]
+            for row in cursor.execute("PRAGMA table_info(media)")
+            if row["pk"]
+        ]
+        if keys != ["file_name"]:
+            return
         cursor.executescript(
             """
-        CREATE TABLE IF not EXISTS cards(
+            ALTER TABLE media RENAME TO media_by_name;
+            DROP INDEX IF EXISTS media_blob_hash_idx;
+            CREATE TABLE media(
+                source_path TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                member TEXT NOT NULL,
+                member_crc INTEGER NOT NULL,
+                member_size INTEGER NOT NULL,
+                blob_hash TEXT,
+                PRIMARY KEY (source_path, file_name)
+            );
+            INSERT INTO media
+            SELECT source_path, file_name, member, member_crc, member_size, blob_hash
+            FROM media_by_name;
+            DROP TABLE media_by_name;
+            """
+        )
+        logging.info("Table media keyed by source and file name")
+
+    def _setup_card_tables(self, schema: str, first_card_id: int = 0):
+        """Create cards, progress and schedule tables in database file or shard
+
+        New shard starts numbering its cards after ``first_card_id``.
+        """
+        cursor = self.conn.cursor()
+        cursor.executescript(
+            f"""
+        CREATE TABLE IF not EXISTS {schema}.cards(
             card_id INTEGER PRIMARY KEY AUTOINCREMENT,
             deck_id INTEGER NOT NULL,
             question TEXT NOT NULL,
             answer TEXT NOT NULL,
             card_level INTEGER NOT NULL,
             card_category TEXT NOT NULL,
+            card_hash TEXT,
+            rendered_question TEXT,
+            rendered_answer TEXT,
 
             FOREIGN KEY (deck_id) 
                 REFERENCES decks (deck_id)
         );
         """
         )
+        if self._ensure_column("cards", "card_hash", "TEXT", schema):
+            self.conn.create_function(
+                "card_fingerprint", 2, card_fingerprint, deterministic=True
+            )
+            cursor.execute(
+                f"""
+                UPDATE {schema}.cards SET card_hash=card_fingerprint(question, answer)
+                """
+            )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}.cards_hash_idx ON cards (card_hash)"
+        )
+        if self._ensure_column("cards", "rendered_question", "TEXT", schema):
+            self._ensure_column("cards", "rendered_answer", "TEXT", schema)
+            self.conn.create_function(
+                "stored_question",
+                2,
+                lambda question, answer: stored_fields(question, answer)[0],
+                deterministic=True,
+            )
+            self.conn.create_function(
+                "stored_answer",
+                2,
+                lambda question, answer: stored_fields(question, answer)[1],
+                deterministic=True,
+            )
+            cursor.execute(
+                f"""
+                UPDATE {schema}.cards SET
+                    rendered_question=stored_question(question, answer),
+                    rendered_answer=stored_answer(question, answer)
+                """
+            )
+        if first_card_id:
+            cursor.execute(
+                f"""
+                INSERT INTO {schema}.sqlite_sequence(name, seq)
+                SELECT 'cards', ? WHERE NOT EXISTS (
+                    SELECT 1 FROM {schema}.sqlite_sequence WHERE name='cards'
+                )
+                """,
+                (first_card_id,),
+            )
         logging.info("Table cards created")
         cursor.executescript(
-            """
-        CREATE TABLE IF NOT EXISTS progress(
+            f"""
+        CREATE TABLE IF NOT EXISTS {schema}.progress(
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             card_id INTEGER NOT NULL,
             guess_list TEXT NOT NULL,
             status INTEGER NOT NULL,
             guess_ts TEXT NOT NULL,
+            learner TEXT NOT NULL DEFAULT '',
             
             FOREIGN KEY (card_id) 
                 REFERENCES cards (card_id)
             );
         """
         )
+        self._ensure_column("progress", "learner", "TEXT NOT NULL DEFAULT ''", schema)
+        cursor.executescript(
+            f"""
+        CREATE TABLE IF NOT EXISTS {schema}.schedule(
+            card_id INTEGER PRIMARY KEY,
+            box INTEGER NOT NULL,
+            due TEXT NOT NULL,
+            reviews INTEGER NOT NULL,
+            lapses INTEGER NOT NULL,
+
+            FOREIGN KEY (card_id)
+                REFERENCES cards (card_id)
+        );
+        CREATE INDEX IF NOT EXISTS {schema}.schedule_due_idx ON schedule (due);
+        """
+        )
+        logging.info("Table schedule created")
         self.conn.commit()
 
-    def put_deck_into_database(self, deck: "Deck"):
-        """Load deck into database"""
+    def _ensure_column(
+        self, table: str, column: str, definition: str, schema: str = "main"
+    ) -> bool:
+        """Add column missing in database created by older version
+
+        Returns True if column was added.
+        """
+        cursor = self.conn.cursor()
+        columns = [
+            row[1] for row in cursor.execute(f"PRAGMA {schema}.table_info({table})")
+        ]
+        if column in columns:
+            return False
+        cursor.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {column} {definition}")
+        logging.info("Column %s.%s added", table, column)
+        return True
+
+    def put_deck_into_database(
+        self,
+        deck: "Deck",
+        on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+        shard: Optional[str] = None,
+    ) -> int:
+        """Load deck into database, returns deck_id
 
+        ``deck.cards`` can be any iterable, it is consumed only once.
+        ``on_duplicate`` decides about cards with the same fingerprint as already
+        stored ones, duplicates are found through index on ``card_hash``.
+        Cards of the deck go into ``shard`` (created when missing) if it is given.
+        Duplicates are looked up in database file and every shard.
+        """
+        return self.put_decks_into_database([deck], on_duplicate, shard)[0].deck_id
+
+    def put_decks_into_database(
+        self,
+        decks: List["Deck"],
+        on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+        shard: Optional[str] = None,
+        media_source: Optional[str] = None,
+        register_media: Optional[Callable[[], object]] = None,
+    ) -> List["StoredDeck"]:
+        """Load decks in single transaction, returns what was stored of every deck
+
+        Nothing is stored when any deck fails. See ``put_deck_into_database``.
+        ``media_source`` is path of archive whose media files cards of the decks
+        reference (see ``MediaStore``). ``register_media`` is called inside the
+        transaction before decks are inserted, so media rows it writes are
+        committed or rolled back together with the decks.
+        """
+        shard_id = None if shard is None else self.add_shard(shard)
+        schema = self._schema(shard_id)
+        lookup = None
+        if on_duplicate != DuplicatePolicy.KEEP:
+            lookup = _FingerprintLookup(
+                self.conn, schema, self._other_shard_files(schema)
+            )
+        try:
+            if register_media is not None:
+                register_media()
+            stored = [
+                self._insert_deck(
+                    deck, on_duplicate, schema, shard_id, media_source, lookup
+                )
+                for deck in decks
+            ]
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            if lookup is not None:
+                lookup.close()
+        self._commit()
+        if lookup is not None and lookup.pending_merges:
+            self._merge_categories(lookup.pending_merges)
+        return stored
+
+    def _insert_deck(
+        self,
+        deck: "Deck",
+        on_duplicate: "DuplicatePolicy",
+        schema: str,
+        shard_id: Optional[int],
+        media_source: Optional[str] = None,
+        lookup: Optional["_FingerprintLookup"] = None,
+    ) -> "StoredDeck":
+        """Insert deck without commit, stored deck of the same name is kept"""
         cursor = self.conn.cursor()
         result = cursor.execute(
             "SELECT deck_id FROM decks WHERE deck_name=? AND author=?",
@@ -85,44 +846,343 @@ class Db:
                 deck.author,
             ),
         )
-        if result.fetchone() is not None:
-            return
+        existing = result.fetchone()
+        if existing is not None:
+            return StoredDeck(existing["deck_id"], inserted=False, card_count=0)
 
         cursor.execute(
-            "INSERT INTO decks(deck_name, author) VALUES(?, ?)",
-            (deck.deck_name, deck.author),
-        )
-        self.conn.commit()
-        result = cursor.execute(
-            "SELECT deck_id FROM decks WHERE deck_name=?", (deck.deck_name,)
+            """
+            INSERT INTO decks(deck_name, author, shard_id, media_source)
+            VALUES(?, ?, ?, ?)
+            """,
+            (deck.deck_name, deck.author, shard_id, media_source),
         )
-        deck_id = result.fetchone()["deck_id"]
-        cards = [
+        deck_id = cursor.lastrowid
+        cards = (
             (
                 deck_id,
                 card.question,
                 card.answer,
                 card.level,
                 ";".join(card.category),
+                card_fingerprint(card.question, card.answer),
+                *stored_fields(card.question, card.answer),
             )
-            for card in deck.cards
-        ]
-        print(cards)
+            for card in self._skip_duplicates(deck.cards, on_duplicate, lookup)
+        )
+        logging.info("Saving deck %r into database", deck.deck_name)
         cursor.executemany(
-            """
-            INSERT INTO cards(deck_id, question, answer, card_level, card_category) 
-            VALUES (?, ?, ?, ?, ?)
+            f"""
+            INSERT INTO {schema}.cards(
+                deck_id, question, answer, card_level, card_category, card_hash,
+                rendered_question, rendered_answer
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
             cards,
         )
-        self.conn.commit()
+        cursor.execute(
+            "UPDATE decks SET card_count=card_count+? WHERE deck_id=?",
+            (cursor.rowcount, deck_id),
+        )
+        return StoredDeck(deck_id, inserted=True, card_count=cursor.rowcount)
+
+    def _skip_duplicates(
+        self,
+        cards: Iterator["Card"],
+        on_duplicate: "DuplicatePolicy",
+        lookup: Optional["_FingerprintLookup"] = None,
+    ) -> Iterator["Card"]:
+        """Filter out cards already stored in database according to ``on_duplicate``
+
+        Cards inserted earlier from the same deck are visible to the lookup as well.
+        """
+        if on_duplicate == DuplicatePolicy.KEEP:
+            yield from cards
+            return
+        skipped = 0
+        for card in cards:
+            found = lookup.find(card_fingerprint(card.question, card.answer))
+            if found is None:
+                yield card
+                continue
+            skipped += 1
+            if on_duplicate == DuplicatePolicy.MERGE:
+                schema, stored = found
+                categories = stored["card_category"].split(";")
+                merged = categories + [c for c in card.category if c not in categories]
+                if merged == categories:
+                    continue
+                if schema is None:
+                    lookup.pending_merges[stored["card_id"]] = ";".join(merged)
+                    continue
+                self.conn.execute(
+                    f"UPDATE {schema}.cards SET card_category=? WHERE card_id=?",
+                    (";".join(merged), stored["card_id"]),
+                )
+                self._bump_deck_versions([stored["deck_id"]])
+        logging.info("Skipped %d duplicated cards", skipped)
+
+    def _other_shard_files(self, schema: str) -> List[str]:
+        """Existing files of shards other than database file and ``schema``"""
+        rows = self.conn.execute("SELECT shard_id, shard_path FROM shards").fetchall()
+        return [
+            self._shard_file(row["shard_path"])
+            for row in rows
+            if self._attached.get(row["shard_id"]) != schema
+            and os.path.exists(self._shard_file(row["shard_path"]))
+        ]
+
+    def _merge_categories(self, categories_by_card: Dict[int, str]):
+        """Store merged categories of cards, which were found outside of import"""
+        groups = self._group_by_shard(categories_by_card)
+        for schemas in self._attach_shard_groups(groups):
+            group_cards = []
+            try:
+                for shard_id, schema in schemas.items():
+                    card_ids = groups.get(shard_id, [])
+                    self.conn.executemany(
+                        f"UPDATE {schema}.cards SET card_category=? WHERE card_id=?",
+                        [
+                            (categories_by_card[card_id], card_id)
+                            for card_id in card_ids
+                        ],
+                    )
+                    group_cards.extend(card_ids)
+                self._bump_card_deck_versions(group_cards)
+            except Exception:
+                self.conn.rollback()
+                raise
+            self._commit()
+
+    def iter_duplicate_clusters(self) -> Iterator[List["sqlite3.Row"]]:
+        """Iterate over groups of cards sharing the same fingerprint
+
+        Every row holds card columns and ``deck_name``. Cards of database file and
+        every shard are grouped together. Shards are read one after another into
+        temporary tables (fingerprint counts and then duplicated cards), so they
+        need not fit into attach limit at once. Temporary tables are committed
+        between shards, so there must be no pending writes.
+        """
+        self._require_no_transaction("search duplicates")
+        cursor = self.conn.cursor()
+        cursor.executescript(
+            """
+            DROP TABLE IF EXISTS temp.fingerprint_counts;
+            DROP TABLE IF EXISTS temp.duplicate_cards;
+            CREATE TEMP TABLE fingerprint_counts(
+                card_hash TEXT NOT NULL,
+                card_count INTEGER NOT NULL
+            );
+            CREATE TEMP TABLE duplicate_cards(
+                card_id INTEGER PRIMARY KEY,
+                deck_id INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                card_level INTEGER NOT NULL,
+                card_category TEXT NOT NULL,
+                card_hash TEXT,
+                rendered_question TEXT,
+                rendered_answer TEXT
+            );
+            """
+        )
+        for schema in self._iter_schemas():
+            cursor.execute(
+                f"""
+                INSERT INTO temp.fingerprint_counts
+                SELECT card_hash, COUNT(*) FROM {schema}.cards
+                WHERE card_hash IS NOT NULL GROUP BY card_hash
+                """
+            )
+            self.conn.commit()
+        cursor.execute(
+            """
+            CREATE TEMP TABLE duplicate_hashes AS
+            SELECT card_hash FROM temp.fingerprint_counts
+            GROUP BY card_hash HAVING SUM(card_count) > 1
+            """
+        )
+        cursor.execute(
+            """
+            CREATE UNIQUE INDEX temp.duplicate_hashes_idx
+            ON duplicate_hashes (card_hash)
+            """
+        )
+        for schema in self._iter_schemas():
+            cursor.execute(
+                f"""
+                INSERT INTO temp.duplicate_cards
+                SELECT card_id, deck_id, question, answer, card_level, card_category,
+                    card_hash, rendered_question, rendered_answer
+                FROM {schema}.cards
+                WHERE card_hash IN (SELECT card_hash FROM temp.duplicate_hashes)
+                """
+            )
+            self.conn.commit()
+        cursor.arraysize = ITER_BATCH_SIZE
+        cursor.execute(
+            """
+            SELECT cards.*, decks.deck_name FROM temp.duplicate_cards AS cards
+            JOIN decks ON cards.deck_id=decks.deck_id
+            ORDER BY card_hash ASC, card_id ASC
+            """
+        )
+        cluster = []
+        while rows := cursor.fetchmany():
+            for row in rows:
+                if cluster and cluster[0]["card_hash"] != row["card_hash"]:
+                    yield cluster
+                    cluster = []
+                cluster.append(row)
+        if cluster:
+            yield cluster
+        cursor.executescript(
+            """
+            DROP TABLE temp.duplicate_hashes;
+            DROP TABLE temp.fingerprint_counts;
+            DROP TABLE temp.duplicate_cards;
+            """
+        )
+
+    def find_deck_ids(
+        self, name: Optional[str] = None, author: Optional[str] = None
+    ) -> List[int]:
+        """Ids of decks matching SQL LIKE patterns, all decks when nothing is given"""
+        cursor = self.conn.cursor()
+        rows = cursor.execute(
+            """
+            SELECT deck_id FROM decks
+            WHERE (:name IS NULL OR deck_name LIKE :name)
+                AND (:author IS NULL OR author LIKE :author)
+            ORDER BY deck_id ASC
+            """,
+            {"name": name, "author": author},
+        )
+        return [row["deck_id"] for row in rows]
+
+    def iter_study_queue(
+        self, deck_id, now: datetime, tag: Optional[str] = None
+    ) -> Iterator[tuple]:
+        """Cards of the deck in study order, yields (priority, card)
+
+        Cards are ordered by due date (never reviewed cards are due ``now``),
+        then by level and then by failure rate, worst first. Rows are fetched
+        lazily in pages of ``STUDY_QUEUE_PAGE``, so only consumed part of the deck
+        is loaded. No statement is left open between pages, so many queues can be
+        read at once even when their shards do not fit into attach limit.
+
+        Every page continues after the last (priority, card_id) read, so guesses
+        saved meanwhile do not shift pages. Card rescheduled after it was yielded
+        is not yielded again.
+        """
+        parameters = {"deck_id": deck_id, "now": now.isoformat(), "tag": tag}
+        seen = set()
+        last = None
+        while True:
+            rows = self._study_queue_page(deck_id, parameters, last)
+            for row in rows:
+                priority = (row["due"], row["card_level"], -row["failure_rate"])
+                last = (*priority, row["card_id"])
+                if row["card_id"] not in seen:
+                    seen.add(row["card_id"])
+                    yield priority, Card.from_row(row)
+            if len(rows) < STUDY_QUEUE_PAGE:
+                return
+
+    def _study_queue_page(
+        self, deck_id, parameters: dict, last: Optional[tuple]
+    ) -> list:
+        """Page of study queue following (due, level, -failure_rate, card_id)"""
+        schema = self._deck_schema(deck_id)
+        keyset = dict(zip(("due", "level", "rate", "card_id"), last or (None,) * 4))
+        return self.conn.execute(
+            f"""
+            SELECT * FROM (
+                SELECT cards.*,
+                    COALESCE(schedule.due, :now) AS due,
+                    COALESCE(1.0 * schedule.lapses / schedule.reviews, 0.0)
+                        AS failure_rate
+                FROM {schema}.cards AS cards
+                LEFT JOIN {schema}.schedule AS schedule
+                    ON schedule.card_id=cards.card_id
+                WHERE cards.deck_id=:deck_id
+                    AND (:tag IS NULL
+                        OR instr(';' || cards.card_category || ';', ';' || :tag || ';'))
+            )
+            WHERE :card_id IS NULL
+                OR (due, card_level, -failure_rate, card_id)
+                    > (:due, :level, :rate, :card_id)
+            ORDER BY due ASC, card_level ASC, -failure_rate ASC, card_id ASC
+            LIMIT :limit
+            """,
+            dict(parameters, **keyset, limit=STUDY_QUEUE_PAGE),
+        ).fetchall()
+
+    def find_deck_id(self, deck_name: str) -> Optional[int]:
+        """Find deck by its name"""
+        cursor = self.conn.cursor()
+        row = cursor.execute(
+            "SELECT deck_id FROM decks WHERE deck_name=? ORDER BY deck_id ASC",
+            (deck_name,),
+        ).fetchone()
+        return None if row is None else row["deck_id"]
+
+    def get_deck_info(self, deck_id) -> "Deck":
+        """Get deck without its cards"""
+        cursor = self.conn.cursor()
+        deck_ = cursor.execute("SELECT * FROM decks WHERE deck_id=?", (deck_id,))
+        return Deck.from_row(deck_.fetchone(), cards=[])
+
+    def iter_deck_cards(self, deck_id) -> Iterator["Card"]:
+        """Iterate over cards of the deck ordered by card_id"""
+        schema = self._deck_schema(deck_id)
+        cursor = self.conn.cursor()
+        cursor.arraysize = ITER_BATCH_SIZE
+        cursor.execute(
+            f"SELECT * FROM {schema}.cards WHERE deck_id=? ORDER BY card_id ASC",
+            (deck_id,),
+        )
+        while rows := cursor.fetchmany():
+            for row in rows:
+                yield Card.from_row(row)
+
+    def iter_all_cards(self) -> Iterator["Card"]:
+        """Iterate over cards of all decks ordered by card_id"""
+        # card ids of every shard are above ids of the previous one
+        for schema in self._iter_schemas():
+            cursor = self.conn.cursor()
+            cursor.arraysize = ITER_BATCH_SIZE
+            cursor.execute(f"SELECT * FROM {schema}.cards ORDER BY card_id ASC")
+            while rows := cursor.fetchmany():
+                for row in rows:
+                    yield Card.from_row(row)
+
+    def iter_deck_progress(self, deck_id) -> Iterator["sqlite3.Row"]:
+        """Iterate over progress rows of the deck ordered by card_id"""
+        schema = self._deck_schema(deck_id)
+        cursor = self.conn.cursor()
+        cursor.arraysize = ITER_BATCH_SIZE
+        cursor.execute(
+            f"""
+            SELECT progress.* FROM {schema}.progress AS progress
+            JOIN {schema}.cards AS cards ON progress.card_id=cards.card_id
+            WHERE cards.deck_id=? ORDER BY progress.card_id ASC, progress.id ASC
+            """,
+            (deck_id,),
+        )
+        while rows := cursor.fetchmany():
+            yield from rows
 
     def get_deck_from_database(self, deck_id):
         """Get single deck from db"""
+        schema = self._deck_schema(deck_id)
         cursor = self.conn.cursor()
         deck_ = cursor.execute("SELECT * FROM decks WHERE deck_id=?", (deck_id,))
         deck_result = deck_.fetchone()
-        cards_ = cursor.execute("SELECT * FROM cards WHERE deck_id=?", (deck_id,))
+        cards_ = cursor.execute(
+            f"SELECT * FROM {schema}.cards WHERE deck_id=?", (deck_id,)
+        )
         cards_result = cards_.fetchall()
         return Deck.from_row(deck_result, cards=cards_result)
 
@@ -137,19 +1197,273 @@ class Db:
         return result
 
     def put_guesses_into_database(self, guesses: List[Guess]):
-        """Save game progress"""
-        guesses_rows = [
-            (g.card.card_id, ";".join(g.tries), g.status.value) for g in guesses
-        ]
+        """Save game progress in single transaction
+
+        Shards of guessed cards are attached before writing, only guesses
+        spanning more than ``MAX_ATTACHED_SHARDS`` shards are committed in parts.
+        """
+        by_card = {g.card.card_id: g for g in guesses}
+        groups = self._group_by_shard(by_card)
+        for schemas in self._attach_shard_groups(groups):
+            group_cards = []
+            try:
+                for shard_id, schema in schemas.items():
+                    if shard_id not in groups:
+                        continue
+                    shard_cards = set(groups[shard_id])
+                    shard_guesses = [
+                        g for g in guesses if g.card.card_id in shard_cards
+                    ]
+                    self.conn.executemany(
+                        f"""
+                        INSERT INTO {schema}.progress(
+                            card_id, guess_list, status, guess_ts
+                        )
+                        VALUES (?, ?, ?, ?)
+                        """,
+                        [
+                            (
+                                g.card.card_id,
+                                ";".join(g.tries),
+                                g.status.value,
+                                (g.guess_ts or datetime.now()).isoformat(),
+                            )
+                            for g in shard_guesses
+                        ],
+                    )
+                    self._update_schedule(shard_guesses, schema)
+                    group_cards.extend(shard_cards)
+                self._bump_card_deck_versions(group_cards)
+            except Exception:
+                self.conn.rollback()
+                raise
+            self._commit()
+
+    def get_schedules(self, card_ids: Iterable[int]) -> Dict[int, "CardSchedule"]:
+        """Scheduling state of given cards, cards never reviewed are left out"""
+        schedules = {}
+        for shard_id, shard_card_ids in self._group_by_shard(card_ids).items():
+            schedules.update(
+                self._get_schedules(self._schema(shard_id), shard_card_ids)
+            )
+        return schedules
+
+    def _get_schedules(
+        self, schema: str, card_ids: List[int]
+    ) -> Dict[int, "CardSchedule"]:
+        schedules = {}
+        for start in range(0, len(card_ids), ITER_BATCH_SIZE):
+            chunk = card_ids[start : start + ITER_BATCH_SIZE]
+            rows = self.conn.execute(
+                f"""
+                SELECT * FROM {schema}.schedule
+                WHERE card_id IN ({", ".join("?" * len(chunk))})
+                """,
+                chunk,
+            )
+            schedules.update(
+                (row["card_id"], CardSchedule.from_row(row)) for row in rows
+            )
+        return schedules
+
+    def _update_schedule(self, guesses: List[Guess], schema: str = "main"):
+        """Move reviewed cards between Leitner boxes"""
+        schedules = self._get_schedules(
+            schema, list({g.card.card_id for g in guesses})
+        )
+        for guess in sorted(guesses, key=lambda g: g.guess_ts or datetime.now()):
+            card_id = guess.card.card_id
+            schedules[card_id] = review(
+                schedules.get(card_id),
+                card_id,
+                guess.status == GuessStatus.CORRECT,
+                guess.guess_ts or datetime.now(),
+            )
+        self.conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO {schema}.schedule(card_id, box, due, reviews, lapses)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (s.card_id, s.box, s.due.isoformat(), s.reviews, s.lapses)
+                for s in schedules.values()
+            ],
+        )
+
+    def get_schedule_columns(
+        self, now: datetime, deck_ids: Optional[List[int]] = None
+    ) -> "ScheduleColumns":
+        """Due dates and boxes of all scheduled cards (or cards of given decks)
+
+        Rows are read in batches straight into columns, no object per card
+        is created. Cards are joined only when part of shard's decks is selected.
+        """
+        columns = ScheduleColumns()
+        selected = None if deck_ids is None else set(deck_ids)
+        rows = self.conn.execute(
+            "SELECT deck_id, shard_id, card_count FROM decks"
+        ).fetchall()
+        card_counts = {row["deck_id"]: row["card_count"] for row in rows}
+        all_by_shard: Dict[int, List[int]] = {}
+        for row in rows:
+            all_by_shard.setdefault(row["shard_id"] or 0, []).append(row["deck_id"])
+        for shard_id, shard_deck_ids in sorted(all_by_shard.items()):
+            if selected is not None:
+                shard_deck_ids = [i for i in shard_deck_ids if i in selected]
+                if not shard_deck_ids:
+                    continue
+            schema = self._schema(shard_id)
+            deck_filter = "TRUE"
+            schedule_source = f"{schema}.schedule AS schedule"
+            # join with cards is the slowest part, skip it when whole shard is read
+            if len(shard_deck_ids) < len(all_by_shard[shard_id]):
+                deck_list = ", ".join(map(str, shard_deck_ids))
+                deck_filter = f"cards.deck_id IN ({deck_list})"
+                schedule_source += (
+                    f" JOIN {schema}.cards AS cards ON cards.card_id=schedule.card_id"
+                )
+            cursor = self.conn.cursor()
+            # plain tuples are much cheaper than sqlite3.Row
+            cursor.row_factory = None
+            cursor.arraysize = ITER_BATCH_SIZE
+            cursor.execute(
+                f"""
+                SELECT julianday(schedule.due) - julianday(?), schedule.box
+                FROM {schedule_source} WHERE {deck_filter}
+                """,
+                (now.isoformat(),),
+            )
+            scheduled = len(columns)
+            while rows := cursor.fetchmany():
+                due_days, boxes = zip(*rows)
+                columns.due_days.extend(due_days)
+                columns.boxes.extend(boxes)
+            # every card without schedule is new
+            columns.new_cards += sum(card_counts[i] for i in shard_deck_ids) - (
+                len(columns) - scheduled
+            )
+        return columns
+
+    def put_grades_into_database(self, grades: Iterable[tuple]):
+        """Save graded answers of many learners in single transaction
+
+        Every grade is tuple of (learner, card_id, answer, status). Shards of
+        graded cards are attached before writing, only sheets spanning more than
+        ``MAX_ATTACHED_SHARDS`` shards are committed in parts.
+        """
+        now = datetime.now().isoformat()
+        rows_by_card: Dict[int, List[tuple]] = {}
+        for learner, card_id, answer, status in grades:
+            rows_by_card.setdefault(card_id, []).append(
+                (card_id, answer, status.value, now, learner)
+            )
+        groups = self._group_by_shard(rows_by_card)
         cursor = self.conn.cursor()
-        cursor.executemany(
+        for schemas in self._attach_shard_groups(groups):
+            group_cards = []
+            try:
+                for shard_id, schema in schemas.items():
+                    if shard_id not in groups:
+                        continue
+                    cursor.executemany(
+                        f"""
+                        INSERT INTO {schema}.progress(
+                            card_id, guess_list, status, guess_ts, learner
+                        )
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (
+                            row
+                            for card_id in groups[shard_id]
+                            for row in rows_by_card[card_id]
+                        ),
+                    )
+                    group_cards.extend(groups[shard_id])
+                self._bump_card_deck_versions(group_cards)
+            except Exception:
+                self.conn.rollback()
+                raise
+            self._commit()
+
+    def get_card_answers(self, card_ids: Iterable[int]) -> Dict[int, str]:
+        """Answers (rendered when stored) of given cards, unknown cards are left out"""
+        answers = {}
+        for shard_id, shard_card_ids in self._group_by_shard(card_ids).items():
+            schema = self._schema(shard_id)
+            for start in range(0, len(shard_card_ids), ITER_BATCH_SIZE):
+                chunk = shard_card_ids[start : start + ITER_BATCH_SIZE]
+                rows = self.conn.execute(
+                    f"""
+                    SELECT card_id, COALESCE(rendered_answer, answer) AS answer
+                    FROM {schema}.cards
+                    WHERE card_id IN ({", ".join("?" * len(chunk))})
+                    """,
+                    chunk,
+                )
+                answers.update((row["card_id"], row["answer"]) for row in rows)
+        return answers
+
+    def _bump_deck_versions(self, deck_ids: Iterable[int]):
+        """Mark decks as modified, caches compare versions to spot stale entries"""
+        self.conn.executemany(
+            "UPDATE decks SET version=version+1 WHERE deck_id=?",
+            [(deck_id,) for deck_id in set(deck_ids)],
+        )
+
+    def _bump_card_deck_versions(self, card_ids: Iterable[int]):
+        """Mark decks owning given cards as modified"""
+        deck_ids = set()
+        for shard_id, shard_card_ids in self._group_by_shard(set(card_ids)).items():
+            schema = self._schema(shard_id)
+            for start in range(0, len(shard_card_ids), ITER_BATCH_SIZE):
+                chunk = shard_card_ids[start : start + ITER_BATCH_SIZE]
+                rows = self.conn.execute(
+                    f"""
+                    SELECT DISTINCT deck_id FROM {schema}.cards
+                    WHERE card_id IN ({", ".join("?" * len(chunk))})
+                    """,
+                    chunk,
+                )
+                deck_ids.update(row["deck_id"] for row in rows)
+        self._bump_deck_versions(deck_ids)
+
+    def get_deck_versions(self) -> Dict[int, int]:
+        """Current version of every deck"""
+        cursor = self.conn.cursor()
+        rows = cursor.execute("SELECT deck_id, version FROM decks")
+        return {row["deck_id"]: row["version"] for row in rows}
+
+    def get_deck_summaries(self) -> List["DeckSummary"]:
+        """Name, author and card count of every deck, shards are not attached"""
+        cursor = self.conn.cursor()
+        rows = cursor.execute(
+            """
+            SELECT decks.*, shards.shard_name FROM decks
+            LEFT JOIN shards ON shards.shard_id=decks.shard_id
+            ORDER BY decks.deck_id ASC
             """
-            INSERT INTO progress(card_id, guess_list, status)
-            VALUES (?, ?, ?)
-            """,
-            guesses_rows,
         )
-        cursor.commit()
+        return [DeckSummary.from_row(row) for row in rows]
+
+    def get_deck_statistics(self, deck_id) -> "DeckStatistics":
+        """Progress statistics of the deck"""
+        schema = self._deck_schema(deck_id)
+        cursor = self.conn.cursor()
+        row = cursor.execute(
+            f"""
+            SELECT
+                (SELECT card_count FROM decks WHERE deck_id=:deck_id) AS card_count,
+                COUNT(DISTINCT progress.card_id) AS reviewed_cards,
+                COUNT(progress.id) AS attempts,
+                COALESCE(SUM(progress.status=1), 0) AS correct,
+                COALESCE(SUM(progress.status=0), 0) AS failed
+            FROM {schema}.progress AS progress
+            JOIN {schema}.cards AS cards ON progress.card_id=cards.card_id
+            WHERE cards.deck_id=:deck_id
+            """,
+            {"deck_id": deck_id},
+        ).fetchone()
+        return DeckStatistics.from_row(deck_id, row)
 
     def get_guesses_from_database(self):
         pass
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Defaults shared by command line and the modules implementing its commands
+
+Module imports nothing, so command line parser can show defaults without
+importing modules of commands which are not run.
+"""
+
+# days covered by review load forecast
+DEFAULT_HORIZON = 30
+# cold starts measured by startup benchmark
+DEFAULT_RUNS = 10
+# median cold start of both entry points, interpreter start included
+STARTUP_TARGET = 0.15
+# values of ``session.InterleavePolicy``, default one first
+INTERLEAVE_POLICIES = ("priority", "round-robin", "random")
@@ -0,0 +1,316 @@
+"""Exporting decks from database
+
+Cards are streamed from the database, deck is never loaded into memory as a whole.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, List, TextIO, Tuple, Union
+import zipfile
+
+from flashcards.cards import Card
+from flashcards.database import Db
+from flashcards.fileloaders import COLLECTION_MEMBER, FIELD_SEPARATOR
+from flashcards.media import MEDIA_MANIFEST, MediaStore, media_references
+
+ANKI_SCHEMA = """
+CREATE TABLE col (
+    id INTEGER PRIMARY KEY, crt INTEGER NOT NULL, mod INTEGER NOT NULL,
+    scm INTEGER NOT NULL, ver INTEGER NOT NULL, dty INTEGER NOT NULL,
+    usn INTEGER NOT NULL, ls INTEGER NOT NULL, conf TEXT NOT NULL,
+    models TEXT NOT NULL, decks TEXT NOT NULL, dconf TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE TABLE notes (
+    id INTEGER PRIMARY KEY, guid TEXT NOT NULL, mid INTEGER NOT NULL,
+    mod INTEGER NOT NULL, usn INTEGER NOT NULL, tags TEXT NOT NULL,
+    flds TEXT NOT NULL, sfld INTEGER NOT NULL, csum INTEGER NOT NULL,
+    flags INTEGER NOT NULL, data TEXT NOT NULL
+);
+CREATE TABLE cards (
+    id INTEGER PRIMARY KEY, nid INTEGER NOT NULL, did INTEGER NOT NULL,
+    ord INTEGER NOT NULL, mod INTEGER NOT NULL, usn INTEGER NOT NULL,
+    type INTEGER NOT NULL, queue INTEGER NOT NULL, due INTEGER NOT NULL,
+    ivl INTEGER NOT NULL, factor INTEGER NOT NULL, reps INTEGER NOT NULL,
+    lapses INTEGER NOT NULL, left INTEGER NOT NULL, odue INTEGER NOT NULL,
+    odid INTEGER NOT NULL, flags INTEGER NOT NULL, data TEXT NOT NULL
+);
+CREATE TABLE revlog (
+    id INTEGER PRIMARY KEY, cid INTEGER NOT NULL, usn INTEGER NOT NULL,
+    ease INTEGER NOT NULL, ivl INTEGER NOT NULL, lastIvl INTEGER NOT NULL,
+    factor INTEGER NOT NULL, time INTEGER NOT NULL, type INTEGER NOT NULL
+);
+CREATE TABLE graves (
+    usn INTEGER NOT NULL, oid INTEGER NOT NULL, type INTEGER NOT NULL
+);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+ANKI_VERSION = 11
+ANKI_MODEL_ID = 1342697561419
+ANKI_DECK_ID = 1
+
+
+def _card_to_dict(card: "Card") -> dict:
+    """Dictionary accepted by ``Card.from_dict``"""
+    return {
+        "id": card.card_id,
+        "question": card.question,
+        "answer": card.answer,
+        "level": card.level,
+        "category": card.category,
+    }
+
+
+def _progress_to_dict(row: "sqlite3.Row") -> dict:
+    return {
+        "guess_list": row["guess_list"].split(";"),
+        "status": row["status"],
+        "guess_ts": row["guess_ts"],
+    }
+
+
+def iter_card_dicts(
+    data_store: "Db", deck_id: int, include_progress: bool = False
+) -> Iterator[dict]:
+    """Iterate over cards of the deck as dictionaries
+
+    With ``include_progress`` every card gets its ``progress`` list, both streams
+    are ordered by card_id so they are merged without buffering.
+    """
+    progress_rows = (
+        data_store.iter_deck_progress(deck_id) if include_progress else iter(())
+    )
+    pending = next(progress_rows, None)
+    for card in data_store.iter_deck_cards(deck_id):
+        card_dict = _card_to_dict(card)
+        if include_progress:
+            progress = []
+            while pending is not None and pending["card_id"] <= card.card_id:
+                if pending["card_id"] == card.card_id:
+                    progress.append(_progress_to_dict(pending))
+                pending = next(progress_rows, None)
+            card_dict["progress"] = progress
+        yield card_dict
+
+
+def export_deck_to_json(
+    data_store: "Db", deck_id: int, out: TextIO, include_progress: bool = False
+) -> int:
+    """Write deck in format read by ``load_from_json_file``, returns number of cards"""
+    deck = data_store.get_deck_info(deck_id)
+    out.write(
+        f'{{"name": {json.dumps(deck.deck_name)}, '
+        f'"author": {json.dumps(deck.author)}, "cards": ['
+    )
+    count = 0
+    for card_dict in iter_card_dicts(data_store, deck_id, include_progress):
+        out.write(",\n" if count else "\n")
+        out.write(json.dumps(card_dict, ensure_ascii=False))
+        count += 1
+    out.write("\n]}\n")
+    return count
+
+
+def export_deck_to_jsonl(
+    data_store: "Db", deck_id: int, out: TextIO, include_progress: bool = False
+) -> int:
+    """Write deck in format read by ``load_from_jsonl_file``, returns number of cards"""
+    deck = data_store.get_deck_info(deck_id)
+    header = {"name": deck.deck_name, "author": deck.author}
+    out.write(json.dumps(header, ensure_ascii=False) + "\n")
+    count = 0
+    for card_dict in iter_card_dicts(data_store, deck_id, include_progress):
+        out.write(json.dumps(card_dict, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _anki_col_row(deck_name: str, now: int) -> Tuple:
+    model = {
+        "id": ANKI_MODEL_ID,
+        "name": "Basic",
+        "type": 0,
+        "mod": now,
+        "usn": -1,
+        "sortf": 0,
+        "did": ANKI_DECK_ID,
+        "tmpls": [
+            {
+                "name": "Card 1",
+                "ord": 0,
+                "qfmt": "{{Front}}",
+                "afmt": "{{FrontSide}}<hr id=answer>{{Back}}",
+                "did": None,
+                "bqfmt": "",
+                "bafmt": "",
+            }
+        ],
+        "flds": [
+            {"name": "Front", "ord": 0, "sticky": False, "rtl": False},
+            {"name": "Back", "ord": 1, "sticky": False, "rtl": False},
+        ],
+        "css": "",
+        "latexPre": "",
+        "latexPost": "",
+        "tags": [],
+        "vers": [],
+        "req": [[0, "all", [0]]],
+    }
+    deck = {
+        "id": ANKI_DECK_ID,
+        "name": deck_name,
+        "mod": now,
+        "usn": -1,
+        "desc": "",
+        "dyn": 0,
+        "conf": 1,
+        "collapsed": False,
+        "newToday": [0, 0],
+        "revToday": [0, 0],
+        "lrnToday": [0, 0],
+        "timeToday": [0, 0],
+    }
+    return (
+        1,
+        now,
+        now * 1000,
+        now * 1000,
+        ANKI_VERSION,
+        0,
+        0,
+        0,
+        json.dumps({"nextPos": 1}),
+        json.dumps({str(ANKI_MODEL_ID): model}),
+        json.dumps({str(ANKI_DECK_ID): deck}),
+        json.dumps({"1": {"id": 1, "name": "Default"}}),
+        "{}",
+    )
+
+
+def _anki_rows(cards: Iterator["Card"], now: int) -> Iterator[Tuple[Tuple, Tuple]]:
+    """Note and card row for every card"""
+    for card in cards:
+        digest = hashlib.sha1(card.question.strip().encode("utf-8")).hexdigest()
+        checksum = int(digest[:8], 16)
+        tags = " ".join(c.replace(" ", "_") for c in card.category if c)
+        note = (
+            card.card_id,
+            f"fc{card.card_id:x}",
+            ANKI_MODEL_ID,
+            now,
+            -1,
+            f" {tags} " if tags else "",
+            card.question + FIELD_SEPARATOR + card.answer,
+            card.question,
+            checksum,
+            0,
+            "",
+        )
+        anki_card = (card.card_id, card.card_id, ANKI_DECK_ID, 0, now, -1)
+        anki_card += (0, 0, card.card_id, 0, 0, 0, 0, 0, 0, 0, 0, "")
+        yield note, anki_card
+
+
+def export_deck_to_apkg(
+    data_store: "Db", deck_id: int, out: Union[str, BinaryIO]
+) -> int:
+    """Write deck as minimal ANKI package, returns number of cards
+
+    ``out`` can be path or writable binary stream (does not need to be seekable).
+    Collection is built in temporary file and copied into archive in chunks.
+    Media files referenced by cards are streamed from ``MediaStore``, files
+    which can not be found (source archive is gone) are left out.
+    """
+    deck = data_store.get_deck_info(deck_id)
+    now = int(time.time())
+    count = 0
+    # file names in order of first reference, dict keeps them unique
+    referenced: Dict[str, None] = {}
+
+    def collect_references(cards: Iterator["Card"]) -> Iterator["Card"]:
+        for card in cards:
+            for file_name in media_references(card.question + card.answer):
+                referenced.setdefault(file_name)
+            yield card
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        collection_path = os.path.join(tmp_dir, COLLECTION_MEMBER)
+        conn = sqlite3.connect(collection_path)
+        try:
+            conn.executescript(ANKI_SCHEMA)
+            conn.execute(
+                "INSERT INTO col VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _anki_col_row(deck.deck_name, now),
+            )
+            notes: List[Tuple] = []
+            anki_cards: List[Tuple] = []
+            rows = _anki_rows(
+                collect_references(data_store.iter_deck_cards(deck_id)), now
+            )
+            for note, anki_card in rows:
+                notes.append(note)
+                anki_cards.append(anki_card)
+                if len(notes) >= 1024:
+                    count += _flush_anki_rows(conn, notes, anki_cards)
+            count += _flush_anki_rows(conn, notes, anki_cards)
+            conn.commit()
+        finally:
+            conn.close()
+        with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_DEFLATED) as z_file:
+            z_file.write(collection_path, COLLECTION_MEMBER)
+            manifest = _write_media(z_file, MediaStore(data_store), deck_id, referenced)
+            z_file.writestr(MEDIA_MANIFEST, json.dumps(manifest))
+    return count
+
+
+def _write_media(
+    z_file: "zipfile.ZipFile",
+    media_store: "MediaStore",
+    deck_id: int,
+    file_names: Iterable[str],
+) -> Dict[str, str]:
+    """Copy media files into archive under numbered members, returns manifest"""
+    manifest = {}
+    for file_name in file_names:
+        path = media_store.path_for(file_name, deck_id)
+        if path is None:
+            logging.warning("Media file %s not available, not exported", file_name)
+            continue
+        member = str(len(manifest))
+        z_file.write(path, member)
+        manifest[member] = file_name
+    return manifest
+
+
+def _flush_anki_rows(conn, notes: List[Tuple], anki_cards: List[Tuple]) -> int:
+    conn.executemany(f"INSERT INTO notes VALUES ({', '.join('?' * 11)})", notes)
+    conn.executemany(f"INSERT INTO cards VALUES ({', '.join('?' * 18)})", anki_cards)
+    count = len(notes)
+    notes.clear()
+    anki_cards.clear()
+    return count
+
+
+def export_deck(
+    data_store: "Db", deck_id: int, file_path: str, include_progress: bool = False
+) -> int:
+    """Export deck into file, format is picked by extension (.json, .jsonl, .apkg)"""
+    if file_path.endswith(".apkg"):
+        return export_deck_to_apkg(data_store, deck_id, file_path)
+    with open(file_path, "w", encoding="utf-8") as file_handle:
+        if file_path.endswith(".jsonl"):
+            return export_deck_to_jsonl(
+                data_store, deck_id, file_handle, include_progress
+            )
+        return export_deck_to_json(data_store, deck_id, file_handle, include_progress)
@@ -1,34 +1,55 @@
 """Classes for loading ANKI flash cards"""
 
+import functools
 import json
+import logging
 import os
+import shutil
 import sqlite3
 import tempfile
+from typing import Callable, List, Optional
 import zipfile
 
-from flashcards.database import Db
+from flashcards.database import Db, DuplicatePolicy
 from flashcards.cards import Deck, Card
+from flashcards.media import MediaStore
+
+
+# collections up to this size are deserialized straight into memory,
+# bigger ones are spooled into a temporary file first
+IN_MEMORY_COLLECTION_LIMIT = 64 * 1024 * 1024
+COLLECTION_MEMBER = "collection.anki2"
+# ANKI separates note fields with unit separator
+FIELD_SEPARATOR = "\x1f"
 
 
 class DeckLoadingError(Exception):
     """Error on deck load"""
 
 
-def load_anki2_file(file_path: str, data_store: Db):
-    """Load ANKI2 file"""
+def read_anki2_file(file_path: str) -> List["Deck"]:
+    """Read every deck of ANKI2 file"""
     conn = sqlite3.connect(file_path)
+    try:
+        return read_anki2_collection(conn)
+    finally:
+        conn.close()
+
+
+def read_anki2_collection(conn: "sqlite3.Connection") -> List["Deck"]:
+    """Read every deck from opened ANKI2 collection"""
     cursor = conn.cursor()
     result_decks = cursor.execute("SELECT ver, decks FROM col;")
     version, deck_json = result_decks.fetchone()
     if int(version) > 11:
-        print(
-            f"[WARN] Your deck collection is newer version ({version}) than fully supported one (11)"
+        logging.warning(
+            "Deck collection is newer version (%s) than fully supported one (11)",
+            version,
         )
     deck_list = []
     if deck_json is not None:
         deck_obj = json.loads(deck_json)
         deck_list = [(int(k), v["name"]) for k, v in deck_obj.items()]
-        print(f"Found: {len(deck_list)} decks.\n{deck_list!r}")
     decks = []
     for deck_id, deck_name in deck_list:
         deck = Deck(
@@ -44,35 +65,218 @@ def load_anki2_file(file_path: str, data_store: Db):
         )
         card_rows = result.fetchall()
         for note_id, deck_id, fields, tags in card_rows:
-            question, answer = fields.split("\v")
+            question, answer = fields.split(FIELD_SEPARATOR)[:2]
             card = Card(
                 card_id=int(note_id),
                 question=question,
                 answer=answer,
                 level=-1,
-                category=[tags],
+                category=tags.split(),
             )
             deck.cards.append(card)
         decks.append(deck)
-    for deck in decks:
-        data_store.put_deck_into_database(deck)
+    return decks
+
+
+def read_apkg_file(anki_file: str) -> List["Deck"]:
+    """Read every deck of apkg file, media files are left in the archive
+
+    Collection is read straight from the archive. Small collections are opened
+    in memory, larger ones are copied into a temporary file to keep memory bounded.
+    """
+    with zipfile.ZipFile(anki_file, mode="r") as z_file:
+        info = _collection_info(z_file, anki_file)
+        if info.file_size <= IN_MEMORY_COLLECTION_LIMIT and hasattr(
+            sqlite3.Connection, "deserialize"
+        ):
+            conn = sqlite3.connect(":memory:")
+            try:
+                conn.deserialize(z_file.read(info))
+                return read_anki2_collection(conn)
+            finally:
+                conn.close()
+        with tempfile.NamedTemporaryFile(suffix=".anki2", delete=False) as tmp_file:
+            with z_file.open(info) as member:
+                shutil.copyfileobj(member, tmp_file)
+    try:
+        return read_anki2_file(tmp_file.name)
+    finally:
+        os.remove(tmp_file.name)
+
+
+def _collection_info(z_file: "zipfile.ZipFile", anki_file: str) -> "zipfile.ZipInfo":
+    try:
+        return z_file.getinfo(COLLECTION_MEMBER)
+    except KeyError as err:
+        raise DeckLoadingError(
+            f"{anki_file!s} has no {COLLECTION_MEMBER} inside"
+        ) from err
+
+
+def register_apkg_media(anki_file: str, data_store: "Db"):
+    """Register media files of apkg file, nothing is extracted here
+
+    Registration is not committed, pass it to ``Db.put_decks_into_database``
+    as ``register_media`` so it is stored together with the decks.
+    """
+    with zipfile.ZipFile(anki_file, mode="r") as z_file:
+        _collection_info(z_file, anki_file)
+        MediaStore(data_store).register_apkg(z_file, anki_file)
+
+
+def _put_anki_decks(
+    decks: List["Deck"],
+    data_store: Db,
+    on_duplicate: "DuplicatePolicy",
+    shard: Optional[str],
+    media_source: Optional[str] = None,
+    register_media: Optional[Callable[[], object]] = None,
+):
+    logging.info(
+        "Found %d decks: %r", len(decks), [(d.deck_id, d.deck_name) for d in decks]
+    )
+    data_store.put_decks_into_database(
+        decks, on_duplicate, shard, media_source, register_media
+    )
+
+
+def load_anki2_file(
+    file_path: str,
+    data_store: Db,
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+):
+    """Load ANKI2 file"""
+    _put_anki_decks(read_anki2_file(file_path), data_store, on_duplicate, shard)
+
 
+def load_apkg_file(
+    anki_file: str,
+    data_store: "Db",
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+):
+    """Load apkg file into database
 
-def load_apkg_file(anki_file: str, data_store: "Db"):
-    """Load apkg file into database"""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        with zipfile.ZipFile(anki_file, mode="r") as z_file:
-            z_file.extractall(path=tmp_dir, members="collection.anki2")
-            collection_file = os.path.join(tmp_dir, "collection.anki2")
-            if os.path.exists(collection_file):
-                load_anki2_file(collection_file, data_store)
+    Media files are only registered, they are extracted when first displayed.
+    """
+    _put_anki_decks(
+        read_apkg_file(anki_file),
+        data_store,
+        on_duplicate,
+        shard,
+        media_source=os.path.abspath(anki_file),
+        register_media=functools.partial(register_apkg_media, anki_file, data_store),
+    )
 
 
-def load_from_json_file(file_path: str, data_store: Db):
-    """Load deck from json file"""
+def load_from_json_file(
+    file_path: str,
+    data_store: Db,
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+):
+    """Load deck from json file, returns deck_id"""
     if os.path.exists(file_path):
-        deck = None
-        with open(file_path, "r", encoding="utf-8") as file_handle:
-            deck_dict = json.load(file_handle)
-            deck = Deck.from_dict(deck_dict)
-        data_store.put_deck_into_database(deck)
+        deck = read_json_file(file_path)
+        return data_store.put_deck_into_database(deck, on_duplicate, shard)
+    return None
+
+
+def read_json_file(file_path: str) -> "Deck":
+    """Read deck from json file"""
+    with open(file_path, "r", encoding="utf-8") as file_handle:
+        deck_dict = json.load(file_handle)
+        return Deck.from_dict(deck_dict)
+
+
+def load_from_jsonl_file(
+    file_path: str,
+    data_store: Db,
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+):
+    """Load deck from JSON Lines file, returns deck_id
+
+    First line holds deck header (``name`` and ``author``), every next line
+    is single card.
+    Cards are streamed into database one by one.
+    """
+    with open(file_path, "r", encoding="utf-8") as file_handle:
+        try:
+            deck = _jsonl_deck(file_handle)
+            return data_store.put_deck_into_database(deck, on_duplicate, shard)
+        except (ValueError, KeyError) as err:
+            raise DeckLoadingError(
+                f"Malformed JSON Lines deck {file_path!s}: {err!s}"
+            ) from err
+
+
+def read_jsonl_file(file_path: str) -> "Deck":
+    """Read deck from JSON Lines file, all cards are loaded"""
+    with open(file_path, "r", encoding="utf-8") as file_handle:
+        try:
+            deck = _jsonl_deck(file_handle)
+            deck.cards = list(deck.cards)
+            return deck
+        except (ValueError, KeyError) as err:
+            raise DeckLoadingError(
+                f"Malformed JSON Lines deck {file_path!s}: {err!s}"
+            ) from err
+
+
+def _jsonl_deck(file_handle) -> "Deck":
+    """Deck with lazily parsed cards of opened JSON Lines file"""
+    header = json.loads(file_handle.readline())
+    return Deck(
+        deck_id=header.get("id", 0),
+        deck_name=header["name"],
+        author=header["author"],
+        cards=(
+            Card.from_dict(json.loads(line)) for line in file_handle if line.strip()
+        ),
+    )
+
+
+def load_deck_file(
+    file_path: str,
+    data_store: Db,
+    on_duplicate: "DuplicatePolicy" = DuplicatePolicy.KEEP,
+    shard: Optional[str] = None,
+):
+    """Load deck file of any supported format, format is picked by extension
+
+    Decks are stored into ``shard`` of the database when it is given.
+    """
+    loaders = {
+        ".json": load_from_json_file,
+        ".jsonl": load_from_jsonl_file,
+        ".anki2": load_anki2_file,
+        ".apkg": load_apkg_file,
+    }
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in loaders:
+        raise DeckLoadingError(f"Unsupported deck format {file_path!s}")
+    return loaders[extension](file_path, data_store, on_duplicate, shard)
+
+
+def read_deck_file(file_path: str) -> List["Deck"]:
+    """Read decks of file of any supported format without touching database
+
+    Every error is reported as ``DeckLoadingError``.
+    """
+    readers = {
+        ".json": lambda path: [read_json_file(path)],
+        ".jsonl": lambda path: [read_jsonl_file(path)],
+        ".anki2": read_anki2_file,
+        ".apkg": read_apkg_file,
+    }
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in readers:
+        raise DeckLoadingError(f"Unsupported deck format {file_path!s}")
+    try:
+        return readers[extension](file_path)
+    except DeckLoadingError:
+        raise
+    except (OSError, ValueError, KeyError, sqlite3.Error, zipfile.BadZipFile) as err:
+        raise DeckLoadingError(f"Can not read {file_path!s}: {err!r}") from err
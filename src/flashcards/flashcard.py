@@ -3,69 +3,87 @@
 """
 Flashcard game
 """
-import copy
-import random
-from flashcards.cards import GuessStatus, Guess
+from typing import List
+
+from flashcards.cards import Card, GuessStatus, Guess
 from flashcards.database import Db
+from flashcards.render import card_answer, card_question
+from flashcards.session import (
+    AnswerSource,
+    Session,
+    SessionObserver,
+    StdinAnswerSource,
+    pick_cards,
+)
 
 
 def display_flash_card(card):
     """Print info about card"""
-    print(f"{card['question']: ^80}")
+    print(f"{card_question(card): ^80}")
     print("=" * 80)
 
 
 def display_deck_info(deck):
     """Print info about deck"""
-    print(f"Author: {deck['author']}")
-    print(f"Card count: {len(deck['cards'])}")
+    print(f"Author: {deck.author}")
+    print(f"Card count: {len(deck.cards)}")
     print("=" * 80)
 
 
-def get_answer(guess: "Guess", max_retries: int = 5) -> bool:
-    """Ask for answer
+class ConsoleObserver(SessionObserver):
+    """Prints session progress"""
 
-    Will retry as many times as ``max_tries``. By default it is 5
-    """
-    tries = 1
-    display_flash_card(guess.card)
-    while tries <= max_retries:
-        answer = input("You answer: ")
-        guess.tries.append(answer.strip())
-        if answer.strip().lower() == guess.card["answer"].strip().lower():
-            return True
+    def card_shown(self, card: "Card"):
+        display_flash_card(card)
+
+    def wrong_answer(self, card: "Card", answer: str, try_number: int, max_tries: int):
         print(f"You gave: {answer}. This is not correct.", end=" ")
-        print(f"You still have {tries} tries, out of {max_retries}")
-        tries += 1
-    print(f"The correct answer was: {guess.card['answer']}")
-    return False
+        print(f"You still have {max_tries - try_number} tries, out of {max_tries}")
+
+    def card_finished(self, guess: "Guess"):
+        if guess.status == GuessStatus.CORRECT:
+            print("You got 1 point for this one")
+        else:
+            print(f"The correct answer was: {card_answer(guess.card)}")
+            print("You got 0 point for this one")
 
+    def session_finished(self, guesses: List["Guess"]):
+        print("=" * 80)
+        correct_guesses = [g for g in guesses if g.status == GuessStatus.CORRECT]
+        print(f"You correctly answered {len(correct_guesses)}/{len(guesses)}.")
 
-def play(db_handle: "Db", deck, max_cards: int = 3, max_guesses: int = 5):
+
+def play(
+    db_handle: "Db",
+    deck,
+    max_cards: int = 3,
+    max_guesses: int = 5,
+    answer_source: "AnswerSource" = None,
+):
     """Play single flashcard run
 
-    cards - list of cards represented as dict with { question, answer }
+    deck - deck to pick cards from
     max_cards - maximum amount of cards to be selected for this run
+    answer_source - where answers come from, by default they are typed by user
     """
-    all_cards = copy.deepcopy(deck.cards)
-    random.shuffle(all_cards)
-    card_lists = all_cards[:max_cards]
-    guesses = []
-    while card_lists:
-        current = card_lists.pop()
-        guess = Guess(card=current, tries=[], status=None)
-        answer = get_answer(guess, max_retries=max_guesses)
-        if answer:
-            print("You got 1 point for this one")
-            guess.status = GuessStatus.CORRECT
-        else:
-            print("You got 0 point for this one")
-            guess.status = GuessStatus.FAILED
-        guess.tries.append(answer)
-        guesses.append(guess)
-    print("=" * 80)
+    return play_cards(
+        db_handle, pick_cards(deck.cards, max_cards), max_guesses, answer_source
+    )
+
 
-    all_card_count = len(guesses)
-    correct_guesses = [g for g in guesses if g.status == GuessStatus.CORRECT]
-    print(f"You correctly answered {len(correct_guesses)}/{all_card_count}.")
-    db_handle.save_progress(guesses)
+def play_cards(
+    db_handle: "Db",
+    cards: List["Card"],
+    max_guesses: int = 5,
+    answer_source: "AnswerSource" = None,
+):
+    """Play flashcard run over given cards, in given order"""
+    session = Session(
+        cards,
+        answer_source or StdinAnswerSource(),
+        max_tries=max_guesses,
+        observer=ConsoleObserver(),
+    )
+    guesses = session.run()
+    db_handle.put_guesses_into_database(guesses)
+    return guesses
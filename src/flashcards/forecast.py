@@ -0,0 +1,163 @@
+"""
+Review load forecasting
+
+Scheduled cards are projected forward assuming every review is answered
+correctly, so each card climbs Leitner boxes until it leaves the horizon.
+Retention is estimated with exponential forgetting curve ``exp(-t / S)``, where
+stability ``S`` is chosen so that recall drops to ``TARGET_RETENTION`` exactly
+when interval of card's box elapses.
+
+Whole collection is processed column-wise with NumPy when it is installed,
+otherwise with equivalent pure Python loops. NumPy is imported on first
+forecast, it would otherwise dominate start of every command.
+"""
+
+from dataclasses import dataclass
+import functools
+import math
+from typing import List, Optional
+
+from flashcards.defaults import DEFAULT_HORIZON
+from flashcards.scheduling import LEITNER_INTERVALS, ScheduleColumns
+
+# expected recall when card becomes due
+TARGET_RETENTION = 0.9
+# stability of cards in box with zero interval, in days
+MIN_STABILITY_INTERVAL = 1
+
+
+@dataclass
+class Forecast:
+    """Expected number of reviews and retention for every day of horizon"""
+
+    reviews: List[int]
+    # expected share of scheduled cards recalled that day, if nothing is reviewed
+    retention: List[float]
+    scheduled_cards: int
+    overdue_cards: int
+    new_cards: int
+
+    @property
+    def horizon(self) -> int:
+        """Number of forecasted days, day 0 is today"""
+        return len(self.reviews)
+
+    def __str__(self):
+        lines = [
+            f"{self.scheduled_cards} scheduled cards ({self.overdue_cards} overdue), "
+            f"{self.new_cards} new cards"
+        ]
+        width = max(self.reviews, default=0)
+        for day, (count, retention) in enumerate(zip(self.reviews, self.retention)):
+            bar = "#" * (round(40 * count / width) if width else 0)
+            lines.append(f"day {day:3d}: {count:7d} {retention:6.1%} {bar}")
+        return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy module, None when it is not installed"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _stabilities() -> List[float]:
+    """Stability of every box, see module docstring"""
+    return [
+        max(interval, MIN_STABILITY_INTERVAL) / -math.log(TARGET_RETENTION)
+        for interval in LEITNER_INTERVALS
+    ]
+
+
+def forecast_reviews(
+    columns: "ScheduleColumns",
+    horizon: int = DEFAULT_HORIZON,
+    use_numpy: Optional[bool] = None,
+) -> "Forecast":
+    """Day by day review load and retention of scheduled cards
+
+    ``use_numpy`` defaults to True when NumPy is installed.
+    """
+    if use_numpy is None:
+        use_numpy = _numpy() is not None
+    if use_numpy:
+        reviews, retention, overdue = _forecast_numpy(columns, horizon)
+    else:
+        reviews, retention, overdue = _forecast_python(columns, horizon)
+    return Forecast(
+        reviews=reviews,
+        retention=retention,
+        scheduled_cards=len(columns),
+        overdue_cards=overdue,
+        new_cards=columns.new_cards,
+    )
+
+
+def _forecast_numpy(columns: "ScheduleColumns", horizon: int) -> tuple:
+    np = _numpy()
+    intervals = np.array(LEITNER_INTERVALS, dtype=np.float64)
+    stabilities = np.array(_stabilities())
+    due = np.frombuffer(columns.due_days, dtype=np.float64)
+    boxes = np.frombuffer(columns.boxes, dtype=np.int8).astype(np.intp)
+    overdue = int(np.count_nonzero(due < 0))
+
+    # last review happened one interval before due date and never in future
+    last_review = np.minimum(due - intervals[boxes], 0.0)
+    # exp(-(day - last) / S) == exp(last / S) * exp(-day / S), summed per box
+    box_weights = np.bincount(
+        boxes,
+        weights=np.exp(last_review / stabilities[boxes]),
+        minlength=len(LEITNER_INTERVALS),
+    )
+    days = np.arange(horizon, dtype=np.float64)
+    recalled = box_weights @ np.exp(-days[np.newaxis, :] / stabilities[:, np.newaxis])
+    retention = recalled / len(due) if len(due) else np.ones(horizon)
+
+    reviews = np.zeros(horizon, dtype=np.int64)
+    due = np.maximum(due, 0.0)
+    while due.size:
+        inside = due < horizon
+        due, boxes = due[inside], boxes[inside]
+        reviews += np.bincount(due.astype(np.intp), minlength=horizon)[:horizon]
+        boxes = np.minimum(boxes + 1, len(LEITNER_INTERVALS) - 1)
+        due = due + intervals[boxes]
+    return reviews.tolist(), retention.tolist(), overdue
+
+
+def _forecast_python(columns: "ScheduleColumns", horizon: int) -> tuple:
+    stabilities = _stabilities()
+    last_box = len(LEITNER_INTERVALS) - 1
+    overdue = 0
+    box_weights = [0.0] * len(LEITNER_INTERVALS)
+    pending = []
+    for due, box in zip(columns.due_days, columns.boxes):
+        overdue += due < 0
+        last_review = min(due - LEITNER_INTERVALS[box], 0.0)
+        box_weights[box] += math.exp(last_review / stabilities[box])
+        pending.append((max(due, 0.0), box))
+
+    retention = [
+        sum(
+            weight * math.exp(-day / stability)
+            for weight, stability in zip(box_weights, stabilities)
+        )
+        / len(pending)
+        if pending
+        else 1.0
+        for day in range(horizon)
+    ]
+
+    reviews = [0] * horizon
+    while pending:
+        next_pending = []
+        for due, box in pending:
+            if due >= horizon:
+                continue
+            reviews[int(due)] += 1
+            box = min(box + 1, last_box)
+            next_pending.append((due + LEITNER_INTERVALS[box], box))
+        pending = next_pending
+    return reviews, retention, overdue
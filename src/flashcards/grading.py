@@ -0,0 +1,148 @@
+"""
+Bulk grading of exported answer sheets
+
+Answer sheet is CSV (with ``learner,card_id,answer`` header) or JSON Lines file
+with the same keys. Answers are grouped by card, so correct answer of every card
+is normalized once, and groups are graded in a process pool. All results are
+written into ``progress`` in single transaction.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import dataclass
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flashcards.cards import GuessStatus
+from flashcards.database import Db
+from flashcards.fileloaders import DeckLoadingError
+from flashcards.utils import Closeness, compare_prenormalized, normalize_answer
+
+# number of answers sent to worker process at once
+CHUNK_SIZE = 2048
+
+# (card_id, stripped answer, accent free answer, [(learner, given answer), ...])
+CardTask = Tuple[int, str, str, List[Tuple[str, str]]]
+
+
+@dataclass
+class GradingReport:
+    """Summary of graded answer sheet"""
+
+    answers: int
+    cards: int
+    correct: int
+    unknown_cards: int
+    elapsed: float
+
+    def __str__(self):
+        rate = self.answers / self.elapsed if self.elapsed else 0.0
+        return (
+            f"Graded {self.answers} answers to {self.cards} cards in "
+            f"{self.elapsed:.3f}s ({rate:.1f} answers/s), {self.correct} correct, "
+            f"{self.unknown_cards} unknown cards skipped"
+        )
+
+
+def read_answer_sheet(file_path: str) -> Iterator[Tuple[str, int, str]]:
+    """Iterate over (learner, card_id, answer) rows of CSV or JSON Lines sheet"""
+    with open(file_path, "r", encoding="utf-8", newline="") as file_handle:
+        try:
+            if file_path.endswith(".jsonl"):
+                rows = (json.loads(line) for line in file_handle if line.strip())
+            else:
+                rows = csv.DictReader(file_handle)
+            for row in rows:
+                yield str(row["learner"]), int(row["card_id"]), str(row["answer"])
+        except (ValueError, KeyError) as err:
+            raise DeckLoadingError(
+                f"Malformed answer sheet {file_path!s}: {err!s}"
+            ) from err
+
+
+def grade_tasks(tasks: List["CardTask"]) -> List[Tuple[str, int, str, int]]:
+    """Grade chunk of card groups, returns (learner, card_id, answer, closeness)
+
+    Runs in worker process, so it gets and returns only plain values.
+    """
+    result = []
+    for card_id, stripped, unaccented, answers in tasks:
+        # learners often give the same answer, grade every distinct one once
+        graded: Dict[str, int] = {}
+        for learner, answer in answers:
+            if answer not in graded:
+                closeness = compare_prenormalized(answer, stripped, unaccented)
+                graded[answer] = closeness.value
+            result.append((learner, card_id, answer, graded[answer]))
+    return result
+
+
+def _chunk_tasks(tasks: List["CardTask"], chunk_size: int) -> Iterator[List]:
+    chunk, size = [], 0
+    for task in tasks:
+        chunk.append(task)
+        size += len(task[3])
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def grade_answer_sheet(
+    data_store: "Db",
+    file_path: str,
+    workers: Optional[int] = None,
+    accept: "Closeness" = Closeness.COMBINING_DISMATCH,
+    chunk_size: int = CHUNK_SIZE,
+) -> "GradingReport":
+    """Grade answer sheet against cards stored in database
+
+    Answer counts as correct when it is at least as close as ``accept``.
+    ``workers`` is size of process pool (default: number of CPUs), with 1
+    everything is graded in current process.
+    """
+    started = time.perf_counter()
+    by_card: Dict[int, List[Tuple[str, str]]] = {}
+    for learner, card_id, answer in read_answer_sheet(file_path):
+        by_card.setdefault(card_id, []).append((learner, answer))
+
+    correct_answers = data_store.get_card_answers(by_card)
+    unknown = [card_id for card_id in by_card if card_id not in correct_answers]
+    if unknown:
+        logging.warning("Answers to %d unknown cards skipped", len(unknown))
+    tasks = [
+        (card_id, *normalize_answer(correct_answers[card_id]), answers)
+        for card_id, answers in by_card.items()
+        if card_id in correct_answers
+    ]
+    chunks = list(_chunk_tasks(tasks, chunk_size))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        graded = map(grade_tasks, chunks)
+        results = [grade for chunk in graded for grade in chunk]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            graded = executor.map(grade_tasks, chunks)
+            results = [grade for chunk in graded for grade in chunk]
+
+    correct = 0
+    grades = []
+    for learner, card_id, answer, closeness in results:
+        status = (
+            GuessStatus.CORRECT if closeness <= accept.value else GuessStatus.FAILED
+        )
+        correct += status == GuessStatus.CORRECT
+        grades.append((learner, card_id, answer, status))
+    data_store.put_grades_into_database(grades)
+    return GradingReport(
+        answers=len(grades),
+        cards=len(tasks),
+        correct=correct,
+        unknown_cards=len(unknown),
+        elapsed=time.perf_counter() - started,
+    )
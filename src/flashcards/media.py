@@ -0,0 +1,207 @@
+"""
+Content addressed store for media files shipped with ANKI decks
+
+Media files are only registered on import, under name they have in their
+source archive. Decks remember that archive (``decks.media_source``), so card
+references resolve to files of its own package even when another package ships
+a different file with the same name. Blob is extracted from the source archive
+the first time card using it is displayed, and stored under its sha256 hash, so
+files with identical content share single copy.
+"""
+
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, List, Optional
+
+from flashcards.database import Db
+
+if TYPE_CHECKING:
+    # imported lazily at runtime, only annotations need it here
+    import zipfile
+
+MEDIA_MANIFEST = "media"
+DEFAULT_CACHE_LIMIT = 256 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_REFERENCE_RE = re.compile(
+    r"""<img[^>]*?\ssrc=["']?([^"'>\s]+)|\[sound:([^\]]+)\]""", re.IGNORECASE
+)
+
+
+def media_references(text: str) -> List[str]:
+    """List media file names referenced from card field"""
+    return [image or sound for image, sound in MEDIA_REFERENCE_RE.findall(text)]
+
+
+class MediaStore:
+    """Media files stored next to the database"""
+
+    def __init__(
+        self,
+        data_store: "Db",
+        root_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_CACHE_LIMIT,
+    ):
+        self.data_store = data_store
+        self.root_dir = root_dir or data_store.media_dir
+        self.max_bytes = max_bytes
+
+    def register_apkg(self, z_file: "zipfile.ZipFile", source_path: str) -> int:
+        """Register media files from opened apkg archive, nothing is extracted here
+
+        Rows are not committed, caller commits them together with decks of the
+        archive. Returns number of registered files.
+        """
+        try:
+            manifest = json.loads(z_file.read(MEDIA_MANIFEST) or b"{}")
+        except KeyError:
+            return 0
+        source_path = os.path.abspath(source_path)
+        cursor = self.data_store.conn.cursor()
+        rows = []
+        for member, file_name in manifest.items():
+            try:
+                info = z_file.getinfo(member)
+            except KeyError:
+                logging.warning("Media file %s missing in %s", file_name, source_path)
+                continue
+            rows.append((source_path, file_name, member, info.CRC, info.file_size))
+        # known blob is kept, when the same archive with unchanged file is imported
+        cursor.executemany(
+            """
+            INSERT INTO media(source_path, file_name, member, member_crc, member_size)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source_path, file_name) DO UPDATE SET
+                member=excluded.member,
+                blob_hash=CASE
+                    WHEN member_crc=excluded.member_crc
+                        AND member_size=excluded.member_size
+                    THEN blob_hash
+                    ELSE NULL
+                END,
+                member_crc=excluded.member_crc,
+                member_size=excluded.member_size
+            """,
+            rows,
+        )
+        logging.info("Registered %d media files from %s", len(rows), source_path)
+        return len(rows)
+
+    def blob_path(self, blob_hash: str) -> str:
+        """Path of blob with given hash"""
+        return os.path.join(self.root_dir, blob_hash[:2], blob_hash)
+
+    def path_for(self, file_name: str, deck_id: Optional[int]) -> Optional[str]:
+        """Path of media file referenced by card of the deck, extracted on first use
+
+        Decks imported before media were tracked per archive have no
+        ``media_source``, for them the most recently registered file of that
+        name is used. Returns None for unknown files or if source archive is gone.
+        """
+        cursor = self.data_store.conn.cursor()
+        row = cursor.execute(
+            """
+            SELECT media.source_path, member, blob_hash FROM media
+            LEFT JOIN decks ON decks.deck_id=:deck_id
+            WHERE file_name=:file_name
+                AND (decks.media_source IS NULL OR source_path=decks.media_source)
+            ORDER BY source_path=decks.media_source DESC, media.rowid DESC
+            LIMIT 1
+            """,
+            {"file_name": file_name, "deck_id": deck_id},
+        ).fetchone()
+        if row is None:
+            return None
+        blob_hash = row["blob_hash"]
+        if blob_hash is None or not os.path.exists(self.blob_path(blob_hash)):
+            blob_hash = self._extract(row["source_path"], row["member"])
+            if blob_hash is None:
+                return None
+            cursor.execute(
+                "UPDATE media SET blob_hash=? WHERE source_path=? AND file_name=?",
+                (blob_hash, row["source_path"], file_name),
+            )
+        cursor.execute(
+            "UPDATE media_blobs SET last_used=? WHERE blob_hash=?",
+            (datetime.now().isoformat(), blob_hash),
+        )
+        self.data_store.conn.commit()
+        self.evict()
+        return self.blob_path(blob_hash)
+
+    def _extract(self, source_path: str, member: str) -> Optional[str]:
+        """Stream member out of the archive into the store, returns blob hash"""
+        if not os.path.exists(source_path):
+            logging.warning("Media source %s no longer exists", source_path)
+            return None
+        # archives are opened only when media is shown, not at startup
+        import tempfile
+        import zipfile
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with zipfile.ZipFile(source_path, mode="r") as z_file:
+            with z_file.open(member) as src, tempfile.NamedTemporaryFile(
+                dir=self.root_dir, delete=False
+            ) as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+        blob_hash = digest.hexdigest()
+        target = self.blob_path(blob_hash)
+        if os.path.exists(target):
+            os.remove(dst.name)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(dst.name, target)
+        self.data_store.conn.execute(
+            """
+            INSERT OR IGNORE INTO media_blobs(blob_hash, blob_size, last_used)
+            VALUES (?, ?, ?)
+            """,
+            (blob_hash, size, datetime.now().isoformat()),
+        )
+        return blob_hash
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Remove least recently used blobs until store fits into ``max_bytes``
+
+        Only blobs which can be extracted again from their source archive are removed.
+        Returns number of freed bytes.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        cursor = self.data_store.conn.cursor()
+        total = cursor.execute(
+            "SELECT COALESCE(SUM(blob_size), 0) FROM media_blobs"
+        ).fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        freed = 0
+        candidates = cursor.execute(
+            "SELECT blob_hash, blob_size FROM media_blobs ORDER BY last_used ASC"
+        ).fetchall()
+        for blob_hash, blob_size in candidates:
+            if total - freed <= max_bytes:
+                break
+            sources = cursor.execute(
+                "SELECT DISTINCT source_path FROM media WHERE blob_hash=?",
+                (blob_hash,),
+            ).fetchall()
+            if not all(os.path.exists(src["source_path"]) for src in sources):
+                continue
+            if os.path.exists(self.blob_path(blob_hash)):
+                os.remove(self.blob_path(blob_hash))
+            cursor.execute(
+                "UPDATE media SET blob_hash=NULL WHERE blob_hash=?", (blob_hash,)
+            )
+            cursor.execute("DELETE FROM media_blobs WHERE blob_hash=?", (blob_hash,))
+            freed += blob_size
+        self.data_store.conn.commit()
+        logging.info("Evicted %d bytes of media", freed)
+        return freed
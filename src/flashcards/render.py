@@ -0,0 +1,93 @@
+"""
+Rendering of card fields into plain text
+
+ANKI fields hold HTML, entity escapes, ``[sound:...]`` references and cloze
+deletions (``{{c1::answer::hint}}``). Rendered question hides cloze deletions,
+rendered answer is plain text learner is expected to type.
+
+Fields are rendered once at import and stored next to raw ones in ``Db``.
+Cards which were not stored (or have no markup) are rendered at display time
+through a bounded cache.
+"""
+
+import functools
+import html
+import re
+from typing import Optional, Tuple
+
+from flashcards.cards import Card
+
+RENDER_CACHE_SIZE = 4096
+CLOZE_PLACEHOLDER = "[...]"
+
+# elements whose content is never shown
+_HIDDEN_ELEMENT_RE = re.compile(
+    r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+_LINE_BREAK_RE = re.compile(
+    r"<br\s*/?>|</?(?:div|p|li|tr|h[1-6])\b[^>]*>", re.IGNORECASE
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+_SOUND_RE = re.compile(r"\[sound:[^\]]*\]")
+_CLOZE_RE = re.compile(r"\{\{c\d+::(.*?)(?:::(.*?))?\}\}", re.DOTALL)
+_SPACES_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+_LINES_RE = re.compile(r" *\n[ \n]*")
+
+
+def html_to_text(text: str) -> str:
+    """Plain text of HTML field, line breaking elements become new lines"""
+    if "<" not in text and "&" not in text and "[sound:" not in text:
+        return text.strip()
+    text = _HIDDEN_ELEMENT_RE.sub("", text)
+    text = _LINE_BREAK_RE.sub("\n", text)
+    text = _TAG_RE.sub("", text)
+    text = _SOUND_RE.sub("", text)
+    text = html.unescape(text)
+    text = _SPACES_RE.sub(" ", text)
+    return _LINES_RE.sub("\n", text).strip()
+
+
+def _cloze_placeholder(match: "re.Match") -> str:
+    hint = match.group(2)
+    return f"[{hint}]" if hint else CLOZE_PLACEHOLDER
+
+
+def render_fields(question: str, answer: str) -> Tuple[str, str]:
+    """Rendered question and answer
+
+    When question has cloze deletions, they are hidden and joined deletions
+    become the answer, original answer field is then only extra information.
+    """
+    deletions = [match.group(1) for match in _CLOZE_RE.finditer(question)]
+    if deletions:
+        question = _CLOZE_RE.sub(_cloze_placeholder, question)
+        answer = ", ".join(deletions)
+    return html_to_text(question), html_to_text(answer).replace("\n", " ")
+
+
+def stored_fields(question: str, answer: str) -> Tuple[Optional[str], Optional[str]]:
+    """Rendered fields as stored in database, None where rendering changes nothing"""
+    rendered_question, rendered_answer = render_fields(question, answer)
+    return (
+        None if rendered_question == question else rendered_question,
+        None if rendered_answer == answer else rendered_answer,
+    )
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_cached(question: str, answer: str) -> Tuple[str, str]:
+    return render_fields(question, answer)
+
+
+def card_question(card: "Card") -> str:
+    """Question of the card as shown to learner"""
+    if card.rendered_question is not None:
+        return card.rendered_question
+    return _render_cached(card.question, card.answer)[0]
+
+
+def card_answer(card: "Card") -> str:
+    """Answer of the card learner is expected to give"""
+    if card.rendered_answer is not None:
+        return card.rendered_answer
+    return _render_cached(card.question, card.answer)[1]
@@ -0,0 +1,69 @@
+"""
+Leitner box scheduling
+
+Correct answer moves card one box up, wrong answer sends it back to the first
+box. Card is due again after interval of its box.
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+# days until next review for every box
+LEITNER_INTERVALS = (0, 1, 3, 7, 14, 30, 60, 120)
+
+
+@dataclass
+class CardSchedule:
+    """Scheduling state of single card"""
+
+    card_id: int
+    box: int
+    due: "datetime"
+    reviews: int
+    lapses: int
+
+    @classmethod
+    def from_row(cls, row):
+        """Constructor from table row"""
+        return cls(
+            card_id=row["card_id"],
+            box=row["box"],
+            due=datetime.fromisoformat(row["due"]),
+            reviews=row["reviews"],
+            lapses=row["lapses"],
+        )
+
+
+@dataclass
+class ScheduleColumns:
+    """Scheduling state of many cards stored column by column
+
+    Columns are compact ``array`` objects, NumPy can wrap them without copy.
+    """
+
+    # days from now until card is due, negative for overdue cards
+    due_days: "array" = field(default_factory=lambda: array("d"))
+    boxes: "array" = field(default_factory=lambda: array("b"))
+    # cards never reviewed, they have no schedule yet
+    new_cards: int = 0
+
+    def __len__(self):
+        return len(self.due_days)
+
+
+def review(
+    state: Optional["CardSchedule"], card_id: int, correct: bool, reviewed_at: datetime
+) -> "CardSchedule":
+    """State of the card after review, ``state`` is None for card never reviewed"""
+    if state is None:
+        state = CardSchedule(card_id, box=0, due=reviewed_at, reviews=0, lapses=0)
+    box = min(state.box + 1, len(LEITNER_INTERVALS) - 1) if correct else 0
+    return CardSchedule(
+        card_id=card_id,
+        box=box,
+        due=reviewed_at + timedelta(days=LEITNER_INTERVALS[box]),
+        reviews=state.reviews + 1,
+        lapses=state.lapses + (0 if correct else 1),
+    )
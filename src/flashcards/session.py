@@ -0,0 +1,269 @@
+"""
+Flashcard session engine
+
+Session knows nothing about user interface. Answers come from ``AnswerSource``
+and everything worth showing is reported to ``SessionObserver``, so the same
+engine drives console play, answer files and simulated learners.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+import enum
+import heapq
+import itertools
+import random
+import time
+from typing import Callable, Iterator, List, Optional
+
+from flashcards.cards import Card, Deck, Guess, GuessStatus
+from flashcards.database import Db
+from flashcards.render import card_answer
+from flashcards.utils import percentile
+
+
+def pick_cards(
+    cards: List["Card"], max_cards: int, rng: Optional[random.Random] = None
+) -> List["Card"]:
+    """Random selection of at most ``max_cards`` cards, cards are not copied"""
+    return (rng or random).sample(cards, min(max_cards, len(cards)))
+
+
+class InterleavePolicy(enum.Enum):
+    """How cards of many decks are mixed in single session"""
+
+    PRIORITY = "priority"  # most urgent card of all decks first
+    ROUND_ROBIN = "round-robin"  # one card from every deck in turn
+    RANDOM = "random"  # next card from randomly picked deck
+
+
+def mixed_queue(
+    data_store: "Db",
+    deck_ids: List[int],
+    max_cards: int,
+    policy: "InterleavePolicy" = InterleavePolicy.PRIORITY,
+    tag: Optional[str] = None,
+    rng: Optional[random.Random] = None,
+) -> List["Card"]:
+    """Cards for session over many decks
+
+    Every deck is queried in its own priority order (``Db.iter_study_queue``)
+    and queues are merged lazily, so only about ``max_cards`` rows per deck are read.
+    """
+    now = datetime.now()
+    queues = [data_store.iter_study_queue(deck_id, now, tag) for deck_id in deck_ids]
+    if policy == InterleavePolicy.PRIORITY:
+        merged: Iterator = heapq.merge(*queues, key=lambda item: item[0])
+    elif policy == InterleavePolicy.ROUND_ROBIN:
+        merged = _round_robin(queues)
+    else:
+        merged = _random_interleave(queues, rng or random.Random())
+    return [card for _priority, card in itertools.islice(merged, max_cards)]
+
+
+def _round_robin(queues: List[Iterator]) -> Iterator:
+    active = list(queues)
+    while active:
+        for queue in list(active):
+            item = next(queue, None)
+            if item is None:
+                active.remove(queue)
+            else:
+                yield item
+
+
+def _random_interleave(queues: List[Iterator], rng: random.Random) -> Iterator:
+    active = list(queues)
+    while active:
+        queue = rng.choice(active)
+        item = next(queue, None)
+        if item is None:
+            active.remove(queue)
+        else:
+            yield item
+
+
+def check_answer(card: "Card", answer: str) -> bool:
+    """Default grader, case insensitive comparison with rendered answer"""
+    return answer.strip().lower() == card_answer(card).strip().lower()
+
+
+class AnswerSource(ABC):
+    """Source of answers given during session"""
+
+    @abstractmethod
+    def answer(self, card: "Card", try_number: int) -> str:
+        """Answer for the card, ``try_number`` starts at 1"""
+
+
+class StdinAnswerSource(AnswerSource):
+    """Answers typed by user"""
+
+    def answer(self, card: "Card", try_number: int) -> str:
+        return input("You answer: ")
+
+
+class FileAnswerSource(AnswerSource):
+    """Answers read line by line from file, empty answer when file is exhausted"""
+
+    def __init__(self, file_path: str):
+        with open(file_path, "r", encoding="utf-8") as file_handle:
+            self._answers = [line.rstrip("\n") for line in file_handle]
+        self._position = 0
+
+    def answer(self, card: "Card", try_number: int) -> str:
+        if self._position >= len(self._answers):
+            return ""
+        self._position += 1
+        return self._answers[self._position - 1]
+
+
+class SimulatedLearner(AnswerSource):
+    """Learner answering correctly with probability ``accuracy``"""
+
+    def __init__(self, accuracy: float = 0.7, seed: Optional[int] = None):
+        self.accuracy = accuracy
+        self._random = random.Random(seed)
+
+    def answer(self, card: "Card", try_number: int) -> str:
+        if self._random.random() < self.accuracy:
+            return card_answer(card)
+        return card_answer(card)[::-1] + "?"
+
+
+class SessionObserver:
+    """Receives session events, does nothing by default"""
+
+    def card_shown(self, card: "Card"):
+        """New card is asked"""
+
+    def wrong_answer(self, card: "Card", answer: str, try_number: int, max_tries: int):
+        """Answer was not correct, but there are tries left"""
+
+    def card_finished(self, guess: "Guess"):
+        """Card is answered or out of tries"""
+
+    def session_finished(self, guesses: List["Guess"]):
+        """All cards are done"""
+
+
+class Session:
+    """Single run over selected cards"""
+
+    def __init__(
+        self,
+        cards: List["Card"],
+        answer_source: "AnswerSource",
+        max_tries: int = 5,
+        observer: Optional["SessionObserver"] = None,
+        grader: Callable[["Card", str], bool] = check_answer,
+    ):
+        self.cards = list(cards)
+        self.answer_source = answer_source
+        self.max_tries = max_tries
+        self.observer = observer or SessionObserver()
+        self.grader = grader
+        self.guesses: List["Guess"] = []
+        # seconds spent in grader, one entry per answer
+        self.grading_times: List[float] = []
+
+    def ask(self, card: "Card") -> "Guess":
+        """Ask single card until correct answer or out of tries"""
+        guess = Guess(card=card, tries=[], status=GuessStatus.FAILED, guess_ts=None)
+        self.observer.card_shown(card)
+        for try_number in range(1, self.max_tries + 1):
+            answer = self.answer_source.answer(card, try_number)
+            guess.tries.append(answer.strip())
+            started = time.perf_counter()
+            correct = self.grader(card, answer)
+            self.grading_times.append(time.perf_counter() - started)
+            if correct:
+                guess.status = GuessStatus.CORRECT
+                break
+            if try_number < self.max_tries:
+                self.observer.wrong_answer(card, answer, try_number, self.max_tries)
+        guess.guess_ts = datetime.now()
+        self.observer.card_finished(guess)
+        return guess
+
+    def run(self) -> List["Guess"]:
+        """Ask every card, returns list of guesses"""
+        for card in self.cards:
+            self.guesses.append(self.ask(card))
+        self.observer.session_finished(self.guesses)
+        return self.guesses
+
+
+@dataclass
+class BatchReport:
+    """Throughput of batch of sessions"""
+
+    sessions: int
+    answers: int
+    elapsed: float
+    grading_p50: float
+    grading_p90: float
+    grading_p99: float
+    rows_written: int
+    write_time: float
+
+    @property
+    def sessions_per_second(self) -> float:
+        """Finished sessions per second"""
+        return self.sessions / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Progress rows written per second of database time"""
+        return self.rows_written / self.write_time if self.write_time else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.sessions} sessions in {self.elapsed:.3f}s "
+            f"({self.sessions_per_second:.1f} sessions/s, {self.answers} answers)\n"
+            f"grading latency p50={self.grading_p50 * 1e6:.1f}us "
+            f"p90={self.grading_p90 * 1e6:.1f}us p99={self.grading_p99 * 1e6:.1f}us\n"
+            f"db writes: {self.rows_written} rows in {self.write_time:.3f}s "
+            f"({self.rows_per_second:.1f} rows/s)"
+        )
+
+
+def run_batch(
+    data_store: "Db",
+    deck: "Deck",
+    sessions: int,
+    answer_source_factory: Callable[[int], "AnswerSource"],
+    max_cards: int = 5,
+    max_tries: int = 5,
+) -> "BatchReport":
+    """Run ``sessions`` sessions over the deck, progress is saved after each one
+
+    ``answer_source_factory`` gets session number and returns its answer source.
+    """
+    rng = random.Random(0)
+    grading_times: List[float] = []
+    rows_written = 0
+    write_time = 0.0
+    started = time.perf_counter()
+    for number in range(sessions):
+        session = Session(
+            pick_cards(deck.cards, max_cards, rng),
+            answer_source_factory(number),
+            max_tries=max_tries,
+        )
+        guesses = session.run()
+        grading_times.extend(session.grading_times)
+        write_started = time.perf_counter()
+        data_store.put_guesses_into_database(guesses)
+        write_time += time.perf_counter() - write_started
+        rows_written += len(guesses)
+    return BatchReport(
+        sessions=sessions,
+        answers=len(grading_times),
+        elapsed=time.perf_counter() - started,
+        grading_p50=percentile(grading_times, 50),
+        grading_p90=percentile(grading_times, 90),
+        grading_p99=percentile(grading_times, 99),
+        rows_written=rows_written,
+        write_time=write_time,
+    )
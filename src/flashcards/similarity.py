@@ -0,0 +1,154 @@
+"""
+Near duplicate card detection
+
+Cards are turned into sets of character n-gram shingles and summarized with
+MinHash signatures. Locality sensitive hashing splits signatures into bands,
+cards sharing any band bucket become candidate pairs. Only candidates are
+compared exactly, which keeps the whole search roughly linear in number of cards.
+
+Cards with identical text are grouped before hashing, every other card of the
+group is reported paired with its first card. Jaccard similarity of two sets
+can not exceed ratio of their sizes, so oversized buckets are sorted by shingle
+count and every card is compared only with following cards of similar count,
+at most ``BUCKET_WINDOW`` of them.
+"""
+
+from dataclasses import dataclass
+import itertools
+import logging
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from flashcards.cards import Card
+from flashcards.utils import levenshtein, normalize_text
+
+SHINGLE_SIZE = 3
+SIGNATURE_SIZE = 32
+BANDS = 8
+# buckets bigger than this are compared only within window of similar sizes
+MAX_BUCKET_SIZE = 256
+# card of oversized bucket is compared with at most this many neighbours
+BUCKET_WINDOW = 64
+
+# every "permutation" is xor with random mask applied to 64 bit shingle hash
+_MASKS = [random.Random(seed).getrandbits(64) for seed in range(SIGNATURE_SIZE)]
+
+
+@dataclass
+class NearDuplicate:
+    """Pair of similar cards"""
+
+    left: "Card"
+    right: "Card"
+    similarity: float
+    distance: Optional[int] = None
+
+
+def card_text(card: "Card", field: str = "question") -> str:
+    """Text of the card used for comparison, ``field`` is question, answer or both"""
+    if field == "both":
+        return normalize_text(card.question) + " | " + normalize_text(card.answer)
+    return normalize_text(getattr(card, field))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Set of hashed character n-grams, hashes are stable within single process"""
+    if len(text) <= size:
+        return {hash(text) & 0xFFFFFFFFFFFFFFFF}
+    return {
+        hash(text[i : i + size]) & 0xFFFFFFFFFFFFFFFF
+        for i in range(len(text) - size + 1)
+    }
+
+
+def minhash_signature(shingle_set: Set[int]) -> List[int]:
+    """MinHash signature of shingle set"""
+    return [min(map(mask.__xor__, shingle_set)) for mask in _MASKS]
+
+
+def band_keys(signature: List[int], bands: int = BANDS) -> Iterator[Tuple[int, int]]:
+    """Bucket key for every band of signature"""
+    rows = len(signature) // bands
+    for band in range(bands):
+        yield band, hash(tuple(signature[band * rows : (band + 1) * rows]))
+
+
+def jaccard(left: Set[int], right: Set[int]) -> float:
+    """Jaccard similarity of two sets"""
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def _size_window_pairs(
+    members: List[int], sizes: Dict[int, int], threshold: float
+) -> Iterator[Tuple[int, int]]:
+    """Pairs of bucket members whose shingle counts allow ``threshold`` similarity
+
+    Every member is paired with at most ``BUCKET_WINDOW`` following members.
+    """
+    ordered = sorted(members, key=sizes.__getitem__)
+    for position, left in enumerate(ordered):
+        for right in ordered[position + 1 : position + 1 + BUCKET_WINDOW]:
+            if sizes[left] < threshold * sizes[right]:
+                break
+            yield min(left, right), max(left, right)
+
+
+def find_near_duplicates(
+    cards: Iterable["Card"],
+    field: str = "question",
+    threshold: float = 0.6,
+    max_distance: Optional[int] = None,
+) -> List["NearDuplicate"]:
+    """Find pairs of cards with similar text
+
+    ``threshold`` is minimal Jaccard similarity of shingle sets. When ``max_distance``
+    is given, pairs are additionally checked with edit distance.
+    """
+    texts: Dict[int, str] = {}
+    by_id: Dict[int, "Card"] = {}
+    # text -> card_id of first card with that text
+    first_with_text: Dict[str, int] = {}
+    shingle_sets: Dict[int, Set[int]] = {}
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    result = []
+    for card in cards:
+        text = card_text(card, field)
+        by_id[card.card_id] = card
+        first_id = first_with_text.setdefault(text, card.card_id)
+        if first_id != card.card_id:
+            distance = None if max_distance is None else 0
+            result.append(NearDuplicate(by_id[first_id], card, 1.0, distance))
+            continue
+        texts[card.card_id] = text
+        shingle_set = shingles(text)
+        shingle_sets[card.card_id] = shingle_set
+        for key in band_keys(minhash_signature(shingle_set)):
+            buckets.setdefault(key, []).append(card.card_id)
+
+    candidates: Set[Tuple[int, int]] = set()
+    for key, members in buckets.items():
+        if len(members) > MAX_BUCKET_SIZE:
+            logging.info("LSH bucket %r with %d cards split by size", key, len(members))
+            sizes = {member: len(shingle_sets[member]) for member in members}
+            candidates.update(_size_window_pairs(members, sizes, threshold))
+        else:
+            candidates.update(itertools.combinations(sorted(members), 2))
+    logging.info("%d candidate pairs out of %d cards", len(candidates), len(texts))
+
+    for left_id, right_id in candidates:
+        left_text, right_text = texts[left_id], texts[right_id]
+        similarity = jaccard(shingle_sets[left_id], shingle_sets[right_id])
+        if similarity < threshold:
+            continue
+        distance = None
+        if max_distance is not None:
+            distance = levenshtein(left_text, right_text)
+            if distance > max_distance:
+                continue
+        result.append(
+            NearDuplicate(by_id[left_id], by_id[right_id], similarity, distance)
+        )
+    result.sort(key=lambda pair: (-pair.similarity, pair.left.card_id))
+    return result
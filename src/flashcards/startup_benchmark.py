@@ -0,0 +1,89 @@
+"""
+Cold start benchmark of command line and GUI entry points
+
+Every run starts fresh interpreter, so imports, opening of database and
+reading of deck catalog are measured as user waits for them. GUI is measured
+until it has the deck catalog it shows first, without creating windows, so the
+benchmark runs without display.
+"""
+
+from dataclasses import dataclass, field
+import os
+import sys
+import time
+from typing import Dict, List
+
+from flashcards.defaults import DEFAULT_RUNS, STARTUP_TARGET
+from flashcards.utils import percentile
+
+UI_PROBE = """
+import sys
+import flashcards.ui
+from flashcards.cache import DeckCache
+from flashcards.database import Db
+
+DeckCache(Db(sys.argv[1])).get_deck_summaries()
+"""
+
+
+@dataclass
+class StartupReport:
+    """Wall times of cold starts per entry point, in seconds"""
+
+    runs: Dict[str, List[float]] = field(default_factory=dict)
+    target: float = STARTUP_TARGET
+
+    def median(self, name: str) -> float:
+        """Median cold start of entry point"""
+        return percentile(self.runs[name], 50)
+
+    @property
+    def passed(self) -> bool:
+        """True when median of every entry point meets the target"""
+        return all(self.median(name) <= self.target for name in self.runs)
+
+    def __str__(self):
+        lines = []
+        for name, times in self.runs.items():
+            lines.append(
+                f"{name}: min={min(times) * 1e3:.1f}ms "
+                f"p50={self.median(name) * 1e3:.1f}ms "
+                f"max={max(times) * 1e3:.1f}ms ({len(times)} runs)"
+            )
+        verdict = "met" if self.passed else "MISSED"
+        lines.append(f"target p50 <= {self.target * 1e3:.0f}ms {verdict}")
+        return "\n".join(lines)
+
+
+def _probe_commands(db_path: str) -> Dict[str, List[str]]:
+    return {
+        "python": [sys.executable, "-c", "pass"],
+        "cli": [sys.executable, "-m", "flashcards.cli", "decks", "--db", db_path],
+        "ui": [sys.executable, "-c", UI_PROBE, db_path],
+    }
+
+
+def measure_startup(
+    db_path: str, runs: int = DEFAULT_RUNS, target: float = STARTUP_TARGET
+) -> "StartupReport":
+    """Run every entry point ``runs`` times, bare interpreter is measured too
+
+    Runs of entry points are interleaved, so noise of the machine is spread
+    evenly over them.
+    """
+    # constants of this module are read by every CLI start, keep import light
+    import subprocess
+
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")])
+    )
+    commands = _probe_commands(os.path.abspath(db_path))
+    report = StartupReport(runs={name: [] for name in commands}, target=target)
+    for _ in range(runs):
+        for name, command in commands.items():
+            started = time.perf_counter()
+            subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+            report.runs[name].append(time.perf_counter() - started)
+    return report
@@ -0,0 +1,227 @@
+"""
+Opt-in latency tracing
+
+Spans are recorded only while ``TRACER`` is enabled, set ``FLASHCARDS_TRACE``
+to path of trace file to enable it for GUI session. At exit spans are written
+as Chrome trace-event JSON (open in chrome://tracing or Perfetto) together with
+latency percentiles per span name, which are also logged.
+
+Disabled tracer costs one attribute check per traced call.
+"""
+
+import atexit
+import contextlib
+from dataclasses import dataclass
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flashcards.utils import percentile
+
+TRACE_ENV = "FLASHCARDS_TRACE"
+
+
+@dataclass
+class Span:
+    """Single timed call, times are ``time.perf_counter`` seconds"""
+
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread_id: int
+
+
+@dataclass
+class LatencySummary:
+    """Latency percentiles of spans with the same name, in seconds"""
+
+    count: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+    @classmethod
+    def from_durations(cls, durations: List[float]) -> "LatencySummary":
+        """Summary of span durations"""
+        return cls(
+            count=len(durations),
+            p50=percentile(durations, 50),
+            p90=percentile(durations, 90),
+            p99=percentile(durations, 99),
+            max=max(durations, default=0.0),
+        )
+
+    def __str__(self):
+        return (
+            f"{self.count} calls p50={self.p50 * 1e3:.2f}ms "
+            f"p90={self.p90 * 1e3:.2f}ms p99={self.p99 * 1e3:.2f}ms "
+            f"max={self.max * 1e3:.2f}ms"
+        )
+
+
+class Tracer:
+    """Collects spans of traced calls while enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: List["Span"] = []
+        self._origin = time.perf_counter()
+
+    def record(self, name: str, category: str, start: float, end: float):
+        """Add span measured by caller"""
+        if self.enabled:
+            self.spans.append(
+                Span(name, category, start, end - start, threading.get_ident())
+            )
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "ui"):
+        """Time the block as span"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, started, time.perf_counter())
+
+    def summary(self) -> Dict[str, "LatencySummary"]:
+        """Latency percentiles per span name"""
+        durations: Dict[str, List[float]] = {}
+        for span in self.spans:
+            durations.setdefault(span.name, []).append(span.duration)
+        return {
+            name: LatencySummary.from_durations(values)
+            for name, values in sorted(durations.items())
+        }
+
+    def write_chrome_trace(self, file_path: str):
+        """Write spans as Chrome trace-event JSON, percentiles go to ``otherData``"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start - self._origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+            }
+            for span in self.spans
+        ]
+        latency = {
+            name: {
+                "count": summary.count,
+                "p50_ms": summary.p50 * 1e3,
+                "p90_ms": summary.p90 * 1e3,
+                "p99_ms": summary.p99 * 1e3,
+                "max_ms": summary.max * 1e3,
+            }
+            for name, summary in self.summary().items()
+        }
+        with open(file_path, "w", encoding="utf-8") as file_handle:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"latency": latency},
+                },
+                file_handle,
+            )
+
+    def finish(self, file_path: str):
+        """Log latency summary and write trace file"""
+        for name, summary in self.summary().items():
+            logging.info("Latency of %s: %s", name, summary)
+        self.write_chrome_trace(file_path)
+        logging.info("Trace of %d spans written to %s", len(self.spans), file_path)
+
+
+TRACER = Tracer()
+
+
+def enable_from_environment() -> Optional[str]:
+    """Enable ``TRACER`` when ``FLASHCARDS_TRACE`` is set, trace is written at exit
+
+    Returns path of trace file, None when tracing stays disabled.
+    """
+    file_path = os.environ.get(TRACE_ENV, "")
+    if not file_path or TRACER.enabled:
+        return None
+    TRACER.enabled = True
+    atexit.register(TRACER.finish, file_path)
+    return file_path
+
+
+def traced(name: Optional[str] = None, category: str = "ui") -> Callable:
+    """Decorator recording every call of the function as span"""
+
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return function(*args, **kwargs)
+            with TRACER.span(span_name, category):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_handler(method: Callable) -> Callable:
+    """Decorator for event handlers of Tk widgets
+
+    Besides span of the handler itself, span ``<handler> -> idle`` lasts from
+    start of the handler until Tk runs idle callbacks, which happens after
+    redraws queued by the handler, so it covers the wait for repaint.
+    """
+    span_name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(widget, *args, **kwargs):
+        if not TRACER.enabled:
+            return method(widget, *args, **kwargs)
+        started = time.perf_counter()
+        with TRACER.span(span_name, "ui"):
+            result = method(widget, *args, **kwargs)
+        widget.after_idle(
+            lambda: TRACER.record(
+                f"{span_name} -> idle", "ui", started, time.perf_counter()
+            )
+        )
+        return result
+
+    return wrapper
+
+
+def trace_calls(
+    target: Any, category: str, names: Optional[Iterable[str]] = None
+) -> Any:
+    """Record calls of public methods of the object (or just ``names``) as spans
+
+    Methods are wrapped on the instance, other instances are not affected.
+    Does nothing while tracer is disabled, returns the object.
+    """
+    if not TRACER.enabled or getattr(target, "_traced_category", None):
+        return target
+    if names is None:
+        names = [name for name in dir(type(target)) if not name.startswith("_")]
+    for name in names:
+        method = getattr(target, name, None)
+        if not callable(method) or isinstance(method, type):
+            continue
+        span_name = f"{type(target).__name__}.{name}"
+        setattr(target, name, traced(span_name, category)(method))
+    target._traced_category = category
+    return target
@@ -6,21 +6,35 @@ GUI entry point
 from datetime import datetime
 import logging
 import os
+import threading
 import tkinter as tk
 from tkinter import ttk
-from tkinter.filedialog import askopenfilename
-from tkinter.messagebox import showerror
-from typing import List
+from tkinter.filedialog import askdirectory, askopenfilename
+from tkinter.messagebox import showerror, showinfo
+from typing import List, Optional
 
+from flashcards.answer_index import AnswerIndex
 import flashcards.utils as utils
-from flashcards.cards import Deck, Guess, GuessStatus
+from flashcards.cache import DeckCache
+from flashcards.cards import Deck, DeckSummary, Guess, GuessStatus
 from flashcards.database import Db
-from flashcards.fileloaders import load_from_json_file, load_anki2_file, load_apkg_file
+from flashcards.media import MediaStore, media_references
+from flashcards.render import card_answer, card_question
+from flashcards.session import mixed_queue
+from flashcards.tracing import (
+    enable_from_environment,
+    trace_calls,
+    traced,
+    traced_handler,
+)
 from flashcards.ui_custom_dialogs import DeckListDialog
 
 MAX_TRIES = 5
 MAX_CARDS = 5
 DEFAULT_SAVE_FILE_NAME = "test.db"
+# serve database from memory during session, set FLASHCARDS_HOT_DB=1 to enable;
+# the session must be the only writer of the database file meanwhile
+HOT_DATABASE = os.environ.get("FLASHCARDS_HOT_DB", "") == "1"
 
 
 class NotLoadedError(Exception):
@@ -49,6 +63,10 @@ class StatusBar(tk.Frame):
         self._try_number_lbl = tk.Label(self, textvariable=self._try_number_text)
         self._try_number_lbl.pack(side="right")
 
+        self._hint_text = tk.StringVar()
+        self._hint_lbl = tk.Label(self, textvariable=self._hint_text)
+        self._hint_lbl.pack(side="bottom")
+
         self.max_card_count = MAX_CARDS
         self.max_tries_count = MAX_TRIES
         self.card = 1
@@ -67,6 +85,10 @@ class StatusBar(tk.Frame):
         self._card_info_text.set(f"{self.card} out of {self.max_card_count}")
         self._try_number_text.set(f"{self.tries_count}/{self.max_tries_count}")
 
+    def update_hint(self, text: str = ""):
+        """Show answer hint, empty text clears it"""
+        self._hint_text.set(text)
+
 
 class GuessView(tk.Frame):
     """Main guessing mode view"""
@@ -89,6 +111,7 @@ class GuessView(tk.Frame):
             self, font=("Arial 16"), textvariable=self.entry_box_val
         )
         self.entry_box.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.entry_box.bind("<Tab>", self.complete_answer)
         self.check_btn = tk.Button(
             self, text="Check Answer", command=self.check_answer, width=6, height=6
         )
@@ -98,22 +121,58 @@ class GuessView(tk.Frame):
         self.current_try = 1
         self.guesses = []
         self.current_guess = None
-
-    def load_deck(self, deck: "Deck"):
-        """Load deck into guess view"""
+        self.card_image = None
+        self.answer_index = None
+
+    def show_card_text(
+        self, text: str, raw_text: str = "", deck_id: Optional[int] = None
+    ):
+        """Show text on card label, with first displayable image it references
+
+        Media references are looked up in ``raw_text`` (field before rendering)
+        when it is given, and resolved among media of deck ``deck_id``.
+        """
+        self.card_label_txt.set(text)
+        self.card_image = None
+        media_store = self.master.media_store
+        if media_store is not None:
+            for file_name in media_references(raw_text or text):
+                image_path = media_store.path_for(file_name, deck_id)
+                if image_path is None:
+                    continue
+                try:
+                    self.card_image = tk.PhotoImage(file=image_path)
+                    break
+                except tk.TclError:
+                    # sound or image format not supported by tk
+                    continue
+        self.card_label.configure(image=self.card_image or "", compound="top")
+
+    def load_deck(self, deck: "Deck", ordered: bool = False):
+        """Load deck into guess view, ``ordered`` deck is played in its card order"""
         self.deck = deck
-        self.cards = utils.clone_cards(deck.cards, MAX_CARDS)
+        # BK-trees of big deck take seconds, they are built off the Tk thread and
+        # hints are skipped until the index is ready
+        self.answer_index = AnswerIndex.from_cards(deck.cards)
+        threading.Thread(target=self.answer_index.build, daemon=True).start()
+        if ordered:
+            # cards are popped from the end
+            self.cards = list(reversed(deck.cards))
+        else:
+            self.cards = utils.clone_cards(deck.cards, MAX_CARDS)
         if not self.cards:
             showerror("Empty deck", "Empty deck: " + self.deck.deck_name)
             self.master.quit()
             return
         self.master.status_bar.max_card_count = len(self.cards)
         self.master.status_bar.update_play_info(1, 1)
+        self.master.status_bar.update_hint()
         self.current_guess = Guess(self.cards.pop(), [], GuessStatus.FAILED, guess_ts=None)
         self.guesses = []
         self.check_btn.configure(text="Check", command=self.check_answer)
         self.card_label.configure(background="cyan")
-        self.card_label_txt.set(self.current_guess.card.question)
+        card = self.current_guess.card
+        self.show_card_text(card_question(card), card.question, card.deck_id)
 
     def push_guess_with_status(self, status: GuessStatus = GuessStatus.FAILED):
         """Push guess from current_guess with assigned status"""
@@ -122,6 +181,7 @@ class GuessView(tk.Frame):
         self.guesses.append(self.current_guess)
         self.current_guess = None
 
+    @traced_handler
     def show_final_view(self):
         """Show results"""
         self.master.show_final_view(self.guesses)
@@ -129,15 +189,29 @@ class GuessView(tk.Frame):
     def update_check_button(self):
         """Update check btn based on how many cards are left"""
 
+    @traced_handler
+    def complete_answer(self, _event=None) -> str:
+        """Complete typed answer to the first answer of deck starting with it"""
+        if self.answer_index is not None and self.answer_index.ready:
+            completions = self.answer_index.complete(self.entry_box_val.get())
+            if completions:
+                self.entry_box_val.set(completions[0])
+                self.entry_box.icursor("end")
+                self.master.status_bar.update_hint(" | ".join(completions))
+        # keep focus in entry box
+        return "break"
+
+    @traced_handler
     def check_answer(self):
         """Check answer command handler"""
         card = self.current_guess.card
         answer = self.entry_box_val.get()
         self.entry_box_val.set("")
         self.current_guess.tries.append(answer)
-        if card.answer == answer:
+        self.master.status_bar.update_hint()
+        if card_answer(card) == answer:
             self.push_guess_with_status(GuessStatus.CORRECT)
-            self.card_label_txt.set(card.answer)
+            self.show_card_text(card_answer(card), card.answer, card.deck_id)
             self.card_label.configure(background="green")
             if self.cards:
                 self.check_btn.configure(command=self.load_next_card, text="Next card")
@@ -151,11 +225,12 @@ class GuessView(tk.Frame):
                     tries=len(self.current_guess.tries) + 1
                 )
                 self.blink_error()
+                self.show_typo_hint(answer)
                 self.check_btn.configure(command=self.check_answer, text="Try again")
             else:
                 self.current_guess.tries.append(answer)
                 self.push_guess_with_status(GuessStatus.FAILED)
-                self.card_label_txt.set(card.answer)
+                self.show_card_text(card_answer(card), card.answer, card.deck_id)
                 self.card_label.configure(background="red")
                 if self.cards:
                     self.check_btn.configure(
@@ -166,19 +241,34 @@ class GuessView(tk.Frame):
                         command=self.show_final_view, text="Show results"
                     )
 
+    def show_typo_hint(self, answer: str):
+        """Suggest answer of the deck close to the wrong one"""
+        if self.answer_index is None or not self.answer_index.ready:
+            return
+        if not answer.strip():
+            return
+        suggestion = self.answer_index.did_you_mean(answer)
+        if suggestion is not None:
+            self.master.status_bar.update_hint(f"Did you mean: {suggestion}?")
+
+    @traced_handler
     def load_next_card(self):
         """Loading next card"""
         assert len(self.cards) > 0, "Number of cards remaining is larger then 0"
         self.current_guess = Guess(self.cards.pop(), [], GuessStatus.FAILED, None)
         self.current_try = 1
         self.master.status_bar.update_play_info(card=len(self.guesses) + 1, tries=1)
+        self.master.status_bar.update_hint()
         self.check_btn.configure(text="Check", command=self.check_answer)
         self.card_label.configure(background="cyan")
-        self.card_label_txt.set(self.current_guess.card.question)
+        card = self.current_guess.card
+        self.show_card_text(card_question(card), card.question, card.deck_id)
 
+    @traced_handler
     def blink_error(self):
         """Blink card label red on incorrect answer"""
 
+        @traced("GuessView.blink_error.blink")
         def blink():
             self.card_label.configure(background="red")
             self.card_label.after(
@@ -224,12 +314,18 @@ class App(tk.Tk):
         file_menu = tk.Menu(self.menu_bar, tearoff=0)
         file_menu.add_command(label="Load", command=self.load_user_data_store_dialog)
         file_menu.add_command(label="Select Deck", command=self.select_deck_cmd)
+        file_menu.add_command(
+            label="Study All Decks (Mixed)", command=self.mixed_session_cmd
+        )
         file_menu.add_command(
             label="Import New Deck (JSON)", command=self.import_new_deck_dialog
         )
         file_menu.add_command(
             label="Import New Deck (ANKI)", command=self.import_new_anki_deck_dialog
         )
+        file_menu.add_command(
+            label="Import Directory", command=self.import_directory_dialog
+        )
 
         # file_menu.add_command(label="Edit Deck", command=self._edit_deck_cmd)
         self.menu_bar.add_cascade(label="File", menu=file_menu)
@@ -238,9 +334,18 @@ class App(tk.Tk):
 
         self.data_store = None
         self.deck = None
+        self._media_store = None
+        self._deck_cache = None
+
+        # window is painted before anything is read from database
+        self.after_idle(self.open_data_store_cmd)
 
+    def open_data_store_cmd(self):
+        """Open saved data store (or ask user for one) and let user pick deck"""
         if os.path.exists(DEFAULT_SAVE_FILE_NAME):
-            self.data_store = Db(DEFAULT_SAVE_FILE_NAME)
+            self.data_store = trace_calls(
+                Db(DEFAULT_SAVE_FILE_NAME, in_memory=HOT_DATABASE), "db"
+            )
         else:
             self.load_user_data_store_dialog()
 
@@ -249,26 +354,68 @@ class App(tk.Tk):
         # select deck
         self.select_deck_cmd()
 
+    @property
+    def media_store(self) -> "MediaStore":
+        """Media store of currently opened data store"""
+        if self.data_store is None:
+            return None
+        if (
+            self._media_store is None
+            or self._media_store.data_store is not self.data_store
+        ):
+            self._media_store = trace_calls(
+                MediaStore(self.data_store), "media", ["path_for"]
+            )
+        return self._media_store
+
+    @property
+    def deck_cache(self) -> "DeckCache":
+        """Read cache of currently opened data store"""
+        if (
+            self._deck_cache is None
+            or self._deck_cache.data_store is not self.data_store
+        ):
+            self._deck_cache = DeckCache(self.data_store)
+        return self._deck_cache
+
     def select_deck_cmd(self):
-        decks = self.data_store.get_all_decks()
-        if not decks:
+        """Let user pick one of the stored decks"""
+        summaries = self.deck_cache.get_deck_summaries()
+        if not summaries:
             self.import_new_deck_dialog()
-            decks = self.data_store.get_all_decks()
-        if len(decks) == 1:
-            self.prepare_deck(decks[0])
+            summaries = self.deck_cache.get_deck_summaries()
+        if len(summaries) == 1:
+            self.prepare_deck_summary(summaries[0])
         else:
-            list_dialog = DeckListDialog(self, decks, on_change=self.prepare_deck)
+            list_dialog = DeckListDialog(
+                self, summaries, on_change=self.prepare_deck_summary
+            )
             list_dialog.wait_window()
 
-    def prepare_deck(self, deck: "Deck"):
+    @traced_handler
+    def mixed_session_cmd(self):
+        """Play most urgent cards of all stored decks"""
+        deck_ids = self.data_store.find_deck_ids()
+        cards = mixed_queue(self.data_store, deck_ids, MAX_CARDS)
+        deck = Deck(0, f"Mixed: {len(deck_ids)} decks", "", cards)
+        self.prepare_deck(deck, ordered=True)
+
+    @traced_handler
+    def prepare_deck_summary(self, summary: "DeckSummary"):
+        """Load deck picked from deck list"""
+        self.prepare_deck(self.deck_cache.get_deck_from_database(summary.deck_id))
+
+    def prepare_deck(self, deck: "Deck", ordered: bool = False):
         """Load new deck"""
         self.deck = deck
         self.status_bar.max_card_count = min(len(self.deck.cards), MAX_CARDS)
         self.status_bar.update_deck_name(self.deck)
-        self.guess_view.load_deck(self.deck)
+        self.guess_view.load_deck(self.deck, ordered)
 
     def show_final_view(self, guesses):
-        """Toggle on final view"""
+        """Save guesses of finished session and toggle on final view"""
+        # every played deck comes from database, mixed queue then moves on
+        self.data_store.put_guesses_into_database(guesses)
         self.toggle(self.guess_view)
         self.final_view.update_view_state(guesses)
         self.toggle(self.final_view)
@@ -286,6 +433,9 @@ class App(tk.Tk):
 
     def import_new_anki_deck_dialog(self):
         """Load new ANKI deck"""
+        # loaders are imported on first import, they are not needed at startup
+        from flashcards.fileloaders import load_anki2_file, load_apkg_file
+
         anki_file = askopenfilename(
             initialdir=".",
             title="Pick deck in ANKI format",
@@ -310,6 +460,8 @@ class App(tk.Tk):
 
     def import_new_deck_dialog(self):
         """Load new deck"""
+        from flashcards.fileloaders import load_from_json_file, load_from_jsonl_file
+
         json_file = askopenfilename(
             initialdir=".",
             title="Pick deck JSON file",
@@ -321,13 +473,32 @@ class App(tk.Tk):
             ),
         )
         try:
-            load_from_json_file(json_file, self.data_store)
+            if json_file.endswith(".jsonl"):
+                load_from_jsonl_file(json_file, self.data_store)
+            else:
+                load_from_json_file(json_file, self.data_store)
         except Exception as ex:  # pylint: disable=broad-except
             # anything wrong happen - log it
             logging.error(str(ex))
             print(f"[ERROR] {ex!r}")
             showerror("Error occured while import new deck")
 
+    def import_directory_dialog(self):
+        """Import every deck file found in picked directory"""
+        from flashcards.batch_import import import_directory
+
+        directory = askdirectory(initialdir=".", title="Pick directory with decks")
+        if not directory:
+            return
+        report = import_directory(self.data_store, directory)
+        for file_path, error in report.failures.items():
+            logging.error("Import of %s failed: %s", file_path, error)
+        message = str(report)
+        if report.failures:
+            failed = "\n".join(os.path.basename(path) for path in report.failures)
+            message += "\n\nFailed files:\n" + failed
+        showinfo("Import finished", message)
+
     def load_user_data_store_dialog(self):
         """Command resposible for loading saved decks"""
         db_file = askopenfilename(
@@ -341,7 +512,9 @@ class App(tk.Tk):
             ),
         )
         try:
-            self.data_store = Db(db_path=db_file)
+            self.data_store = trace_calls(
+                Db(db_path=db_file, in_memory=HOT_DATABASE), "db"
+            )
         except Exception as ex:  # pylint: disable=broad-except
             # anything wrong happen - log it
             logging.error(str(ex))
@@ -384,6 +557,8 @@ if __name__ == "__main__":
         filemode="w",
         format="[%(levelname)s] %(name)s -- %(message)s",
     )
+    # set FLASHCARDS_TRACE=trace.json to record latency of event handlers
+    enable_from_environment()
 
     root = App()
     root.mainloop()
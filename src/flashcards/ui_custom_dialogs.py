@@ -19,12 +19,11 @@ class DeckListDialog(tk.Toplevel):
         self._label = tk.Label(self, text="Select deck: ")
         self._label.grid(row=0, column=0, sticky="nsew")
         self._decks: List["Deck"] = decks
-        self._deck_options = (d.deck_name for d in decks)
-        self._option_var = tk.StringVar(self)
+        self._deck_options = [d.deck_name for d in decks]
+        self._option_var = tk.StringVar(self, self._deck_options[0])
         self._options = tk.OptionMenu(
             self,
-            variable=self._option_var,
-            value=self._deck_options[0],
+            self._option_var,
             *self._deck_options,
             command=self.on_selection_changed_cmd
         )
@@ -32,11 +31,11 @@ class DeckListDialog(tk.Toplevel):
         self._confirm_btn = tk.Button(
             self, text="Confirm", command=self.on_confirm_command
         )
-        self._options.grid(row=1, column=1, sticky="e")
-        self._selected_deck = None
+        self._confirm_btn.grid(row=1, column=1, sticky="e")
+        self._selected_deck = decks[0] if decks else None
         self._on_deck_changed_cb = on_change
 
-    def on_selection_changed_cmd(self):
+    def on_selection_changed_cmd(self, _value=None):
         """selection handler for option menu"""
         self._selected_deck = None
         for deck in self._decks:
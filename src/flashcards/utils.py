@@ -2,8 +2,11 @@
 
 import copy
 import enum
+import hashlib
+import math
 import random
 import unicodedata
+from typing import Dict, Tuple
 
 
 def remove_accents(input_text: str) -> str:
@@ -12,6 +15,18 @@ def remove_accents(input_text: str) -> str:
     return "".join(char for char in nkfd_form if not unicodedata.combining(char))
 
 
+def normalize_text(input_text: str) -> str:
+    """Normalize text for comparisons: no accents, no case, single spaces"""
+    return " ".join(remove_accents(input_text).casefold().split())
+
+
+def card_fingerprint(question: str, answer: str) -> str:
+    """Hash of card content. Cards differing only by case, accents or
+    whitespace have the same fingerprint"""
+    payload = normalize_text(question) + "\x1f" + normalize_text(answer)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
 class Closeness(enum.Enum):
     """Represents how close are two strings"""
 
@@ -21,23 +36,38 @@ class Closeness(enum.Enum):
     NOT_MATCHING = 3
 
 
+def normalize_answer(answer: str) -> Tuple[str, str]:
+    """Stripped and accent free form of the answer, computed once per card
+    when many answers are compared against it"""
+    stripped = answer.strip()
+    return stripped, remove_accents(stripped)
+
+
 def compare_normalized(left_raw: str, right_raw: str) -> Closeness:
     """Compare two strings and return how close are they. We can later
     use this measure to check if given answer is close enough to real one to count as valid
     """
+    return compare_prenormalized(left_raw, *normalize_answer(right_raw))
+
+
+def compare_prenormalized(
+    left_raw: str, right_stripped: str, right_unaccented: str
+) -> Closeness:
+    """``compare_normalized`` with right side passed through ``normalize_answer``"""
     left_stripped = left_raw.strip()
-    right_stripped = right_raw.strip()
 
     if left_stripped == right_stripped:
-        return Closeness.EXACT()
+        return Closeness.EXACT
 
     left_ = remove_accents(left_stripped)
-    right_ = remove_accents(right_stripped)
 
-    if left_ == right_:
-        return Closeness.COMBINING_DISMATCH()
+    if left_ == right_unaccented:
+        return Closeness.COMBINING_DISMATCH
 
-    distance = iterative_levenshtein(left_, right_)
+    # distance is at least the difference of lengths
+    if abs(len(left_) - len(right_unaccented)) > 2:
+        return Closeness.NOT_MATCHING
+    distance = iterative_levenshtein(left_, right_unaccented)
     if distance > 2:
         return Closeness.NOT_MATCHING
     else:
@@ -84,7 +114,51 @@ def iterative_levenshtein(left_string: str, right_string: str) -> int:
     #    for r in range(rows):
     #        print(dist[r])
 
-    return dist[row][col]
+    return dist[rows - 1][cols - 1]
+
+
+def levenshtein(left_string: str, right_string: str) -> int:
+    """Levenshtein distance, same as ``iterative_levenshtein`` but much faster
+
+    Bit-parallel algorithm of Myers (in formulation of Hyyrö), one column of
+    distance matrix is kept as bit vectors in Python integers.
+    """
+    if len(left_string) < len(right_string):
+        left_string, right_string = right_string, left_string
+    if not right_string:
+        return len(left_string)
+    # bit i of match mask of the char is set when right_string[i] is the char
+    match_masks: Dict[str, int] = {}
+    for position, char in enumerate(right_string):
+        match_masks[char] = match_masks.get(char, 0) | (1 << position)
+    full = (1 << len(right_string)) - 1
+    last = 1 << (len(right_string) - 1)
+    positive, negative = full, 0
+    distance = len(right_string)
+    for char in left_string:
+        match = match_masks.get(char, 0)
+        vertical = match | negative
+        horizontal = (((match & positive) + positive) ^ positive) | match
+        horizontal_positive = negative | (~(horizontal | positive) & full)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & full)
+        negative = horizontal_positive & vertical
+    return distance
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of values, ``pct`` in range 0-100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
 
 
 def clone_cards(cards, at_least):
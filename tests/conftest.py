@@ -0,0 +1,59 @@
+"""Shared fixtures of tests, package is imported from ``src``"""
+
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from flashcards.cards import Card, Deck
+from flashcards.database import Db
+from flashcards.exporters import export_deck_to_apkg
+
+
+@pytest.fixture
+def data_store(tmp_path):
+    """Empty database in temporary directory"""
+    db_handle = Db(str(tmp_path / "test.db"))
+    db_handle.setup_database()
+    yield db_handle
+    db_handle.close()
+
+
+def make_deck(name: str, pairs, author: str = "tester") -> "Deck":
+    """Deck of cards with given (question, answer) pairs"""
+    return Deck(
+        deck_id=0,
+        deck_name=name,
+        author=author,
+        cards=[Card(0, question, answer, 0, []) for question, answer in pairs],
+    )
+
+
+def make_apkg(tmp_path, deck: "Deck", media: dict) -> str:
+    """ANKI package of the deck with media files ``{file name: content}``"""
+    builder = Db(str(tmp_path / f"build_{deck.deck_name}.db"))
+    builder.setup_database()
+    deck_id = builder.put_deck_into_database(deck)
+    package = str(tmp_path / f"{deck.deck_name}.apkg")
+    export_deck_to_apkg(builder, deck_id, package)
+    builder.close()
+    with zipfile.ZipFile(package) as z_file:
+        # empty manifest written by exporter is replaced
+        members = {
+            info.filename: z_file.read(info)
+            for info in z_file.infolist()
+            if info.filename != "media"
+        }
+    with zipfile.ZipFile(package, mode="w") as z_file:
+        for name, content in members.items():
+            z_file.writestr(name, content)
+        for number, content in enumerate(media.values()):
+            z_file.writestr(str(number), content)
+        manifest = {str(number): name for number, name in enumerate(media)}
+        z_file.writestr("media", json.dumps(manifest))
+    return package
@@ -0,0 +1,69 @@
+"""Answer index and edit distance"""
+
+import random
+
+import pytest
+
+from flashcards.answer_index import AnswerIndex, PrefixTrie
+from flashcards.utils import iterative_levenshtein, levenshtein, normalize_text
+
+ALPHABET = "abcé ž漢"
+
+
+def random_words(rng: random.Random, count: int, max_length: int = 8):
+    return [
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize(
+    "left, right",
+    [
+        ("", ""),
+        ("", "abc"),
+        ("abc", ""),
+        ("kitten", "sitting"),
+        ("žluťoučký", "zlutoucky"),
+        ("漢字", "漢"),
+        ("a" * 70, "b" + "a" * 70),
+    ],
+)
+def test_levenshtein_examples(left, right):
+    assert levenshtein(left, right) == iterative_levenshtein(left, right)
+
+
+def test_levenshtein_matches_iterative():
+    rng = random.Random(0)
+    words = random_words(rng, 400, max_length=80)
+    for left, right in zip(words, reversed(words)):
+        assert levenshtein(left, right) == iterative_levenshtein(left, right)
+
+
+def test_prefix_trie_matches_brute_force():
+    rng = random.Random(1)
+    keys = random_words(rng, 300)
+    trie = PrefixTrie(keys)
+    for prefix in random_words(rng, 200, max_length=3) + [""]:
+        expected = sorted(key for key in set(keys) if key.startswith(prefix))
+        assert trie.complete(prefix, limit=len(keys)) == expected
+        assert trie.complete(prefix, limit=2) == expected[:2]
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(2)
+    answers = random_words(rng, 300)
+    index = AnswerIndex(answers).build()
+    normalized = {normalize_text(answer) for answer in answers}
+    for query in random_words(rng, 200):
+        found = index.nearest(query, max_distance=2)
+        best = min(
+            iterative_levenshtein(normalize_text(query), key) for key in normalized
+        )
+        if best > 2:
+            assert found is None
+        else:
+            assert found is not None and found[0] == best
+            assert iterative_levenshtein(
+                normalize_text(query), normalize_text(found[1])
+            ) == best
@@ -0,0 +1,18 @@
+"""Batch import of deck files"""
+
+import os
+import shutil
+
+from flashcards.batch_import import import_directory
+
+EXAMPLE_DECK = os.path.join(os.path.dirname(__file__), "flashcard_example.json")
+
+
+def test_report_counts_inserted_decks_only(tmp_path, data_store):
+    deck_dir = tmp_path / "decks"
+    deck_dir.mkdir()
+    shutil.copy(EXAMPLE_DECK, deck_dir / "example.json")
+    first = import_directory(data_store, str(deck_dir), workers=1)
+    second = import_directory(data_store, str(deck_dir), workers=1)
+    assert first.decks == 1 and first.cards > 0
+    assert (second.files, second.decks, second.cards) == (1, 0, 0)
@@ -0,0 +1,58 @@
+"""Versioned deck cache"""
+
+from datetime import datetime
+
+from conftest import make_deck
+from flashcards.cache import DeckCache, estimate_size
+from flashcards.cards import Guess, GuessStatus
+
+
+def test_write_bumping_version_gives_fresh_entry(data_store):
+    deck_id = data_store.put_deck_into_database(make_deck("deck", [("q", "a")]))
+    cache = DeckCache(data_store)
+    first = cache.get_deck_from_database(deck_id)
+    assert cache.get_deck_from_database(deck_id) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    card = first.cards[0]
+    data_store.put_guesses_into_database(
+        [Guess(card, ["a"], GuessStatus.CORRECT, datetime.now())]
+    )
+    fresh = cache.get_deck_from_database(deck_id)
+    assert fresh is not first
+    assert cache.misses == 2
+    # stale version of the deck is dropped, not kept next to the fresh one
+    assert cache.size == estimate_size(fresh)
+
+
+def test_summaries_follow_new_decks(data_store):
+    cache = DeckCache(data_store)
+    assert cache.get_deck_summaries() == []
+    data_store.put_deck_into_database(make_deck("deck", [("q", "a")]))
+    assert [summary.deck_name for summary in cache.get_deck_summaries()] == ["deck"]
+
+
+def test_lru_is_bounded_by_estimated_size(data_store):
+    deck_ids = [
+        data_store.put_deck_into_database(
+            make_deck(f"deck{number}", [(f"q{number}-{i}", "a") for i in range(20)])
+        )
+        for number in range(6)
+    ]
+    deck_size = estimate_size(data_store.get_deck_from_database(deck_ids[0]))
+    cache = DeckCache(data_store, max_bytes=deck_size * 3)
+    for deck_id in deck_ids:
+        cache.get_deck_from_database(deck_id)
+        assert cache.size <= cache.max_bytes
+    # least recently used decks were evicted, the last one is still cached
+    misses = cache.misses
+    cache.get_deck_from_database(deck_ids[-1])
+    assert cache.misses == misses
+    cache.get_deck_from_database(deck_ids[0])
+    assert cache.misses == misses + 1
+
+
+def test_value_bigger_than_cache_is_not_stored(data_store):
+    deck_id = data_store.put_deck_into_database(make_deck("deck", [("q", "a")]))
+    cache = DeckCache(data_store, max_bytes=10)
+    cache.get_deck_from_database(deck_id)
+    assert cache.size == 0
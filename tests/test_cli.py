@@ -0,0 +1,26 @@
+"""Command line entry point"""
+
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src")
+
+
+def test_parser_does_not_import_command_modules():
+    probe = (
+        "import sys\n"
+        "import flashcards.cli\n"
+        "heavy = ['flashcards.forecast', 'flashcards.session',\n"
+        "         'flashcards.startup_benchmark']\n"
+        "print([name for name in heavy if name in sys.modules])\n"
+    )
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run(
+        [sys.executable, "-c", probe],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
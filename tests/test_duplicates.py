@@ -0,0 +1,59 @@
+"""Duplicated cards found by content fingerprint"""
+
+import pytest
+
+from conftest import make_deck
+from flashcards.database import DuplicatePolicy
+from flashcards.utils import card_fingerprint
+
+PAIRS = [("Capital of France?", "Paris"), ("Capital of Spain?", "Madrid")]
+
+
+def _questions(data_store, deck_id):
+    return [card.question for card in data_store.iter_deck_cards(deck_id)]
+
+
+def test_fingerprint_ignores_case_and_whitespace():
+    assert card_fingerprint("Capital  of FRANCE?", " paris") == card_fingerprint(
+        "capital of france?", "Paris"
+    )
+    assert card_fingerprint("Capital of France?", "Lyon") != card_fingerprint(
+        "Capital of France?", "Paris"
+    )
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        (DuplicatePolicy.KEEP, ["capital of FRANCE?", "Capital of Italy?"]),
+        (DuplicatePolicy.SKIP, ["Capital of Italy?"]),
+        (DuplicatePolicy.MERGE, ["Capital of Italy?"]),
+    ],
+)
+def test_reimport_by_policy(data_store, policy, expected):
+    data_store.put_deck_into_database(make_deck("first", PAIRS))
+    second = make_deck(
+        "second", [("capital of FRANCE?", "paris"), ("Capital of Italy?", "Rome")]
+    )
+    deck_id = data_store.put_deck_into_database(second, on_duplicate=policy)
+    assert _questions(data_store, deck_id) == expected
+
+
+def test_merge_adds_categories_to_stored_card(data_store):
+    deck = make_deck("first", PAIRS)
+    deck.cards[0].category = ["europe"]
+    first_id = data_store.put_deck_into_database(deck)
+    version = data_store.get_deck_versions()[first_id]
+    deck = make_deck("second", PAIRS[:1])
+    deck.cards[0].category = ["capitals", "europe"]
+    data_store.put_deck_into_database(deck, on_duplicate=DuplicatePolicy.MERGE)
+    stored = next(data_store.iter_deck_cards(first_id))
+    assert stored.category == ["europe", "capitals"]
+    assert data_store.get_deck_versions()[first_id] > version
+
+
+def test_duplicates_within_imported_deck_are_skipped(data_store):
+    deck_id = data_store.put_deck_into_database(
+        make_deck("deck", PAIRS + PAIRS[:1]), on_duplicate=DuplicatePolicy.SKIP
+    )
+    assert _questions(data_store, deck_id) == [question for question, _ in PAIRS]
@@ -0,0 +1,42 @@
+"""Loading of deck files"""
+
+import tempfile
+import zipfile
+
+import pytest
+
+from conftest import make_apkg, make_deck
+from flashcards import fileloaders
+from flashcards.fileloaders import DeckLoadingError, load_apkg_file, read_apkg_file
+
+
+def _contents(decks):
+    return [
+        (deck.deck_name, [(card.question, card.answer) for card in deck.cards])
+        for deck in decks
+    ]
+
+
+def test_apkg_is_read_the_same_from_memory_and_temp_file(tmp_path, monkeypatch):
+    deck = make_deck("capitals", [("France", "Paris"), ("Spain", "Madrid")])
+    package = make_apkg(tmp_path, deck, {})
+    in_memory = read_apkg_file(package)
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    monkeypatch.setattr(fileloaders, "IN_MEMORY_COLLECTION_LIMIT", 0)
+    monkeypatch.setattr(tempfile, "tempdir", str(spool_dir))
+    spooled = read_apkg_file(package)
+    assert _contents(in_memory) == _contents(spooled)
+    assert ("capitals", [("France", "Paris"), ("Spain", "Madrid")]) in _contents(
+        spooled
+    )
+    assert not list(spool_dir.iterdir())
+
+
+def test_apkg_without_collection_is_rejected(tmp_path, data_store):
+    package = str(tmp_path / "broken.apkg")
+    with zipfile.ZipFile(package, mode="w") as z_file:
+        z_file.writestr("media", "{}")
+    with pytest.raises(DeckLoadingError):
+        load_apkg_file(package, data_store)
+    assert data_store.find_deck_ids() == []
@@ -0,0 +1,53 @@
+"""Review load forecasting"""
+
+from array import array
+import random
+
+import pytest
+
+from flashcards.forecast import forecast_reviews
+from flashcards.scheduling import LEITNER_INTERVALS, ScheduleColumns
+
+
+def _columns(count: int, seed: int = 0) -> "ScheduleColumns":
+    rng = random.Random(seed)
+    columns = ScheduleColumns(new_cards=3)
+    for _ in range(count):
+        columns.due_days.append(rng.uniform(-10.0, 40.0))
+        columns.boxes.append(rng.randrange(len(LEITNER_INTERVALS)))
+    return columns
+
+
+def _assert_same(left, right):
+    assert left.reviews == right.reviews
+    assert left.retention == pytest.approx(right.retention, rel=1e-9)
+    assert (left.scheduled_cards, left.overdue_cards, left.new_cards) == (
+        right.scheduled_cards,
+        right.overdue_cards,
+        right.new_cards,
+    )
+
+
+@pytest.mark.parametrize("count", [0, 1, 500])
+def test_numpy_matches_python(count):
+    pytest.importorskip("numpy")
+    columns = _columns(count)
+    _assert_same(
+        forecast_reviews(columns, horizon=45, use_numpy=True),
+        forecast_reviews(columns, horizon=45, use_numpy=False),
+    )
+
+
+def test_empty_collection_has_full_retention():
+    forecast = forecast_reviews(ScheduleColumns(), horizon=5, use_numpy=False)
+    assert forecast.reviews == [0] * 5
+    assert forecast.retention == [1.0] * 5
+    assert forecast.horizon == 5
+
+
+def test_card_climbs_boxes_inside_horizon():
+    columns = ScheduleColumns(due_days=array("d", [0.5]), boxes=array("b", [1]))
+    forecast = forecast_reviews(columns, horizon=20, use_numpy=False)
+    # due today, then after 3 and 7 more days, next review falls beyond day 19
+    assert [day for day, count in enumerate(forecast.reviews) if count] == [0, 3, 10]
+    assert forecast.overdue_cards == 0
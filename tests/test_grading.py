@@ -0,0 +1,79 @@
+"""Bulk grading of answer sheets"""
+
+import json
+
+import pytest
+
+from conftest import make_deck
+from flashcards.fileloaders import DeckLoadingError
+from flashcards.grading import grade_answer_sheet
+from flashcards.utils import Closeness
+
+
+def _card_ids(data_store):
+    deck_id = data_store.put_deck_into_database(
+        make_deck("capitals", [("France", "Paris"), ("Spain", "Madrid")])
+    )
+    return [card.card_id for card in data_store.iter_deck_cards(deck_id)]
+
+
+def _sheet_rows(paris_id, madrid_id):
+    return [
+        ("alice", paris_id, "Paris"),
+        ("bob", paris_id, "Pàris"),
+        ("alice", madrid_id, "Lisbon"),
+        ("bob", madrid_id, "Madrid"),
+        ("carol", 999, "Rome"),
+    ]
+
+
+def _progress(data_store):
+    rows = data_store.conn.execute(
+        "SELECT learner, card_id, guess_list, status FROM progress ORDER BY id"
+    )
+    return sorted(tuple(row) for row in rows)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_csv_sheet_is_graded(tmp_path, data_store, workers):
+    paris_id, madrid_id = _card_ids(data_store)
+    sheet = tmp_path / "sheet.csv"
+    lines = ["learner,card_id,answer"] + [
+        f"{learner},{card_id},{answer}"
+        for learner, card_id, answer in _sheet_rows(paris_id, madrid_id)
+    ]
+    sheet.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    report = grade_answer_sheet(data_store, str(sheet), workers=workers, chunk_size=1)
+    assert (report.answers, report.cards, report.correct) == (4, 2, 3)
+    assert report.unknown_cards == 1
+    assert _progress(data_store) == sorted(
+        [
+            ("alice", madrid_id, "Lisbon", 0),
+            ("alice", paris_id, "Paris", 1),
+            ("bob", madrid_id, "Madrid", 1),
+            ("bob", paris_id, "Pàris", 1),
+        ]
+    )
+
+
+def test_strict_acceptance_rejects_accents(tmp_path, data_store):
+    paris_id, madrid_id = _card_ids(data_store)
+    sheet = tmp_path / "sheet.jsonl"
+    sheet.write_text(
+        "\n".join(
+            json.dumps({"learner": learner, "card_id": card_id, "answer": answer})
+            for learner, card_id, answer in _sheet_rows(paris_id, madrid_id)
+        ),
+        encoding="utf-8",
+    )
+    report = grade_answer_sheet(
+        data_store, str(sheet), workers=1, accept=Closeness.EXACT
+    )
+    assert report.correct == 2
+
+
+def test_malformed_sheet_is_rejected(tmp_path, data_store):
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_text("learner,answer\nalice,Paris\n", encoding="utf-8")
+    with pytest.raises(DeckLoadingError):
+        grade_answer_sheet(data_store, str(sheet), workers=1)
@@ -0,0 +1,49 @@
+"""Database served from memory"""
+
+import sqlite3
+
+import pytest
+
+from conftest import make_deck
+from flashcards.database import Db, OutsideChangeError
+
+
+def deck_names(db_path: str):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT deck_name FROM decks"))
+
+
+def test_flush_refuses_outside_change(tmp_path, data_store):
+    db_path = str(tmp_path / "test.db")
+    data_store.put_deck_into_database(make_deck("first", [("q", "a")]))
+    hot = Db(db_path, in_memory=True)
+    hot.put_deck_into_database(make_deck("hot", [("q", "a")]))
+    data_store.put_deck_into_database(make_deck("outside", [("q", "a")]))
+    with pytest.raises(OutsideChangeError):
+        hot.flush()
+    hot.close()
+    assert deck_names(db_path) == ["first", "outside"]
+    assert deck_names(hot.unsaved_path) == ["first", "hot"]
+
+
+def test_flush_writes_own_changes(tmp_path, data_store):
+    db_path = str(tmp_path / "test.db")
+    hot = Db(db_path, in_memory=True)
+    hot.put_deck_into_database(make_deck("hot", [("q", "a")]))
+    hot.flush()
+    hot.put_deck_into_database(make_deck("later", [("q", "a")]))
+    hot.close()
+    assert deck_names(db_path) == ["hot", "later"]
+
+
+def test_partial_flush_carries_deletes(tmp_path, data_store):
+    db_path = str(tmp_path / "test.db")
+    data_store.add_shard("big")
+    data_store.put_deck_into_database(make_deck("kept", [("q", "a")]))
+    sharded_id = data_store.put_deck_into_database(
+        make_deck("sharded", [("q", "a")]), shard="big"
+    )
+    hot = Db(db_path, in_memory=True, deck_ids=[sharded_id])
+    hot.drop_shard("big")
+    hot.close()
+    assert deck_names(db_path) == ["kept"]
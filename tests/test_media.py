@@ -0,0 +1,69 @@
+"""Media files of ANKI packages"""
+
+import sqlite3
+
+import pytest
+
+from conftest import make_apkg, make_deck
+from flashcards.database import Db
+from flashcards.exporters import export_deck_to_apkg
+from flashcards.fileloaders import load_apkg_file
+from flashcards.media import MediaStore
+
+
+def test_same_file_name_in_two_packages(tmp_path, data_store):
+    cat_deck = make_deck("cats", [('<img src="img.png">', "cat")])
+    dog_deck = make_deck("dogs", [('<img src="img.png">', "dog")])
+    cat_package = make_apkg(tmp_path, cat_deck, {"img.png": b"CAT-IMAGE"})
+    dog_package = make_apkg(tmp_path, dog_deck, {"img.png": b"DOG-IMAGE"})
+    load_apkg_file(cat_package, data_store)
+    load_apkg_file(dog_package, data_store)
+    store = MediaStore(data_store, root_dir=str(tmp_path / "media"))
+    for deck_name, content in (("cats", b"CAT-IMAGE"), ("dogs", b"DOG-IMAGE")):
+        deck_id = data_store.find_deck_id(deck_name)
+        card = next(data_store.iter_deck_cards(deck_id))
+        with open(store.path_for("img.png", card.deck_id), "rb") as file_handle:
+            assert file_handle.read() == content
+
+
+def test_identical_content_shares_blob(tmp_path, data_store):
+    first = make_apkg(tmp_path, make_deck("first", [("q", "a")]), {"a.png": b"SAME"})
+    second = make_apkg(tmp_path, make_deck("second", [("q", "a")]), {"b.png": b"SAME"})
+    load_apkg_file(first, data_store)
+    load_apkg_file(second, data_store)
+    store = MediaStore(data_store, root_dir=str(tmp_path / "media"))
+    first_path = store.path_for("a.png", data_store.find_deck_id("first"))
+    second_path = store.path_for("b.png", data_store.find_deck_id("second"))
+    assert first_path == second_path
+
+
+def test_apkg_export_keeps_media(tmp_path, data_store):
+    deck = make_deck("cats", [('<img src="img.png">', "cat"), ("[sound:a.mp3]", "x")])
+    package = make_apkg(tmp_path, deck, {"img.png": b"CAT", "a.mp3": b"MEOW"})
+    load_apkg_file(package, data_store)
+    exported = str(tmp_path / "exported.apkg")
+    export_deck_to_apkg(data_store, data_store.find_deck_id("cats"), exported)
+
+    target = Db(str(tmp_path / "target.db"))
+    target.setup_database()
+    load_apkg_file(exported, target)
+    store = MediaStore(target, root_dir=str(tmp_path / "target_media"))
+    deck_id = target.find_deck_id("cats")
+    for file_name, content in (("img.png", b"CAT"), ("a.mp3", b"MEOW")):
+        with open(store.path_for(file_name, deck_id), "rb") as file_handle:
+            assert file_handle.read() == content
+    target.close()
+
+
+def test_failed_apkg_import_registers_no_media(tmp_path, data_store, monkeypatch):
+    deck = make_deck("cats", [('<img src="img.png">', "cat")])
+    package = make_apkg(tmp_path, deck, {"img.png": b"CAT"})
+
+    def failing_insert(*args, **kwargs):
+        raise sqlite3.IntegrityError("deck insert failed")
+
+    monkeypatch.setattr(data_store, "_insert_deck", failing_insert)
+    with pytest.raises(sqlite3.IntegrityError):
+        load_apkg_file(package, data_store)
+    count = data_store.conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+    assert count == 0
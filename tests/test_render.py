@@ -0,0 +1,50 @@
+"""Rendering of ANKI field markup"""
+
+import pytest
+
+from conftest import make_deck
+from flashcards.cards import Card
+from flashcards.render import card_answer, card_question, render_fields, stored_fields
+
+
+@pytest.mark.parametrize(
+    "question, answer, expected",
+    [
+        ("Capital of France?", "Paris", ("Capital of France?", "Paris")),
+        ("Tom &amp; Jerry", "caf&eacute;", ("Tom & Jerry", "café")),
+        (
+            "<div>Line&nbsp;one</div><div>line <b>two</b></div>[sound:a.mp3]",
+            "<i>Paris</i><br>France",
+            ("Line one\nline two", "Paris France"),
+        ),
+        ("<style>b {}</style>Q<script>x()</script>", "A", ("Q", "A")),
+        (
+            "{{c1::Paris}} is capital of {{c2::France::country}}",
+            "extra",
+            ("[...] is capital of [country]", "Paris, France"),
+        ),
+    ],
+)
+def test_render_fields(question, answer, expected):
+    assert render_fields(question, answer) == expected
+
+
+def test_stored_fields_keep_only_changed_fields():
+    assert stored_fields("plain", "text") == (None, None)
+    assert stored_fields("<b>bold</b>", "text") == ("bold", None)
+    assert stored_fields("{{c1::x}}", "x") == ("[...]", None)
+
+
+def test_card_is_rendered_without_stored_fields():
+    card = Card(0, "{{c1::Paris}} &amp; Lyon", "", 0, [])
+    assert (card_question(card), card_answer(card)) == ("[...] & Lyon", "Paris")
+
+
+def test_rendered_fields_are_stored_on_import(data_store):
+    deck_id = data_store.put_deck_into_database(
+        make_deck("cloze", [("<b>{{c1::Paris}}</b> is in France", "")])
+    )
+    card = next(data_store.iter_deck_cards(deck_id))
+    assert card.question == "<b>{{c1::Paris}}</b> is in France"
+    assert card.rendered_question == "[...] is in France"
+    assert (card_question(card), card_answer(card)) == ("[...] is in France", "Paris")
@@ -0,0 +1,69 @@
+"""Session engine and simulated batch runs"""
+
+import pytest
+
+from conftest import make_deck
+from flashcards.cards import GuessStatus
+from flashcards.defaults import INTERLEAVE_POLICIES
+from flashcards.session import (
+    AnswerSource,
+    InterleavePolicy,
+    Session,
+    SimulatedLearner,
+    run_batch,
+)
+
+
+def test_answer_source_must_implement_answer():
+    class Silent(AnswerSource):  # pylint: disable=abstract-method
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
+
+
+def test_perfect_learner_answers_every_card_first_time():
+    deck = make_deck("deck", [("q1", "a1"), ("q2", "a2")])
+    guesses = Session(deck.cards, SimulatedLearner(accuracy=1.0)).run()
+    assert [guess.status for guess in guesses] == [GuessStatus.CORRECT] * 2
+    assert all(len(guess.tries) == 1 for guess in guesses)
+
+
+def test_failing_learner_uses_every_try():
+    deck = make_deck("deck", [("q", "a")])
+    guesses = Session(deck.cards, SimulatedLearner(accuracy=0.0), max_tries=3).run()
+    assert guesses[0].status == GuessStatus.FAILED
+    assert len(guesses[0].tries) == 3
+
+
+def test_learner_with_seed_is_repeatable():
+    deck = make_deck("deck", [(f"q{number}", f"a{number}") for number in range(20)])
+    runs = [
+        [guess.tries for guess in Session(deck.cards, SimulatedLearner(0.5, 7)).run()]
+        for _ in range(2)
+    ]
+    assert runs[0] == runs[1]
+
+
+def test_run_batch_saves_progress_of_every_session(data_store):
+    pairs = [(f"q{number}", f"a{number}") for number in range(10)]
+    deck_id = data_store.put_deck_into_database(make_deck("deck", pairs))
+    deck = data_store.get_deck_from_database(deck_id)
+    report = run_batch(
+        data_store,
+        deck,
+        sessions=4,
+        answer_source_factory=lambda number: SimulatedLearner(0.7, seed=number),
+        max_cards=3,
+        max_tries=2,
+    )
+    assert report.sessions == 4
+    assert report.rows_written == 12
+    assert 12 <= report.answers <= 24
+    progress_rows = data_store.conn.execute("SELECT COUNT(*) FROM progress")
+    assert progress_rows.fetchone()[0] == 12
+    assert "4 sessions" in str(report)
+
+
+def test_interleave_policies_match_cli_choices():
+    assert [policy.value for policy in InterleavePolicy] == list(INTERLEAVE_POLICIES)
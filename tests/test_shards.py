@@ -0,0 +1,116 @@
+"""Decks stored in shard files"""
+
+from datetime import datetime
+import sqlite3
+
+import pytest
+
+from conftest import make_deck
+from flashcards.cards import Guess, GuessStatus
+from flashcards.database import DuplicatePolicy
+
+
+def test_duplicates_are_found_in_other_shard(data_store):
+    data_store.put_deck_into_database(make_deck("big", [("q", "a")]), shard="big")
+    deck_id = data_store.put_deck_into_database(
+        make_deck("main", [("q", "a"), ("other", "b")]),
+        on_duplicate=DuplicatePolicy.SKIP,
+    )
+    assert [card.question for card in data_store.iter_deck_cards(deck_id)] == [
+        "other"
+    ]
+
+
+def test_categories_are_merged_into_other_shard(data_store):
+    deck = make_deck("big", [("q", "a")])
+    deck.cards[0].category = ["first"]
+    big_id = data_store.put_deck_into_database(deck, shard="big")
+    deck = make_deck("main", [("q", "a")])
+    deck.cards[0].category = ["second"]
+    data_store.put_deck_into_database(deck, on_duplicate=DuplicatePolicy.MERGE)
+    card = next(data_store.iter_deck_cards(big_id))
+    assert card.category == ["first", "second"]
+
+
+def test_duplicate_clusters_span_shards(data_store):
+    data_store.put_deck_into_database(make_deck("big", [("q", "a")]), shard="big")
+    data_store.put_deck_into_database(make_deck("main", [("q", "a"), ("x", "y")]))
+    clusters = list(data_store.iter_duplicate_clusters())
+    assert len(clusters) == 1
+    assert sorted(row["deck_name"] for row in clusters[0]) == ["big", "main"]
+
+
+def test_study_queue_is_stable_while_guesses_are_saved(data_store):
+    pairs = [(f"q{number}", "a") for number in range(200)]
+    deck_id = data_store.put_deck_into_database(make_deck("deck", pairs))
+    card_ids = []
+    for _priority, card in data_store.iter_study_queue(deck_id, datetime.now()):
+        card_ids.append(card.card_id)
+        data_store.put_guesses_into_database(
+            [Guess(card, ["b"], GuessStatus.FAILED, datetime.now())]
+        )
+    assert sorted(card_ids) == sorted(
+        card.card_id for card in data_store.iter_deck_cards(deck_id)
+    )
+
+
+def test_study_queue_tag_is_matched_literally(data_store):
+    deck = make_deck("deck", [("literal", "a"), ("wildcard", "b"), ("upper", "c")])
+    for card, category in zip(deck.cards, (["a_b", "x"], ["axb"], ["A_B"])):
+        card.category = category
+    deck_id = data_store.put_deck_into_database(deck)
+    queue = data_store.iter_study_queue(deck_id, datetime.now(), "a_b")
+    assert [card.question for _priority, card in queue] == ["literal"]
+
+
+def test_grades_over_shards_are_committed_once(data_store):
+    main_id = data_store.put_deck_into_database(make_deck("main", [("q", "a")]))
+    card_ids = [next(data_store.iter_deck_cards(main_id)).card_id]
+    for shard in ("first", "second"):
+        deck_id = data_store.put_deck_into_database(
+            make_deck(shard, [("q", "a")]), shard=shard
+        )
+        card_ids.append(next(data_store.iter_deck_cards(deck_id)).card_id)
+    data_store._detach_shards(lambda _shard_id: True)
+    statements = []
+    data_store.conn.set_trace_callback(
+        lambda statement: statements.append(" ".join(statement.split()))
+    )
+    data_store.put_grades_into_database(
+        [("learner", card_id, "a", GuessStatus.CORRECT) for card_id in card_ids]
+    )
+    data_store.conn.set_trace_callback(None)
+    writes = [
+        statement
+        for statement in statements
+        if statement.startswith("INSERT INTO") and ".progress(" in statement
+    ]
+    first_write = statements.index(writes[0])
+    assert len(writes) == 3
+    assert statements[first_write:].count("COMMIT") == 1
+    assert statements[-1] == "COMMIT"
+
+
+def test_attaching_shard_does_not_commit_pending_writes(data_store):
+    deck_id = data_store.put_deck_into_database(
+        make_deck("big", [("q", "a")]), shard="big"
+    )
+    data_store._detach_shards(lambda _shard_id: True)
+    data_store.conn.execute(
+        "INSERT INTO decks(deck_name, author) VALUES('pending', 'tester')"
+    )
+    with pytest.raises(sqlite3.OperationalError):
+        list(data_store.iter_deck_cards(deck_id))
+    data_store.conn.rollback()
+    assert data_store.find_deck_id("pending") is None
+    assert len(list(data_store.iter_deck_cards(deck_id))) == 1
+
+
+def test_failed_import_into_shard_stores_nothing(data_store):
+    deck = make_deck("broken", [("q", "a"), ("p", "b")])
+    deck.cards[1].level = None
+    with pytest.raises(sqlite3.IntegrityError):
+        data_store.put_decks_into_database(
+            [make_deck("good", [("x", "y")]), deck], shard="big"
+        )
+    assert data_store.find_deck_ids() == []
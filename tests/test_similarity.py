@@ -0,0 +1,62 @@
+"""Near duplicate detection"""
+
+import itertools
+
+from flashcards import similarity
+from flashcards.cards import Card
+from flashcards.similarity import (
+    BANDS,
+    BUCKET_WINDOW,
+    _size_window_pairs,
+    card_text,
+    find_near_duplicates,
+    jaccard,
+    shingles,
+)
+
+
+def _cards(questions):
+    return [Card(number, text, "a", 0, []) for number, text in enumerate(questions)]
+
+
+def test_identical_questions_in_huge_bucket_are_reported():
+    cards = _cards(["What is the capital of France?"] * 300)
+    pairs = find_near_duplicates(cards)
+    assert len(pairs) == 299
+    assert {pair.right.card_id for pair in pairs} == set(range(1, 300))
+    assert all(pair.left.card_id == 0 and pair.similarity == 1.0 for pair in pairs)
+
+
+def test_oversized_buckets_match_all_pairs(monkeypatch):
+    monkeypatch.setattr(similarity, "MAX_BUCKET_SIZE", 4)
+    monkeypatch.setattr(similarity, "BUCKET_WINDOW", 10**6)
+    cards = _cards(
+        [f"capital city of country number {number}" for number in range(40)]
+        + [f"capital of country {number}" for number in range(40)]
+    )
+    found = {(p.left.card_id, p.right.card_id) for p in find_near_duplicates(cards)}
+    monkeypatch.setattr(similarity, "MAX_BUCKET_SIZE", 10**6)
+    unbounded = {(p.left.card_id, p.right.card_id) for p in find_near_duplicates(cards)}
+    assert found == unbounded
+    brute_force = {
+        (left.card_id, right.card_id)
+        for left, right in itertools.combinations(cards, 2)
+        if jaccard(shingles(card_text(left)), shingles(card_text(right))) >= 0.6
+    }
+    assert found <= brute_force
+    assert found
+
+
+def test_bucket_of_equal_sizes_is_compared_in_window():
+    members = list(range(5000))
+    sizes = dict.fromkeys(members, 20)
+    pairs = list(_size_window_pairs(members, sizes, 0.6))
+    assert len(pairs) <= len(members) * BUCKET_WINDOW
+    assert len(set(pairs)) == len(pairs)
+
+
+def test_large_bucket_of_similar_lengths_finishes():
+    cards = _cards([f"question about topic {number:04d}" for number in range(1000)])
+    pairs = find_near_duplicates(cards, max_distance=3)
+    assert 0 < len(pairs) <= len(cards) * BUCKET_WINDOW * BANDS
+    assert all(pair.distance <= 3 for pair in pairs)
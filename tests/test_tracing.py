@@ -0,0 +1,87 @@
+"""Opt-in latency tracing"""
+
+import json
+
+import pytest
+
+from flashcards import tracing
+from flashcards.tracing import TRACER, trace_calls, traced_handler
+
+
+class FakeWidget:
+    """Widget running idle callbacks at once"""
+
+    def after_idle(self, callback):
+        callback()
+
+    @traced_handler
+    def on_click(self):
+        return "clicked"
+
+
+class Store:
+    def read(self, value):
+        return value * 2
+
+    def write(self):
+        return None
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    """Enabled ``TRACER`` with empty spans, restored afterwards"""
+    monkeypatch.setattr(TRACER, "enabled", True)
+    monkeypatch.setattr(TRACER, "spans", [])
+    return TRACER
+
+
+def test_nothing_is_traced_without_environment(monkeypatch):
+    monkeypatch.delenv(tracing.TRACE_ENV, raising=False)
+    monkeypatch.setattr(TRACER, "spans", [])
+    assert tracing.enable_from_environment() is None
+    assert not TRACER.enabled
+    store = Store()
+    assert trace_calls(store, "db") is store
+    assert store.read(2) == 4 and FakeWidget().on_click() == "clicked"
+    assert not hasattr(store, "_traced_category")
+    assert TRACER.spans == []
+
+
+def test_environment_enables_tracer(monkeypatch, tmp_path):
+    registered = []
+    monkeypatch.setenv(tracing.TRACE_ENV, str(tmp_path / "trace.json"))
+    monkeypatch.setattr(TRACER, "enabled", False)
+    monkeypatch.setattr(
+        tracing.atexit, "register", lambda *args: registered.append(args)
+    )
+    assert tracing.enable_from_environment() == str(tmp_path / "trace.json")
+    assert TRACER.enabled
+    assert registered == [(TRACER.finish, str(tmp_path / "trace.json"))]
+
+
+def test_traced_calls_are_written_as_trace_events(tracer, tmp_path):
+    store = trace_calls(Store(), "db", ["read"])
+    assert store.read(3) == 6
+    store.write()
+    assert FakeWidget().on_click() == "clicked"
+    names = [span.name for span in tracer.spans]
+    assert names == [
+        "Store.read",
+        "FakeWidget.on_click",
+        "FakeWidget.on_click -> idle",
+    ]
+    trace_file = tmp_path / "trace.json"
+    tracer.finish(str(trace_file))
+    trace = json.loads(trace_file.read_text(encoding="utf-8"))
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == names
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert events[0]["cat"] == "db"
+    assert trace["otherData"]["latency"]["Store.read"]["count"] == 1
+
+
+def test_object_is_wrapped_only_once(tracer):
+    store = trace_calls(Store(), "db")
+    trace_calls(store, "db")
+    store.read(1)
+    assert len(tracer.spans) == 1